@@ -0,0 +1,65 @@
+# Account Snapshot
+# A class which holds the balances of every account on coinbase pro
+# for a single tick so that all of the crypto account trackers
+# (and the USD account) can be fed from one get_accounts call
+
+class AccountSnapshot:
+    def __init__(self):
+        self.__balances = {}  # maps the account ID to the balance of that account
+        self.__isStale = True
+
+        self.__accountFetches = 0  # how many times get_accounts was called
+        self.__balanceLookups = 0  # how many balances were served from the snapshot
+
+    """
+    Load
+    Loads the balances of all of the accounts from the result
+    of a single get_accounts call and marks the snapshot as fresh
+    @param dataOnAllAccounts: the list of accounts returned by get_accounts
+    """
+    def Load(self, dataOnAllAccounts):
+        balances = {}
+        for accountData in dataOnAllAccounts:
+            balances[accountData["id"]] = float(accountData["balance"])
+        self.__balances = balances
+        self.__isStale = False
+        self.__accountFetches = self.__accountFetches + 1
+
+    """
+    Invalidate
+    Marks the snapshot as stale so the next balance lookup
+    will cause the accounts to be fetched again
+    """
+    def Invalidate(self):
+        self.__isStale = True
+
+    """
+    IsStale
+    @return: if the snapshot needs to be fetched again before it is used
+    """
+    def IsStale(self):
+        return self.__isStale
+
+    """
+    GetBalance
+    @param accountId: The account ID on coinbase pro
+    @return: The balance of the account at the time of the snapshot
+    """
+    def GetBalance(self, accountId: str):
+        self.__balanceLookups = self.__balanceLookups + 1
+        return self.__balances[accountId]
+
+    """
+    GetAccountFetchCount
+    @return: the number of times the accounts were fetched from coinbase pro
+    """
+    def GetAccountFetchCount(self):
+        return self.__accountFetches
+
+    """
+    GetRESTCallsSaved
+    @return: the number of get_account calls which would have been made
+    without the snapshot minus the get_accounts calls which were made instead
+    """
+    def GetRESTCallsSaved(self):
+        return self.__balanceLookups - self.__accountFetches
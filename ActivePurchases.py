@@ -0,0 +1,336 @@
+# Active Purchases
+# A class which stores all of the active purchases (buy orders being held)
+# of a crypto account as parallel columns instead of one list per purchase,
+# and keeps them indexed in a trigger book so that only the purchases which change
+# at the current price have to be looked at.
+# Each purchase gets a lot ID so it can be found and removed without a search
+import numpy as np
+from CryptoStates import CryptoCurrencyPercentageStates
+from CryptoStates import CryptoAccountMutations
+from PurchaseTriggerBook import PurchaseTriggerBook
+
+INITIAL_CAPACITY = 16
+
+class ActivePurchase:
+    # A single active purchase (lot) read out of the store. It can still be indexed
+    # like the old [amount, referencePrice, boughtPrice, state] lists
+    __slots__ = ("lotID", "amount", "referencePrice", "boughtPrice", "state")
+
+    def __init__(self, lotID: int, amount: float, referencePrice: float, boughtPrice: float, state):
+        self.lotID = lotID
+        self.amount = amount
+        self.referencePrice = referencePrice
+        self.boughtPrice = boughtPrice
+        self.state = state
+
+    def __getitem__(self, index: int):
+        return (self.amount, self.referencePrice, self.boughtPrice, self.state)[index]
+
+    def __len__(self):
+        return 4
+
+    def __repr__(self):
+        return "ActivePurchase(" + str(self.lotID) + ", " + str(self.ToList()) + ")"
+
+    """
+    ToList
+    @return: the purchase as a [amount, referencePrice, boughtPrice, state] list
+    """
+    def ToList(self):
+        return [self.amount, self.referencePrice, self.boughtPrice, self.state]
+
+class ActivePurchaseStore:
+    def __init__(self):
+        self.__count = 0
+        self.__lotIDs = np.zeros(INITIAL_CAPACITY, dtype=np.int64)
+        self.__amounts = np.zeros(INITIAL_CAPACITY, dtype=np.float64)  # amount bought in coin
+        self.__referencePrices = np.zeros(INITIAL_CAPACITY, dtype=np.float64)
+        self.__boughtPrices = np.zeros(INITIAL_CAPACITY, dtype=np.float64)
+        self.__states = np.zeros(INITIAL_CAPACITY, dtype=np.int8)  # a CryptoCurrencyPercentageStates value
+
+        self.__rowsByLotID = {}  # maps the lot ID to the row it is stored in
+        self.__nextLotID = 1
+        self.__version = 0  # goes up every time a purchase is added, removed or changed
+        # Called as mutationListener(mutation, lotID, amount, referencePrice, boughtPrice, state)
+        # for every change, EX: to journal it, None when nothing is listening
+        self.__mutationListener = None
+
+        self.__triggerBook = PurchaseTriggerBook()
+
+    def __len__(self):
+        return self.__count
+
+    """
+    GetVersion
+    @return: a number which changes every time a purchase is added, removed or changed
+    """
+    def GetVersion(self):
+        return self.__version
+
+    """
+    SetMutationListener
+    @param mutationListener: called for every change made to the purchases, or None
+    """
+    def SetMutationListener(self, mutationListener):
+        self.__mutationListener = mutationListener
+
+    """
+    EnsureCapacity
+    Grows the columns (doubling them) so that they can hold a certain number of purchases
+    @param capacity: the number of purchases the columns need to be able to hold
+    """
+    def __EnsureCapacity(self, capacity: int):
+        if capacity <= len(self.__amounts):
+            return
+
+        newCapacity = len(self.__amounts)
+        while newCapacity < capacity:
+            newCapacity = newCapacity * 2
+
+        self.__lotIDs = np.resize(self.__lotIDs, newCapacity)
+        self.__amounts = np.resize(self.__amounts, newCapacity)
+        self.__referencePrices = np.resize(self.__referencePrices, newCapacity)
+        self.__boughtPrices = np.resize(self.__boughtPrices, newCapacity)
+        self.__states = np.resize(self.__states, newCapacity)
+
+    """
+    Add
+    Adds an active purchase to the end of the store
+    @param amountBoughtInCoin: The amount of crypto coin bought
+    @param referencePrice: The reference price of the purchase
+    @param boughtPrice: The price the purchase was made at
+    @param percentageState: The percentage state of the purchase
+    @return: the lot ID given to the purchase
+    """
+    def Add(self, amountBoughtInCoin: float, referencePrice: float, boughtPrice: float, percentageState):
+        lotID = self.__nextLotID
+        self.__nextLotID = self.__nextLotID + 1
+
+        self.__EnsureCapacity(self.__count + 1)
+        self.__rowsByLotID[lotID] = self.__count
+        self.__lotIDs[self.__count] = lotID
+        self.__amounts[self.__count] = amountBoughtInCoin
+        self.__referencePrices[self.__count] = referencePrice
+        self.__boughtPrices[self.__count] = boughtPrice
+        self.__states[self.__count] = int(percentageState)
+        self.__count = self.__count + 1
+        self.__triggerBook.Add(lotID, referencePrice, percentageState)
+        self.__version = self.__version + 1
+        if self.__mutationListener is not None:
+            self.__mutationListener(CryptoAccountMutations.LotAdded, lotID, amountBoughtInCoin,
+                                    referencePrice, boughtPrice, int(percentageState))
+        return lotID
+
+    """
+    LoadFromList
+    Replaces every active purchase in the store
+    @param activePurchases: a list of ActivePurchases or [amount, referencePrice, boughtPrice, state] lists
+    """
+    def LoadFromList(self, activePurchases):
+        self.__count = 0
+        self.__rowsByLotID = {}
+        self.__triggerBook.Clear()
+        self.__version = self.__version + 1
+        if self.__mutationListener is not None:
+            self.__mutationListener(CryptoAccountMutations.LotsCleared, 0, 0.0, 0.0, 0.0, 0)
+        self.__EnsureCapacity(len(activePurchases))
+        for activePurchase in activePurchases:
+            self.Add(activePurchase[0], activePurchase[1], activePurchase[2], activePurchase[3])
+
+    """
+    RestoreColumns
+    Replaces every active purchase in the store with ones which keep their lot IDs,
+    EX: when restoring from a journal
+    @param lotIDs: the lot ID of each purchase
+    @param amounts: the amount bought in coin of each purchase
+    @param referencePrices: the reference price of each purchase
+    @param boughtPrices: the price each purchase was made at
+    @param states: the percentage state of each purchase
+    @param nextLotID: the lot ID the next purchase added will get
+    """
+    def RestoreColumns(self, lotIDs, amounts, referencePrices, boughtPrices, states, nextLotID: int):
+        count = len(lotIDs)
+        self.__EnsureCapacity(count)
+        self.__lotIDs[:count] = lotIDs
+        self.__amounts[:count] = amounts
+        self.__referencePrices[:count] = referencePrices
+        self.__boughtPrices[:count] = boughtPrices
+        self.__states[:count] = states
+        self.__count = count
+        self.__nextLotID = nextLotID
+
+        self.__rowsByLotID = {}
+        self.__triggerBook.Clear()
+        for index in range(count):
+            lotID = int(self.__lotIDs[index])
+            self.__rowsByLotID[lotID] = index
+            self.__triggerBook.Add(lotID, self.__referencePrices[index], self.__states[index])
+        self.__version = self.__version + 1
+
+    """
+    GetColumns
+    @return: views of the lot ID, amount, reference price, bought price and
+    percentage state columns, holding only the stored purchases
+    @return: the lot ID the next purchase added will get
+    """
+    def GetColumns(self):
+        count = self.__count
+        return (self.__lotIDs[:count], self.__amounts[:count], self.__referencePrices[:count],
+                self.__boughtPrices[:count], self.__states[:count]), self.__nextLotID
+
+    """
+    GetRow
+    @param index: the index of a particular active purchase
+    @return: the active purchase at that index
+    """
+    def GetRow(self, index: int):
+        return ActivePurchase(int(self.__lotIDs[index]),
+                              float(self.__amounts[index]),
+                              float(self.__referencePrices[index]),
+                              float(self.__boughtPrices[index]),
+                              CryptoCurrencyPercentageStates(int(self.__states[index])))
+
+    """
+    GetLot
+    @param lotID: the lot ID of a particular active purchase
+    @return: the active purchase with that lot ID
+    """
+    def GetLot(self, lotID: int):
+        return self.GetRow(self.__rowsByLotID[lotID])
+
+    """
+    HasLot
+    @param lotID: the lot ID of a particular active purchase
+    @return: if the store still holds that active purchase
+    """
+    def HasLot(self, lotID: int):
+        return lotID in self.__rowsByLotID
+
+    """
+    ToList
+    @return: every active purchase
+    """
+    def ToList(self):
+        return [self.GetRow(index) for index in range(self.__count)]
+
+    """
+    GetLots
+    @param lotIDs: the lot IDs of some active purchases
+    @return: the active purchases with those lot IDs
+    """
+    def GetLots(self, lotIDs):
+        return [self.GetLot(lotID) for lotID in lotIDs]
+
+    """
+    SetState
+    @param index: the index of a particular active purchase
+    @param percentageState: The percentage state to set
+    """
+    def SetState(self, index: int, percentageState):
+        lotID = int(self.__lotIDs[index])
+        self.__triggerBook.Remove(lotID, self.__referencePrices[index], self.__states[index])
+        self.__states[index] = int(percentageState)
+        self.__triggerBook.Add(lotID, self.__referencePrices[index], self.__states[index])
+        self.__version = self.__version + 1
+        if self.__mutationListener is not None:
+            self.__mutationListener(CryptoAccountMutations.LotStateChanged, lotID, 0.0, 0.0, 0.0, int(percentageState))
+
+    """
+    SetReferencePrice
+    @param index: the index of a particular active purchase
+    @param referencePrice: The reference price to set
+    """
+    def SetReferencePrice(self, index: int, referencePrice: float):
+        lotID = int(self.__lotIDs[index])
+        self.__triggerBook.Remove(lotID, self.__referencePrices[index], self.__states[index])
+        self.__referencePrices[index] = referencePrice
+        self.__triggerBook.Add(lotID, self.__referencePrices[index], self.__states[index])
+        self.__version = self.__version + 1
+        if self.__mutationListener is not None:
+            self.__mutationListener(CryptoAccountMutations.LotReferencePriceChanged, lotID, 0.0,
+                                    float(referencePrice), 0.0, 0)
+
+    """
+    SetLotAmount
+    Changes how much coin an active purchase holds, EX: when only part of it was sold
+    @param lotID: the lot ID of the active purchase
+    @param amount: the amount of coin it holds now
+    """
+    def SetLotAmount(self, lotID: int, amount: float):
+        self.__amounts[self.__rowsByLotID[lotID]] = amount
+        self.__version = self.__version + 1
+        if self.__mutationListener is not None:
+            self.__mutationListener(CryptoAccountMutations.LotAmountChanged, lotID, float(amount), 0.0, 0.0, 0)
+
+    """
+    Remove
+    Removes an active purchase, by its lot ID when it is an ActivePurchase, otherwise
+    the first purchase which matches a [amount, referencePrice, boughtPrice, state] list
+    @param activePurchaseToRemove: the active purchase to remove
+    """
+    def Remove(self, activePurchaseToRemove):
+        if isinstance(activePurchaseToRemove, ActivePurchase):
+            self.RemoveLot(activePurchaseToRemove.lotID)
+            return
+
+        for index in range(self.__count):
+            if self.GetRow(index).ToList() == list(activePurchaseToRemove):
+                self.RemoveLot(int(self.__lotIDs[index]))
+                return
+        raise ValueError("The active purchase to remove is not in the store")
+
+    """
+    RemoveLot
+    Removes an active purchase by moving the last purchase into its row
+    @param lotID: the lot ID of the active purchase to remove
+    """
+    def RemoveLot(self, lotID: int):
+        index = self.__rowsByLotID.pop(lotID)
+        self.__triggerBook.Remove(lotID, self.__referencePrices[index], self.__states[index])
+        lastIndex = self.__count - 1
+        if index != lastIndex:
+            for column in (self.__lotIDs, self.__amounts, self.__referencePrices, self.__boughtPrices, self.__states):
+                column[index] = column[lastIndex]
+            self.__rowsByLotID[int(self.__lotIDs[index])] = index
+        self.__count = lastIndex
+        self.__version = self.__version + 1
+        if self.__mutationListener is not None:
+            self.__mutationListener(CryptoAccountMutations.LotRemoved, lotID, 0.0, 0.0, 0.0, 0)
+
+    """
+    Evaluate
+    Evaluates the active purchases against the current price:
+    neutral and down purchases have their percentage state updated, up purchases
+    which have risen far enough have their reference price raised.
+    Only the purchases the trigger book finds crossing a threshold are touched
+    @param currentPrice: the current price of the crypto currency
+    @param cryptoSettings: the settings of the crypto currency
+    @return: the lot IDs of the active purchases which should be sold
+    """
+    def Evaluate(self, currentPrice: float, cryptoSettings):
+        stateChanges, raisedLotIDs, newReferencePrice = self.__triggerBook.Evaluate(currentPrice, cryptoSettings)
+        for lotID, percentageState in stateChanges:
+            self.__states[self.__rowsByLotID[lotID]] = int(percentageState)
+        for lotID in raisedLotIDs:
+            self.__referencePrices[self.__rowsByLotID[lotID]] = newReferencePrice
+        if stateChanges or raisedLotIDs:
+            self.__version = self.__version + 1
+            if self.__mutationListener is not None:
+                for lotID, percentageState in stateChanges:
+                    self.__mutationListener(CryptoAccountMutations.LotStateChanged, lotID,
+                                            0.0, 0.0, 0.0, int(percentageState))
+                for lotID in raisedLotIDs:
+                    self.__mutationListener(CryptoAccountMutations.LotReferencePriceChanged, lotID,
+                                            0.0, float(newReferencePrice), 0.0, 0)
+
+        return self.GetLotsToSell(currentPrice, cryptoSettings.HighToDownSellOutPercentageThreshold)
+
+    """
+    GetLotsToSell
+    @param currentPrice: the current price of the crypto currency
+    @param highToDownSellOutPercentageThreshold: the percentage an up purchase
+    has to fall to before it is sold
+    @return: the lot IDs of the active purchases which should be sold
+    """
+    def GetLotsToSell(self, currentPrice: float, highToDownSellOutPercentageThreshold: float):
+        return self.__triggerBook.GetLotsToSell(currentPrice, highToDownSellOutPercentageThreshold)
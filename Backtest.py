@@ -0,0 +1,246 @@
+# Backtest
+# Replays a historical tick or candle file through the real MasterBot
+# decision making against a simulated exchange, without the one second
+# pacing or any file logging, and reports how the settings would have done
+#
+# Usage: python Backtest.py <history.csv> [--settings crypto_settings] [--usd 1000]
+# The history file needs a header with time and product_id columns and either
+# a price column (ticks) or a close column (candles)
+import argparse
+import csv
+import datetime
+import json
+import os
+import time
+from array import array
+import MasterBot
+import MasterBotConstants
+import SimulatedClient
+
+"""
+LoadCryptoSettingsFromFolder
+Reads all of the crypto setting .json files in a folder
+@param cryptoSettingsFolderPath: the folder holding the crypto setting files
+@return: a list of all the crypto settings
+"""
+def LoadCryptoSettingsFromFolder(cryptoSettingsFolderPath: str):
+    cryptoSettingsList = []
+    for filename in sorted(os.listdir(cryptoSettingsFolderPath)):
+        cryptoSettingsPath = os.path.join(cryptoSettingsFolderPath, filename)
+        if not os.path.isfile(cryptoSettingsPath):
+            continue
+        cryptoSettingsFile = open(cryptoSettingsPath, "r")
+        cryptoSettingsList.append(json.load(cryptoSettingsFile))
+        cryptoSettingsFile.close()
+    return cryptoSettingsList
+
+"""
+ParseTimestamp
+@param rawTimestamp: a time as seconds since the epoch or in ISO format
+@return: the time as seconds since the epoch
+"""
+def ParseTimestamp(rawTimestamp: str):
+    try:
+        return float(rawTimestamp)
+    except ValueError:
+        return datetime.datetime.fromisoformat(rawTimestamp.replace("Z", "+00:00")).timestamp()
+
+class PriceHistory:
+    # Every price in a history file stored as flat columns, in the order they happened
+    def __init__(self, productIds, productIndexes, prices, timestamps):
+        self.productIds = productIds  # the product IDs used in the history
+        self.productIndexes = productIndexes  # for each tick, the index of its product ID
+        self.prices = prices  # for each tick, the price
+        self.timestamps = timestamps  # for each tick, the time in seconds since the epoch
+
+    def __len__(self):
+        return len(self.prices)
+
+"""
+LoadPriceHistory
+Reads a tick (time, product_id, price) or candle (time, product_id, open, high,
+low, close, volume) file, candles are replayed at their closing price
+@param historyFilePath: the path of the file to read
+@param productIdsToKeep: only ticks for these product IDs are kept, or None to keep them all
+@return: the PriceHistory sorted by time
+"""
+def LoadPriceHistory(historyFilePath: str, productIdsToKeep=None):
+    historyFile = open(historyFilePath, "r", newline="")
+    reader = csv.reader(historyFile)
+    header = [column.strip().lower() for column in next(reader)]
+    timeColumn = header.index("time")
+    productColumn = header.index("product_id")
+    priceColumn = header.index("close") if "close" in header else header.index("price")
+
+    rows = []
+    for row in reader:
+        if not row:
+            continue
+        productId = row[productColumn].strip()
+        if productIdsToKeep is not None and productId not in productIdsToKeep:
+            continue
+        rows.append((ParseTimestamp(row[timeColumn]), productId, float(row[priceColumn])))
+    historyFile.close()
+    # stable, so ticks with the same time keep their order in the file
+    rows.sort(key=lambda historyRow: historyRow[0])
+
+    productIds = []
+    productIndexesById = {}
+    productIndexes = array("H")
+    prices = array("d")
+    timestamps = array("d")
+    for timestamp, productId, price in rows:
+        if productId not in productIndexesById:
+            productIndexesById[productId] = len(productIds)
+            productIds.append(productId)
+        productIndexes.append(productIndexesById[productId])
+        prices.append(price)
+        timestamps.append(timestamp)
+
+    return PriceHistory(productIds, productIndexes, prices, timestamps)
+
+class BacktestReport:
+    def __init__(self, startingEquity: float, finalEquity: float, buyCount: int, sellCount: int,
+                 feesPaid: float, maxDrawdown: float, maxDrawdownPercentage: float,
+                 tickCount: int, elapsedSeconds: float):
+        self.startingEquity = startingEquity
+        self.finalEquity = finalEquity
+        self.profitAndLoss = finalEquity - startingEquity
+        self.profitAndLossPercentage = (self.profitAndLoss / startingEquity) * 100.0 if startingEquity else 0.0
+        self.buyCount = buyCount
+        self.sellCount = sellCount
+        self.tradeCount = buyCount + sellCount
+        self.feesPaid = feesPaid
+        self.maxDrawdown = maxDrawdown
+        self.maxDrawdownPercentage = maxDrawdownPercentage
+        self.tickCount = tickCount
+        self.elapsedSeconds = elapsedSeconds
+
+    """
+    ToDict
+    @return: the report as a dictionary which can be written out as json
+    """
+    def ToDict(self):
+        return dict(self.__dict__)
+
+    """
+    ToText
+    @return: the report as human readable lines
+    """
+    def ToText(self):
+        ticksPerMinute = (self.tickCount / self.elapsedSeconds) * 60.0 if self.elapsedSeconds else 0.0
+        return ("Starting Equity: " + str(round(self.startingEquity, 2)) + "\n" +
+                "Final Equity: " + str(round(self.finalEquity, 2)) + "\n" +
+                "P&L: " + str(round(self.profitAndLoss, 2)) +
+                " (" + str(round(self.profitAndLossPercentage, 2)) + "%)\n" +
+                "Trades: " + str(self.tradeCount) +
+                " (" + str(self.buyCount) + " buys, " + str(self.sellCount) + " sells)\n" +
+                "Fees Paid: " + str(round(self.feesPaid, 2)) + "\n" +
+                "Max Drawdown: " + str(round(self.maxDrawdown, 2)) +
+                " (" + str(round(self.maxDrawdownPercentage, 2)) + "%)\n" +
+                "Ticks: " + str(self.tickCount) + " in " + str(round(self.elapsedSeconds, 2)) + "s" +
+                " (" + str(int(ticksPerMinute)) + " ticks/min)\n")
+
+class Backtest:
+    def __init__(self, cryptoSettingsList, startingUSD: float,
+                 feeRate: float = MasterBotConstants.SIMULATED_FEE_RATE,
+                 slippageRate: float = MasterBotConstants.SIMULATED_SLIPPAGE_RATE,
+                 minSizes=None):
+        self.__cryptoSettingsList = cryptoSettingsList
+        self.__startingUSD = startingUSD
+        self.__feeRate = feeRate
+        self.__slippageRate = slippageRate
+        self.__minSizes = minSizes
+
+    """
+    Run
+    Replays every tick of the price history through a fresh MasterBot
+    @param priceHistory: the PriceHistory to replay
+    @return: the BacktestReport of the run
+    """
+    def Run(self, priceHistory: PriceHistory):
+        cryptoIDs = [cryptoSetting["id"] for cryptoSetting in self.__cryptoSettingsList]
+        client = SimulatedClient.SimulatedClient(self.__startingUSD, cryptoIDs, minSizes=self.__minSizes,
+                                                 feeRate=self.__feeRate, slippageRate=self.__slippageRate)
+        masterBot = MasterBot.MasterBot(accountKey="", accountB64secret="", accountPassphrase="",
+                                        usdAccountID=client.GetUSDAccountID(), operatingPath=".",
+                                        recordingLogFilename="", exceptionsLogFilename="",
+                                        transactionsLogFoldername="", cryptoBackupFoldername="",
+                                        cryptoSettingsFolderName="", client=client,
+                                        cryptoSettingsList=self.__cryptoSettingsList, enableFileOutput=False,
+                                        asynchronousOrders=False)
+
+        # Ticks for products without settings are skipped
+        cryptoIDsOfProducts = []
+        for productId in priceHistory.productIds:
+            cryptoID = productId[:productId.find("-")]
+            cryptoIDsOfProducts.append(cryptoID if cryptoID in cryptoIDs else None)
+
+        startingEquity = float(self.__startingUSD)
+        peakEquity = startingEquity
+        maxDrawdown = 0.0
+        maxDrawdownPercentage = 0.0
+        tickCount = 0
+
+        startTime = time.perf_counter()
+        for productIndex, price in zip(priceHistory.productIndexes, priceHistory.prices):
+            cryptoID = cryptoIDsOfProducts[productIndex]
+            if cryptoID is None:
+                continue
+
+            client.SetPrice(priceHistory.productIds[productIndex], price)
+            masterBot.UpdateCryptoAccount(cryptoID)
+            masterBot.UpdateUSDAccountAndAccountHoldings()
+            masterBot.RunDecisionPipelineForCryptoAccount(cryptoID)
+            tickCount = tickCount + 1
+
+            equity = masterBot.GetTotalHoldingsInUSD()
+            if equity > peakEquity:
+                peakEquity = equity
+            elif peakEquity - equity > maxDrawdown:
+                maxDrawdown = peakEquity - equity
+                maxDrawdownPercentage = (maxDrawdown / peakEquity) * 100.0
+        elapsedSeconds = time.perf_counter() - startTime
+
+        # Bring in the last of the balances before reporting
+        masterBot.StartNewTick()
+        masterBot.UpdateUSDAccountAndAccountHoldings()
+        for cryptoID in cryptoIDs:
+            masterBot.UpdateCryptoHoldings(cryptoID)
+        masterBot.UpdateTotalHoldingsInUSDFromAllAccounts()
+        finalEquity = masterBot.GetTotalHoldingsInUSD()
+        masterBot.CleanUp()
+
+        return BacktestReport(startingEquity, finalEquity, client.GetBuyCount(), client.GetSellCount(),
+                              client.GetFeesPaid(), maxDrawdown, maxDrawdownPercentage, tickCount, elapsedSeconds)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay price history through the MasterBot strategy")
+    parser.add_argument("historyFile", help="a csv of ticks (time,product_id,price) or candles (time,product_id,...,close)")
+    parser.add_argument("--settings", default="crypto_settings", help="the folder of crypto setting .json files")
+    parser.add_argument("--usd", type=float, default=1000.0, help="the USD to start with")
+    parser.add_argument("--fee", type=float, default=MasterBotConstants.SIMULATED_FEE_RATE, help="the fee rate per order")
+    parser.add_argument("--slippage", type=float, default=MasterBotConstants.SIMULATED_SLIPPAGE_RATE,
+                        help="how much worse than the price market orders fill")
+    parser.add_argument("--min-size", action="append", default=[], metavar="CRYPTOID=SIZE",
+                        help="the smallest tradable size of a crypto, may be repeated")
+    parser.add_argument("--json", help="also write the report to this json file")
+    arguments = parser.parse_args()
+
+    cryptoSettingsList = LoadCryptoSettingsFromFolder(arguments.settings)
+    minSizes = {}
+    for minSize in arguments.min_size:
+        cryptoID, size = minSize.split("=")
+        minSizes[cryptoID] = float(size)
+
+    priceHistory = LoadPriceHistory(arguments.historyFile,
+                                    set(cryptoSetting["id"] + "-USD" for cryptoSetting in cryptoSettingsList))
+    backtest = Backtest(cryptoSettingsList, arguments.usd, feeRate=arguments.fee,
+                        slippageRate=arguments.slippage, minSizes=minSizes)
+    report = backtest.Run(priceHistory)
+    print(report.ToText())
+
+    if arguments.json:
+        reportFile = open(arguments.json, "w")
+        json.dump(report.ToDict(), reportFile, indent=4)
+        reportFile.close()
@@ -0,0 +1,378 @@
+# Benchmark
+# Runs the real MasterBot main loop against an in-process fake exchange
+# (the simulated client, with latency and errors injected into its calls)
+# through the same request scheduler and background order pipeline the live
+# bot uses, for every combination of a number of products and a number of lots held per
+# crypto, and measures the tick latency, the REST calls made per tick, the
+# memory allocated and the peak RSS. Each scenario runs in its own process so
+# its peak RSS is its own, and the results are written to a json file so runs
+# from before and after a change can be compared
+#
+# Usage: python Benchmark.py [--products 1,10,100,500] [--lots 0,100,1000,10000] [--ticks 50]
+#                            [--latency-ms 0] [--error-rate 0] [--synchronous-orders]
+#                            [--output benchmark.json]
+import argparse
+import json
+import multiprocessing
+import platform
+import random
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+import MasterBot
+import RequestScheduler
+import SimulatedClient
+
+# The price every product starts at
+STARTING_PRICE = 100.0
+# The size of each of the lots held from before the benchmark starts
+LOT_SIZE_IN_COIN = 0.001
+
+class InjectedError(Exception):
+    # Raised by the fake exchange in place of a failed REST call
+    pass
+
+class FaultInjectingClient:
+    # Wraps the simulated client so every call to it takes as long as a
+    # REST call would and fails as often as asked, counting the calls made
+    def __init__(self, simulatedClient, latencySeconds: float = 0.0, errorRate: float = 0.0, seed: int = 0):
+        self.__simulatedClient = simulatedClient
+        self.__latencySeconds = latencySeconds
+        self.__errorRate = errorRate  # the chance of each call raising instead of answering
+        self.__random = random.Random(seed)
+        # The bot calls from several threads, but the simulated client keeps its balances unlocked
+        self.__lock = threading.Lock()
+        self.__callCounts = {}  # maps the client method to how many times it was called
+        self.__errorCount = 0
+
+    """
+    Call
+    Makes a call on the simulated client after the injected latency, unless an error is injected
+    @param methodName: the name of the client method to call
+    @return: what the client method returns
+    @raise InjectedError: if the call was chosen to fail
+    """
+    def __Call(self, methodName: str, *args, **kwargs):
+        if self.__latencySeconds > 0.0:
+            time.sleep(self.__latencySeconds)
+        with self.__lock:
+            self.__callCounts[methodName] = self.__callCounts.get(methodName, 0) + 1
+            if self.__errorRate > 0.0 and self.__random.random() < self.__errorRate:
+                self.__errorCount = self.__errorCount + 1
+                raise InjectedError("Injected failure of " + methodName)
+            return getattr(self.__simulatedClient, methodName)(*args, **kwargs)
+
+    """
+    GetCallCounts
+    @return: a copy of how many times each client method was called
+    """
+    def GetCallCounts(self):
+        with self.__lock:
+            return dict(self.__callCounts)
+
+    """
+    GetErrorCount
+    @return: how many calls were made to fail
+    """
+    def GetErrorCount(self):
+        return self.__errorCount
+
+    # The client methods the bot uses, with the same names and arguments as the coinbase pro client
+
+    def get_account(self, account_id):
+        return self.__Call("get_account", account_id)
+
+    def get_accounts(self):
+        return self.__Call("get_accounts")
+
+    def get_currencies(self):
+        return self.__Call("get_currencies")
+
+    def get_products(self):
+        return self.__Call("get_products")
+
+    def get_product_ticker(self, product_id):
+        return self.__Call("get_product_ticker", product_id=product_id)
+
+    def get_order(self, order_id):
+        return self.__Call("get_order", order_id)
+
+    def buy(self, product_id, order_type="market", **kwargs):
+        return self.__Call("buy", product_id, order_type, **kwargs)
+
+    def sell(self, product_id, order_type="market", **kwargs):
+        return self.__Call("sell", product_id, order_type, **kwargs)
+
+"""
+GetPercentile
+@param sortedValues: the values to take the percentile of, sorted
+@param percentile: the percentile, from 0 to 100
+@return: the value at that percentile, 0 if there are no values
+"""
+def GetPercentile(sortedValues, percentile: float):
+    if not sortedValues:
+        return 0.0
+    index = min(int(round((percentile / 100.0) * (len(sortedValues) - 1))), len(sortedValues) - 1)
+    return sortedValues[index]
+
+"""
+GetPeakRSSBytes
+@return: the peak resident set size of this process in bytes
+"""
+def GetPeakRSSBytes():
+    peakRSS = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports it in kilobytes, macOS in bytes
+    if sys.platform == "darwin":
+        return peakRSS
+    return peakRSS * 1024
+
+"""
+MakeCryptoSettings
+@param cryptoID: The crypto ID of the cryptocurrency
+@return: crypto settings for a made up product, the same as the example settings
+"""
+def MakeCryptoSettings(cryptoID: str):
+    return {"id": cryptoID, "LowPercentageThreshold": -2, "HighPercentageThreshold": 2,
+            "LowToUpBuyInPercentageThreshold": -1, "MaxPercentageDown": -10,
+            "HighToDownSellOutPercentageThreshold": 1, "AdjustReferencePriceDownThreshold": -5,
+            "AdjustReferencePriceUpThreshold": 5, "SmallestAmountToBuyInUSD": 10,
+            "LargestAmountToBuyInUSD": 50, "MaxPortfolioPercentage": 40}
+
+class BenchmarkResult:
+    def __init__(self, productCount: int, lotsPerTracker: int, tickCount: int,
+                 latencySeconds: float, errorRate: float, setupSeconds: float, tickSeconds,
+                 callCounts, errorCount: int, throttledCount: int, coalescedCount: int, synchronousOrders: bool,
+                 allocationTickCount: int, peakTickAllocatedBytes: int, retainedBytesPerTick: float,
+                 peakRSSBytes: int):
+        self.productCount = productCount
+        self.lotsPerTracker = lotsPerTracker
+        self.tickCount = tickCount
+        self.latencySeconds = latencySeconds  # injected into every REST call
+        self.errorRate = errorRate  # injected into every REST call
+        self.setupSeconds = setupSeconds  # building the bot and restoring its lots
+
+        sortedTickSeconds = sorted(tickSeconds)
+        self.tickSecondsMean = sum(tickSeconds) / len(tickSeconds) if tickSeconds else 0.0
+        self.tickSecondsP50 = GetPercentile(sortedTickSeconds, 50)
+        self.tickSecondsP95 = GetPercentile(sortedTickSeconds, 95)
+        self.tickSecondsP99 = GetPercentile(sortedTickSeconds, 99)
+        self.tickSecondsMax = sortedTickSeconds[-1] if sortedTickSeconds else 0.0
+
+        self.restCallsPerTick = sum(callCounts.values()) / tickCount if tickCount else 0.0
+        self.restCallsPerTickByMethod = {methodName: callCount / tickCount if tickCount else 0.0
+                                         for methodName, callCount in sorted(callCounts.items())}
+        self.errorCount = errorCount
+        # The calls the request scheduler held back for a rate limit, or answered with an identical call in flight
+        self.throttledCallsPerTick = throttledCount / tickCount if tickCount else 0.0
+        self.coalescedCallsPerTick = coalescedCount / tickCount if tickCount else 0.0
+        self.synchronousOrders = synchronousOrders  # orders were waited on in the tick instead of in the background
+
+        # Measured over extra ticks with tracemalloc on, which slows them down too much to time
+        self.allocationTickCount = allocationTickCount
+        self.peakTickAllocatedBytes = peakTickAllocatedBytes  # the most allocated at once during a tick
+        self.retainedBytesPerTick = retainedBytesPerTick  # still allocated after the tick ended
+        self.peakRSSBytes = peakRSSBytes
+
+    """
+    ToDict
+    @return: the result as a dictionary which can be written out as json
+    """
+    def ToDict(self):
+        return dict(self.__dict__)
+
+class Benchmark:
+    def __init__(self, productCount: int, lotsPerTracker: int, tickCount: int,
+                 latencySeconds: float = 0.0, errorRate: float = 0.0,
+                 allocationTickCount: int = 5, seed: int = 0, synchronousOrders: bool = False):
+        self.__productCount = productCount
+        self.__lotsPerTracker = lotsPerTracker
+        self.__tickCount = tickCount
+        self.__latencySeconds = latencySeconds
+        self.__errorRate = errorRate
+        self.__allocationTickCount = allocationTickCount
+        self.__random = random.Random(seed)
+        self.__seed = seed
+        self.__synchronousOrders = synchronousOrders
+
+    """
+    MovePrices
+    Takes a step of a random walk for the price of every product
+    @param client: the simulated client to set the prices on
+    @param productIds: the product IDs to move
+    @param prices: maps the product ID to its price, updated in place
+    """
+    def __MovePrices(self, client, productIds, prices):
+        for productId in productIds:
+            prices[productId] = prices[productId] * (1.0 + self.__random.gauss(0.0, 0.01))
+            client.SetPrice(productId, prices[productId])
+
+    """
+    RunTick
+    Runs one tick of the main loop the way cbpro-main does, with every crypto due to run
+    @param masterBot: the MasterBot to run
+    @param cryptoIDs: the crypto IDs it trades
+    """
+    @staticmethod
+    def __RunTick(masterBot, cryptoIDs):
+        masterBot.StartNewTick()
+        masterBot.UpdateCurrentPricesOfAllAccounts()
+        cryptoIDsToRun = []
+        for cryptoID in cryptoIDs:
+            if masterBot.IsPriceStale(cryptoID):
+                continue
+            if not masterBot.UpdateUSDAccountAndAccountHoldings() or not masterBot.UpdateCryptoHoldings(cryptoID):
+                continue
+            cryptoIDsToRun.append(cryptoID)
+        masterBot.RunDecisionPipelinesForCryptoAccounts(cryptoIDsToRun)
+        masterBot.FlushCryptoBackups()
+        masterBot.FlushTransactions()
+
+    """
+    Run
+    Builds a MasterBot against the fake exchange, restores the lots of every crypto and runs the ticks
+    @return: the BenchmarkResult of the run
+    """
+    def Run(self):
+        cryptoIDs = ["P" + str(productIndex).zfill(3) for productIndex in range(self.__productCount)]
+        productIds = [cryptoID + "-USD" for cryptoID in cryptoIDs]
+        prices = {productId: STARTING_PRICE for productId in productIds}
+
+        # Enough USD that buys are never turned down for a lack of it
+        simulatedClient = SimulatedClient.SimulatedClient(1000.0 * self.__productCount * (self.__lotsPerTracker + 1),
+                                                          cryptoIDs)
+        for productId in productIds:
+            simulatedClient.SetPrice(productId, prices[productId])
+        for cryptoID in cryptoIDs:
+            simulatedClient.SetCryptoBalance(cryptoID, self.__lotsPerTracker * LOT_SIZE_IN_COIN)
+        client = FaultInjectingClient(simulatedClient, self.__latencySeconds, self.__errorRate, self.__seed)
+        # Rate limited, prioritized and coalesced the same as the live bot's calls
+        requestScheduler = RequestScheduler.RequestScheduler(client)
+
+        setupStartTime = time.perf_counter()
+        masterBot = MasterBot.MasterBot(accountKey="", accountB64secret="", accountPassphrase="",
+                                        usdAccountID=simulatedClient.GetUSDAccountID(), operatingPath=".",
+                                        recordingLogFilename="", exceptionsLogFilename="",
+                                        transactionsLogFoldername="", cryptoBackupFoldername="",
+                                        cryptoSettingsFolderName="", client=requestScheduler,
+                                        cryptoSettingsList=[MakeCryptoSettings(cryptoID) for cryptoID in cryptoIDs],
+                                        enableFileOutput=False, asynchronousOrders=not self.__synchronousOrders)
+        # Lots bought well above the price, so they are evaluated on every tick without being sold off
+        for cryptoID in cryptoIDs:
+            cryptoAccountTracker = masterBot.GetCryptoAccountTracker(cryptoID)
+            for lotIndex in range(self.__lotsPerTracker):
+                cryptoAccountTracker.AddActivePurchase(LOT_SIZE_IN_COIN, STARTING_PRICE * 1.5)
+        masterBot.StartNewTick()
+        masterBot.UpdateUSDAccountAndAccountHoldings()
+        for cryptoID in cryptoIDs:
+            masterBot.UpdateCryptoAccount(cryptoID)
+        masterBot.UpdateTotalHoldingsInUSDFromAllAccounts()
+        masterBot.UpdatePortfolioPercentagesOfAllAccounts()
+        setupSeconds = time.perf_counter() - setupStartTime
+
+        callCountsBeforeTicks = client.GetCallCounts()
+        throttledCountBeforeTicks = requestScheduler.GetThrottledCount()
+        coalescedCountBeforeTicks = requestScheduler.GetCoalescedCount()
+        tickSeconds = []
+        for tickIndex in range(self.__tickCount):
+            self.__MovePrices(simulatedClient, productIds, prices)
+            tickStartTime = time.perf_counter()
+            self.__RunTick(masterBot, cryptoIDs)
+            tickSeconds.append(time.perf_counter() - tickStartTime)
+        callCounts = client.GetCallCounts()
+        for methodName, callCount in callCountsBeforeTicks.items():
+            callCounts[methodName] = callCounts[methodName] - callCount
+        throttledCount = requestScheduler.GetThrottledCount() - throttledCountBeforeTicks
+        coalescedCount = requestScheduler.GetCoalescedCount() - coalescedCountBeforeTicks
+
+        peakTickAllocatedBytes = 0
+        retainedBytes = 0
+        tracemalloc.start()
+        for tickIndex in range(self.__allocationTickCount):
+            self.__MovePrices(simulatedClient, productIds, prices)
+            tickStartBytes = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            self.__RunTick(masterBot, cryptoIDs)
+            tickEndBytes, tickPeakBytes = tracemalloc.get_traced_memory()
+            peakTickAllocatedBytes = max(peakTickAllocatedBytes, tickPeakBytes - tickStartBytes)
+            retainedBytes = retainedBytes + (tickEndBytes - tickStartBytes)
+        tracemalloc.stop()
+        masterBot.CleanUp()
+
+        return BenchmarkResult(self.__productCount, self.__lotsPerTracker, self.__tickCount,
+                               self.__latencySeconds, self.__errorRate, setupSeconds, tickSeconds,
+                               callCounts, client.GetErrorCount(), throttledCount, coalescedCount,
+                               self.__synchronousOrders, self.__allocationTickCount, peakTickAllocatedBytes,
+                               retainedBytes / self.__allocationTickCount if self.__allocationTickCount else 0.0,
+                               GetPeakRSSBytes())
+
+"""
+RunScenario
+Runs one benchmark, in the process of its own it is handed to
+@param benchmarkArguments: the arguments of the Benchmark
+@return: the BenchmarkResult as a dictionary
+"""
+def RunScenario(benchmarkArguments):
+    return Benchmark(**benchmarkArguments).Run().ToDict()
+
+"""
+ParseCounts
+@param rawCounts: a comma separated list of counts, EX: 1,10,100
+@return: the counts as ints
+"""
+def ParseCounts(rawCounts: str):
+    return [int(rawCount) for rawCount in rawCounts.split(",") if rawCount.strip()]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the MasterBot main loop against a fake exchange")
+    parser.add_argument("--products", default="1,10,100,500", help="the numbers of products to run, comma separated")
+    parser.add_argument("--lots", default="0,100,1000,10000",
+                        help="the numbers of lots held per crypto to run, comma separated")
+    parser.add_argument("--ticks", type=int, default=50, help="how many ticks to time in each scenario")
+    parser.add_argument("--allocation-ticks", type=int, default=5,
+                        help="how many more ticks to measure the allocations of")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="how long every REST call takes")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="the chance of each REST call failing")
+    parser.add_argument("--seed", type=int, default=0, help="seeds the price walk and the injected errors")
+    parser.add_argument("--synchronous-orders", action="store_true",
+                        help="wait on each order in the tick instead of placing it in the background")
+    parser.add_argument("--output", default="benchmark.json", help="the json file to write the results to")
+    arguments = parser.parse_args()
+
+    startedTime = time.time()
+    results = []
+    # A fresh process for every scenario, so one scenario's peak RSS doesn't carry over into the next
+    processPool = multiprocessing.get_context("spawn").Pool(processes=1, maxtasksperchild=1)
+    for productCount in ParseCounts(arguments.products):
+        for lotsPerTracker in ParseCounts(arguments.lots):
+            result = processPool.apply(RunScenario, ({"productCount": productCount,
+                                                      "lotsPerTracker": lotsPerTracker,
+                                                      "tickCount": arguments.ticks,
+                                                      "latencySeconds": arguments.latency_ms / 1000.0,
+                                                      "errorRate": arguments.error_rate,
+                                                      "allocationTickCount": arguments.allocation_ticks,
+                                                      "seed": arguments.seed,
+                                                      "synchronousOrders": arguments.synchronous_orders},))
+            results.append(result)
+            print("Products: " + str(productCount) + " Lots: " + str(lotsPerTracker) +
+                  " Tick p50: " + str(round(result["tickSecondsP50"] * 1000.0, 3)) + "ms" +
+                  " p99: " + str(round(result["tickSecondsP99"] * 1000.0, 3)) + "ms" +
+                  " REST/tick: " + str(round(result["restCallsPerTick"], 1)) +
+                  " Throttled/tick: " + str(round(result["throttledCallsPerTick"], 1)) +
+                  " Tick Alloc: " + str(round(result["peakTickAllocatedBytes"] / 1024.0, 1)) + "KiB" +
+                  " Peak RSS: " + str(round(result["peakRSSBytes"] / (1024.0 * 1024.0), 1)) + "MiB")
+    processPool.close()
+    processPool.join()
+
+    outputFile = open(arguments.output, "w")
+    json.dump({"startedTime": startedTime,
+               "python": platform.python_version(),
+               "platform": platform.platform(),
+               "ticks": arguments.ticks,
+               "latencySeconds": arguments.latency_ms / 1000.0,
+               "errorRate": arguments.error_rate,
+               "seed": arguments.seed,
+               "synchronousOrders": arguments.synchronous_orders,
+               "results": results}, outputFile, indent=4)
+    outputFile.close()
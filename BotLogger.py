@@ -0,0 +1,195 @@
+# Bot Logger
+# A class which writes a log file from its own thread so that logging never
+# opens, closes or waits on a file in the trading loop. Messages go through a
+# bounded queue and are written out in batches, synced to disk according to the
+# fsync policy. The same message repeating over and over (EX: during an outage)
+# is written once, followed by one line with how many more times it happened
+import datetime
+import os
+import queue
+import threading
+import MasterBotConstants
+
+# fsync policies, if the file is synced after every batch or never (left to the operating system)
+FSYNC_EVERY_BATCH = "batch"
+FSYNC_NEVER = "never"
+
+# the kinds of entries on the queue
+RAW_TEXT = 0
+MESSAGE = 1
+STOP = 2
+
+class BotLogger:
+    def __init__(self, logFilePath: str, firstMessage: str, aggregateDuplicates: bool = True,
+                 queueSize: int = MasterBotConstants.LOG_QUEUE_SIZE,
+                 flushIntervalSeconds: float = MasterBotConstants.LOG_FLUSH_INTERVAL_SECONDS,
+                 fsyncPolicy: str = MasterBotConstants.LOG_FSYNC_POLICY,
+                 duplicateWindowSeconds: float = MasterBotConstants.LOG_DUPLICATE_WINDOW_SECONDS):
+
+        if not os.path.exists(logFilePath):
+            self.__logFile = open(logFilePath, 'w')
+            self.__logFile.write(firstMessage)
+        else:
+            self.__logFile = open(logFilePath, 'a')
+
+        self.__aggregateDuplicates = aggregateDuplicates
+        self.__flushIntervalSeconds = flushIntervalSeconds
+        self.__fsyncPolicy = fsyncPolicy
+        self.__duplicateWindowSeconds = duplicateWindowSeconds
+
+        self.__queue = queue.Queue(maxsize=queueSize)
+        self.__droppedCount = 0  # entries thrown away because the queue was full
+        self.__reportedDroppedCount = 0
+        # maps a message to [first time, last time, times repeated] while its window is open
+        self.__recentMessages = {}
+
+        self.__writerThread = threading.Thread(target=self.__Run, daemon=True)
+        self.__writerThread.start()
+
+    """
+    Put
+    Queues an entry for the writer thread without ever waiting on it,
+    the entry is dropped (and counted) if the queue is full
+    @param entry: a (kind, time, text) tuple
+    """
+    def __Put(self, entry):
+        try:
+            self.__queue.put_nowait(entry)
+        except queue.Full:
+            self.__droppedCount = self.__droppedCount + 1
+
+    """
+    Write
+    Writes text to the log file as it is
+    @param text: the text to write
+    """
+    def Write(self, text: str):
+        self.__Put((RAW_TEXT, None, text))
+
+    """
+    LogMessage
+    Writes a message to the log file under the current date and time
+    @param message: the message to write
+    """
+    def LogMessage(self, message: str):
+        self.__Put((MESSAGE, datetime.datetime.now(), message))
+
+    """
+    GetDroppedCount
+    @return: how many entries were dropped because the queue was full
+    """
+    def GetDroppedCount(self):
+        return self.__droppedCount
+
+    """
+    FormatMessage
+    @param messageTime: when the message was logged
+    @param message: the message
+    @return: the message as it is written to the log file
+    """
+    @staticmethod
+    def __FormatMessage(messageTime, message: str):
+        return str(messageTime) + "\n" + message + "\n\n"
+
+    """
+    FormatRepeats
+    @param message: the message which repeated
+    @param firstTime: when the message was first logged
+    @param lastTime: when the message was last logged
+    @param repeatCount: how many more times the message was logged after the first
+    @return: the line written to the log file for the repeats
+    """
+    @staticmethod
+    def __FormatRepeats(message: str, firstTime, lastTime, repeatCount: int):
+        return (str(lastTime) + "\n" + message + "\n" + "(repeated " + str(repeatCount) +
+                " more times between " + str(firstTime) + " and " + str(lastTime) + ")\n\n")
+
+    """
+    AggregateMessage
+    @param messageTime: when the message was logged
+    @param message: the message
+    @return: the text to write for the message, empty if it is a duplicate which is only counted
+    """
+    def __AggregateMessage(self, messageTime, message: str):
+        if not self.__aggregateDuplicates:
+            return self.__FormatMessage(messageTime, message)
+
+        text = ""
+        if message in self.__recentMessages:
+            firstTime, lastTime, repeatCount = self.__recentMessages[message]
+            if (messageTime - firstTime).total_seconds() <= self.__duplicateWindowSeconds:
+                self.__recentMessages[message] = [firstTime, messageTime, repeatCount + 1]
+                return ""
+            if repeatCount != 0:
+                text = self.__FormatRepeats(message, firstTime, lastTime, repeatCount)
+        self.__recentMessages[message] = [messageTime, messageTime, 0]
+        return text + self.__FormatMessage(messageTime, message)
+
+    """
+    CloseExpiredWindows
+    @param closeAll: close every window, not only the ones which have expired
+    @return: the repeat lines of the messages whose window is closed
+    """
+    def __CloseExpiredWindows(self, closeAll: bool):
+        text = ""
+        now = datetime.datetime.now()
+        for message in list(self.__recentMessages.keys()):
+            firstTime, lastTime, repeatCount = self.__recentMessages[message]
+            if closeAll or (now - firstTime).total_seconds() > self.__duplicateWindowSeconds:
+                if repeatCount != 0:
+                    text = text + self.__FormatRepeats(message, firstTime, lastTime, repeatCount)
+                del self.__recentMessages[message]
+        return text
+
+    """
+    Run
+    The writer thread, writes out whatever is queued in batches until it is stopped
+    """
+    def __Run(self):
+        running = True
+        while running:
+            batch = []
+            try:
+                batch.append(self.__queue.get(timeout=self.__flushIntervalSeconds))
+                while len(batch) < MasterBotConstants.LOG_MAX_BATCH_SIZE:
+                    batch.append(self.__queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            text = ""
+            for kind, entryTime, entryText in batch:
+                if kind == STOP:
+                    running = False
+                elif kind == MESSAGE:
+                    text = text + self.__AggregateMessage(entryTime, entryText)
+                else:
+                    text = text + entryText
+            text = text + self.__CloseExpiredWindows(closeAll=not running)
+
+            droppedCount = self.__droppedCount
+            if droppedCount != self.__reportedDroppedCount:
+                text = text + self.__FormatMessage(datetime.datetime.now(), str(droppedCount - self.__reportedDroppedCount) +
+                                                   " log messages were dropped because the log queue was full")
+                self.__reportedDroppedCount = droppedCount
+
+            if text:
+                self.__logFile.write(text)
+                self.__logFile.flush()
+                if self.__fsyncPolicy == FSYNC_EVERY_BATCH:
+                    try:
+                        os.fsync(self.__logFile.fileno())
+                    except OSError:
+                        pass  # EX: the null device can't be synced
+        self.__logFile.close()
+
+    """
+    Close
+    Writes out everything still queued and closes the log file
+    """
+    def Close(self):
+        if self.__writerThread is None:
+            return
+        # Unlike other entries the stop has to get through, so wait for room
+        self.__queue.put((STOP, None, None))
+        self.__writerThread.join()
+        self.__writerThread = None
@@ -0,0 +1,320 @@
+# Candle Aggregator
+# A class which builds OHLCV candles from the prices the bot already polls, so
+# its own history never has to be downloaded again. Prices are folded into
+# the finest candle (1 second by default) as they come in, and each candle is
+# rolled up into the next coarser one when it closes (1s into 1m, 1m into 5m,
+# 5m into 1h). Closed candles are batched and appended to one binary file per
+# product per interval, records of fixed size with no header, so a file is
+# only ever appended to and a torn record at the end is simply ignored. The
+# candles still open are saved on their own every so often and when the bot
+# stops, and picked up again when the crypto's next price comes in, so no
+# candle loses the prices from before a restart
+#
+# <candles folder>/<cryptoID>/<interval seconds>s.candles:
+# one CANDLE_DTYPE record per closed candle, oldest first
+# <candles folder>/<cryptoID>/open.candles:
+# one CANDLE_DTYPE record per interval (finest first) of the candles open when last saved, a count of 0 if none was
+import math
+import os
+import time
+import numpy as np
+import MasterBotConstants
+
+CANDLE_DTYPE = np.dtype([("start", "<f8"), ("open", "<f8"), ("high", "<f8"), ("low", "<f8"),
+                         ("close", "<f8"), ("volume", "<f8"), ("count", "<u8")])
+
+class Candle:
+    # An open candle which is still taking in prices
+    def __init__(self, start: float, openPrice: float, high: float, low: float, close: float,
+                 volume: float, count: int):
+        self.start = start  # the start of the candle's period in seconds since the epoch
+        self.open = openPrice
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume  # the traded volume, 0 when the prices come without it
+        self.count = count  # how many prices went into the candle
+
+    """
+    Merge
+    Takes a later candle (or a single price) of the same period into this one
+    @param candle: the candle to merge in
+    """
+    def Merge(self, candle):
+        self.high = max(self.high, candle.high)
+        self.low = min(self.low, candle.low)
+        self.close = candle.close
+        self.volume = self.volume + candle.volume
+        self.count = self.count + candle.count
+
+    """
+    ToBytes
+    @return: the candle as a CANDLE_DTYPE record
+    """
+    def ToBytes(self):
+        return np.array([(self.start, self.open, self.high, self.low, self.close, self.volume, self.count)],
+                        dtype=CANDLE_DTYPE).tobytes()
+
+class CandleAggregator:
+    def __init__(self, candlesFolderPath: str,
+                 intervalsSeconds=MasterBotConstants.CANDLE_INTERVALS_SECONDS,
+                 openCandlesSaveIntervalSeconds: float = MasterBotConstants.CANDLE_OPEN_SAVE_INTERVAL_SECONDS,
+                 clock=time.monotonic):
+        self.__candlesFolderPath = candlesFolderPath
+        # Finest first, each interval is a whole number of the one before it so candles roll up cleanly
+        self.__intervalsSeconds = sorted(intervalsSeconds)
+        for finerInterval, coarserInterval in zip(self.__intervalsSeconds, self.__intervalsSeconds[1:]):
+            if coarserInterval % finerInterval != 0:
+                raise ValueError("Each candle interval must be a multiple of the one before it")
+        self.__openCandles = {}  # maps the crypto ID to its open Candle (or None) of each interval
+        self.__pendingCandles = {}  # maps the (crypto ID, interval) to the closed candles not written yet
+        self.__candleFiles = {}  # maps the (crypto ID, interval) to its open candle file
+        self.__openCandlesSaveIntervalSeconds = openCandlesSaveIntervalSeconds
+        self.__clock = clock
+        self.__lastOpenCandlesSaveTime = self.__clock()
+        if not os.path.isdir(self.__candlesFolderPath):
+            os.mkdir(self.__candlesFolderPath)
+
+    """
+    GetCandleFilePath
+    @param cryptoID: the crypto ID of the cryptocurrency
+    @param intervalSeconds: the length of the candles
+    @return: the path of the file those candles are written to
+    """
+    def __GetCandleFilePath(self, cryptoID: str, intervalSeconds: int):
+        return self.__candlesFolderPath + "/" + cryptoID + "/" + str(intervalSeconds) + "s.candles"
+
+    """
+    GetOpenCandleFilePath
+    @param cryptoID: the crypto ID of the cryptocurrency
+    @return: the path of the file the open candles of that crypto are saved to
+    """
+    def __GetOpenCandleFilePath(self, cryptoID: str):
+        return self.__candlesFolderPath + "/" + cryptoID + "/open.candles"
+
+    """
+    GetLastCandleStart
+    @param cryptoID: the crypto ID of the cryptocurrency
+    @param intervalSeconds: the length of the candles
+    @return: the start of the latest candle written to that file, None if there is none
+    """
+    def __GetLastCandleStart(self, cryptoID: str, intervalSeconds: int):
+        candleFilePath = self.__GetCandleFilePath(cryptoID, intervalSeconds)
+        if not os.path.exists(candleFilePath):
+            return None
+        wholeRecordsLength = (os.path.getsize(candleFilePath) // CANDLE_DTYPE.itemsize) * CANDLE_DTYPE.itemsize
+        if wholeRecordsLength == 0:
+            return None
+        candleFile = open(candleFilePath, "rb")
+        candleFile.seek(wholeRecordsLength - CANDLE_DTYPE.itemsize)
+        lastCandle = np.frombuffer(candleFile.read(CANDLE_DTYPE.itemsize), dtype=CANDLE_DTYPE)[0]
+        candleFile.close()
+        return float(lastCandle["start"])
+
+    """
+    LoadOpenCandles
+    Picks up the candles of a crypto which were still open when the bot last stopped
+    @param cryptoID: the crypto ID of the cryptocurrency
+    @return: the open Candle (or None) of each interval
+    """
+    def __LoadOpenCandles(self, cryptoID: str):
+        openCandles = [None] * len(self.__intervalsSeconds)
+        openCandleFilePath = self.__GetOpenCandleFilePath(cryptoID)
+        if not os.path.exists(openCandleFilePath):
+            return openCandles
+        openCandleFile = open(openCandleFilePath, "rb")
+        openCandleBytes = openCandleFile.read()
+        openCandleFile.close()
+        # Saved with other intervals, they can't be rolled up into these ones
+        if len(openCandleBytes) != len(self.__intervalsSeconds) * CANDLE_DTYPE.itemsize:
+            return openCandles
+
+        for level, savedCandle in enumerate(np.frombuffer(openCandleBytes, dtype=CANDLE_DTYPE)):
+            if savedCandle["count"] == 0:
+                continue
+            # Already closed and written, EX: the file is left over from before a crash
+            lastCandleStart = self.__GetLastCandleStart(cryptoID, self.__intervalsSeconds[level])
+            if lastCandleStart is not None and lastCandleStart >= savedCandle["start"]:
+                continue
+            openCandles[level] = Candle(float(savedCandle["start"]), float(savedCandle["open"]),
+                                        float(savedCandle["high"]), float(savedCandle["low"]),
+                                        float(savedCandle["close"]), float(savedCandle["volume"]),
+                                        int(savedCandle["count"]))
+        return openCandles
+
+    """
+    SaveOpenCandles
+    Saves the candles of a crypto which are still open (through a temporary file so a
+    crash leaves the old ones) to be picked up again when the bot restarts
+    @param cryptoID: the crypto ID of the cryptocurrency
+    """
+    def __SaveOpenCandles(self, cryptoID: str):
+        openCandleFilePath = self.__GetOpenCandleFilePath(cryptoID)
+        if not os.path.isdir(os.path.dirname(openCandleFilePath)):
+            os.mkdir(os.path.dirname(openCandleFilePath))
+        openCandleFile = open(openCandleFilePath + ".tmp", "wb")
+        for candle in self.__openCandles[cryptoID]:
+            if candle is None:
+                openCandleFile.write(np.zeros(1, dtype=CANDLE_DTYPE).tobytes())
+            else:
+                openCandleFile.write(candle.ToBytes())
+        openCandleFile.flush()
+        os.fsync(openCandleFile.fileno())
+        openCandleFile.close()
+        os.replace(openCandleFilePath + ".tmp", openCandleFilePath)
+
+    """
+    GetPeriodStart
+    @param timestamp: a time in seconds since the epoch
+    @param intervalSeconds: the length of the candles
+    @return: the start of the candle the time falls in
+    """
+    @staticmethod
+    def __GetPeriodStart(timestamp: float, intervalSeconds: int):
+        return math.floor(timestamp / intervalSeconds) * intervalSeconds
+
+    """
+    CloseCandle
+    Sets aside the open candle of an interval to be written and rolls it up into the next coarser one
+    @param cryptoID: the crypto ID of the cryptocurrency
+    @param level: the index of the interval
+    """
+    def __CloseCandle(self, cryptoID: str, level: int):
+        openCandles = self.__openCandles[cryptoID]
+        candle = openCandles[level]
+        openCandles[level] = None
+        self.__pendingCandles.setdefault((cryptoID, self.__intervalsSeconds[level]), []).append(candle)
+        if level + 1 < len(self.__intervalsSeconds):
+            self.__RollUp(cryptoID, level + 1, candle)
+
+    """
+    RollUp
+    Folds a candle (or a single price as a candle) into the open candle of an interval,
+    closing that candle first if the new one is in a later period
+    @param cryptoID: the crypto ID of the cryptocurrency
+    @param level: the index of the interval to fold it into
+    @param candle: the candle to fold in
+    """
+    def __RollUp(self, cryptoID: str, level: int, candle: Candle):
+        openCandles = self.__openCandles[cryptoID]
+        periodStart = self.__GetPeriodStart(candle.start, self.__intervalsSeconds[level])
+        if openCandles[level] is not None and periodStart > openCandles[level].start:
+            self.__CloseCandle(cryptoID, level)
+        if openCandles[level] is None:
+            openCandles[level] = Candle(periodStart, candle.open, candle.high, candle.low, candle.close,
+                                        candle.volume, candle.count)
+        else:
+            # A late price (EX: from a slow request) is counted in the candle which is still open
+            openCandles[level].Merge(candle)
+
+    """
+    CloseCandlesBefore
+    Closes every open candle of a crypto whose period ended by the given time,
+    so a product whose price stops coming in still gets its candles written
+    @param cryptoID: the crypto ID of the cryptocurrency
+    @param timestamp: a time in seconds since the epoch
+    """
+    def CloseCandlesBefore(self, cryptoID: str, timestamp: float):
+        openCandles = self.__openCandles.get(cryptoID)
+        if openCandles is None:
+            return
+        for level, intervalSeconds in enumerate(self.__intervalsSeconds):
+            if openCandles[level] is not None and openCandles[level].start + intervalSeconds <= timestamp:
+                self.__CloseCandle(cryptoID, level)
+
+    """
+    AddPrice
+    Folds a price into the candles of a crypto
+    @param cryptoID: the crypto ID of the cryptocurrency
+    @param price: the price of one full coin in USD
+    @param timestamp: when the price was seen in seconds since the epoch
+    @param volume: the volume traded at that price, 0 if it isn't known
+    """
+    def AddPrice(self, cryptoID: str, price: float, timestamp: float, volume: float = 0.0):
+        if cryptoID not in self.__openCandles:
+            self.__openCandles[cryptoID] = self.__LoadOpenCandles(cryptoID)
+        self.CloseCandlesBefore(cryptoID, timestamp)
+        self.__RollUp(cryptoID, 0, Candle(timestamp, price, price, price, price, volume, 1))
+
+    """
+    GetOpenCandle
+    @param cryptoID: the crypto ID of the cryptocurrency
+    @param intervalSeconds: the length of the candle
+    @return: the Candle of that interval which is still open, None if there is none
+    """
+    def GetOpenCandle(self, cryptoID: str, intervalSeconds: int):
+        openCandles = self.__openCandles.get(cryptoID)
+        if openCandles is None:
+            return None
+        return openCandles[self.__intervalsSeconds.index(intervalSeconds)]
+
+    """
+    Flush
+    Appends every closed candle to its file, and saves the candles still open
+    if they haven't been for the save interval
+    """
+    def Flush(self):
+        for (cryptoID, intervalSeconds), candles in self.__pendingCandles.items():
+            if not candles:
+                continue
+            candleFile = self.__candleFiles.get((cryptoID, intervalSeconds))
+            if candleFile is None:
+                candleFilePath = self.__GetCandleFilePath(cryptoID, intervalSeconds)
+                if not os.path.isdir(os.path.dirname(candleFilePath)):
+                    os.mkdir(os.path.dirname(candleFilePath))
+                candleFile = open(candleFilePath, "ab")
+                # Throw away a record torn by a crash mid write, new records would be misaligned after it
+                wholeRecordsLength = (candleFile.tell() // CANDLE_DTYPE.itemsize) * CANDLE_DTYPE.itemsize
+                candleFile.truncate(wholeRecordsLength)
+                candleFile.seek(wholeRecordsLength)
+                self.__candleFiles[(cryptoID, intervalSeconds)] = candleFile
+            candleFile.write(b"".join(candle.ToBytes() for candle in candles))
+            candleFile.flush()
+            candles.clear()
+
+        # Saved after the closed candles are written so a saved candle is never older than the written ones
+        if self.__clock() - self.__lastOpenCandlesSaveTime >= self.__openCandlesSaveIntervalSeconds:
+            self.__SaveAllOpenCandles()
+
+    """
+    SaveAllOpenCandles
+    Saves the candles still open of every crypto
+    """
+    def __SaveAllOpenCandles(self):
+        for cryptoID in self.__openCandles:
+            self.__SaveOpenCandles(cryptoID)
+        self.__lastOpenCandlesSaveTime = self.__clock()
+
+    """
+    ReadCandles
+    @param cryptoID: the crypto ID of the cryptocurrency
+    @param intervalSeconds: the length of the candles
+    @param startTime: the earliest candle start to include, in seconds since the epoch, None for no limit
+    @param endTime: the latest candle start to include, in seconds since the epoch, None for no limit
+    @return: the written candles in that range as a CANDLE_DTYPE array, oldest first
+    """
+    def ReadCandles(self, cryptoID: str, intervalSeconds: int, startTime: float = None, endTime: float = None):
+        candleFilePath = self.__GetCandleFilePath(cryptoID, intervalSeconds)
+        if not os.path.exists(candleFilePath):
+            return np.zeros(0, dtype=CANDLE_DTYPE)
+        candleFile = open(candleFilePath, "rb")
+        candleBytes = candleFile.read()
+        candleFile.close()
+        candles = np.frombuffer(candleBytes[:(len(candleBytes) // CANDLE_DTYPE.itemsize) * CANDLE_DTYPE.itemsize],
+                                dtype=CANDLE_DTYPE)
+        # The candles are in order of their start, so the range is found with a binary search
+        firstRow = 0 if startTime is None else int(np.searchsorted(candles["start"], startTime, side="left"))
+        lastRow = len(candles) if endTime is None else int(np.searchsorted(candles["start"], endTime, side="right"))
+        return candles[firstRow:lastRow]
+
+    """
+    Close
+    Writes the closed candles and closes the files. The candles which are still open
+    are saved rather than written, the prices after a restart are added to them
+    """
+    def Close(self):
+        self.Flush()
+        self.__SaveAllOpenCandles()
+        for candleFile in self.__candleFiles.values():
+            candleFile.close()
+        self.__candleFiles = {}
@@ -4,7 +4,11 @@
 # and then perform an action on that cryptocurrency account on coinbase pro
 
 from CryptoStates import CryptoCurrencyPercentageStates
+from CryptoStates import CryptoAccountMutations
 from CryptoSettings import CryptoSettings
+from ActivePurchases import ActivePurchaseStore
+from PriceHistoryBuffer import PriceHistoryBuffer
+import MasterBotConstants
 
 class CryptoAccountTracker:
     def __init__(self, accountId: str, productId: str,
@@ -19,7 +23,9 @@ class CryptoAccountTracker:
 
         self.__referencePrice = 0.0  # in USD
         self.__currentPrice = 0.0  # in USD
+        self.__isPriceStale = True  # if the current price could not be refreshed on the latest tick
         self.__priceSinceLastTransaction = 0.0  # The price of the crypto during the latest transaction
+        self.__priceHistory = PriceHistoryBuffer()  # the latest prices and their rolling statistics
         self.__percentage = 0.0
         self.__cryptoPercentageState = CryptoCurrencyPercentageStates.Neutral
         self.__currentHoldings = 0.0
@@ -27,10 +33,18 @@ class CryptoAccountTracker:
         # to the rest
         self.__portfolioPercentage = 0.0
 
-        self.__activePurchases = []
+        self.__activePurchases = ActivePurchaseStore()
+        self.__lotsToSell = None  # lot IDs of the active purchases to sell, cleared whenever the price or purchases change
+
+        # If the reference price, the last transaction price or the active purchases changed since the
+        # backup was last written, the purchases are compared by their version
+        self.__isBackupDirty = True
+        self.__activePurchasesVersionInBackup = None
+        self.__mutationListener = None  # told about every change which is backed up, EX: a journal
 
         self.__renewPriceFlag = True
         self.__cryptoSettings = self.__InitCryptoSettings(cryptoSettingsJsonRaw)
+        self.__cryptoSettingsVersion = 0  # goes up every time the settings are replaced
 
     def __InitCryptoSettings(self, cryptoSettingsJsonRaw):
         cryptoSettings = CryptoSettings()
@@ -49,6 +63,12 @@ class CryptoAccountTracker:
         cryptoSettings.LargestAmountToBuyInUSD = float(cryptoSettingsJsonRaw["LargestAmountToBuyInUSD"])
 
         cryptoSettings.MaxPortfolioPercentage = float(cryptoSettingsJsonRaw["MaxPortfolioPercentage"])
+
+        # How often the decisions for this crypto may and must be run, optional
+        cryptoSettings.MinDecisionIntervalSeconds = float(cryptoSettingsJsonRaw.get(
+            "MinDecisionIntervalSeconds", MasterBotConstants.SCHEDULER_MIN_INTERVAL_SECONDS))
+        cryptoSettings.MaxDecisionIntervalSeconds = float(cryptoSettingsJsonRaw.get(
+            "MaxDecisionIntervalSeconds", MasterBotConstants.SCHEDULER_MAX_INTERVAL_SECONDS))
         return cryptoSettings
 
     """
@@ -105,6 +125,11 @@ class CryptoAccountTracker:
      reference for the percentage
      """
     def SetReferencePrice(self, referencePrice: float):
+        if referencePrice != self.__referencePrice:
+            self.__isBackupDirty = True
+            if self.__mutationListener is not None:
+                self.__mutationListener(CryptoAccountMutations.ReferencePriceChanged, 0, 0.0,
+                                        float(referencePrice), 0.0, 0)
         self.__referencePrice = referencePrice
 
     """
@@ -128,6 +153,11 @@ class CryptoAccountTracker:
     when the last transaction was completed
     """
     def SetPriceSinceLastTransaction(self, priceSinceLastTransaction: float):
+        if priceSinceLastTransaction != self.__priceSinceLastTransaction:
+            self.__isBackupDirty = True
+            if self.__mutationListener is not None:
+                self.__mutationListener(CryptoAccountMutations.LastTransactionPriceChanged, 0, 0.0,
+                                        float(priceSinceLastTransaction), 0.0, 0)
         self.__priceSinceLastTransaction = priceSinceLastTransaction
 
     """
@@ -141,9 +171,12 @@ class CryptoAccountTracker:
     """
     SetCurrentPrice
     @param currentPrice: The current price to set
+    @param timestamp: when the price was seen in seconds since the epoch, now if it isn't given
     """
-    def SetCurrentPrice(self, currentPrice: float):
+    def SetCurrentPrice(self, currentPrice: float, timestamp: float = None):
         self.__currentPrice = currentPrice
+        self.__priceHistory.Append(currentPrice, timestamp)
+        self.__lotsToSell = None
 
     """
     GetCurrentPrice
@@ -152,6 +185,28 @@ class CryptoAccountTracker:
     def GetCurrentPrice(self):
         return self.__currentPrice
 
+    """
+    GetPriceHistory
+    @return: the PriceHistoryBuffer of the latest prices and their EMAs, rolling means, variances, mins and maxes
+    """
+    def GetPriceHistory(self):
+        return self.__priceHistory
+
+    """
+    SetPriceStale
+    @param isPriceStale: if the current price could not be refreshed
+    and is left over from an earlier tick
+    """
+    def SetPriceStale(self, isPriceStale: bool):
+        self.__isPriceStale = isPriceStale
+
+    """
+    IsPriceStale
+    @return: if the current price is left over from an earlier tick
+    """
+    def IsPriceStale(self):
+        return self.__isPriceStale
+
     """
     CalculatePercentage
     Calculates the percentage standing of the crypto currency
@@ -211,16 +266,23 @@ class CryptoAccountTracker:
     Adds an active purchase for the crypto account tracker to keep
     track of
     @param amountBoughtInCoin: The amount of crypto coin spent on the purchase
-    """
-    def AddActivePurchase(self, amountBoughtInCoin: float):
-        self.__activePurchases.append([amountBoughtInCoin,
-                                       self.__currentPrice,  # This is the reference price
-                                       self.__currentPrice,
-                                       CryptoCurrencyPercentageStates.Neutral])
+    @param boughtPrice: the price the purchase filled at, the current price if None
+    @return: the lot ID of the new active purchase
+    """
+    def AddActivePurchase(self, amountBoughtInCoin: float, boughtPrice: float = None):
+        if boughtPrice is None:
+            boughtPrice = self.__currentPrice
+        lotID = self.__activePurchases.Add(amountBoughtInCoin,
+                                           boughtPrice,  # This is the reference price
+                                           boughtPrice,
+                                           CryptoCurrencyPercentageStates.Neutral)
+        self.__lotsToSell = None
+        return lotID
 
     #TODO: test
     def RestoreActivePurchasesFromBackup(self, activePurchaseBackup):
-        self.__activePurchases = activePurchaseBackup
+        self.__activePurchases.LoadFromList(activePurchaseBackup)
+        self.__lotsToSell = None
 
     """
     UpdateActivePurchasePercentageState
@@ -230,7 +292,8 @@ class CryptoAccountTracker:
     to set
     """
     def UpdateActivePurchasePercentageState(self, index: int, percentageState):
-        self.__activePurchases[index][3] = percentageState
+        self.__activePurchases.SetState(index, percentageState)
+        self.__lotsToSell = None
 
     """
     UpdateActivePurchaseReferencePrice
@@ -240,22 +303,104 @@ class CryptoAccountTracker:
     to set
     """
     def UpdateActivePurchaseReferencePrice(self, index: int, referencePrice: float):
-        self.__activePurchases[index][1] = referencePrice
+        self.__activePurchases.SetReferencePrice(index, referencePrice)
+        self.__lotsToSell = None
 
     """
     RemoveActivePurchase
     Removes an active purchase from the list of active purchases
-    @param activePurchaseToRemove: the active purchase to remove from the list
+    @param activePurchaseToRemove: the active purchase to remove from the list, an
+    ActivePurchase is removed by its lot ID
     """
     def RemoveActivePurchase(self, activePurchaseToRemove):
-        self.__activePurchases.remove(activePurchaseToRemove)
+        self.__activePurchases.Remove(activePurchaseToRemove)
+        self.__lotsToSell = None
+
+    """
+    RemoveActivePurchaseByLotID
+    Removes an active purchase from the list of active purchases
+    @param lotID: the lot ID of the active purchase to remove
+    """
+    def RemoveActivePurchaseByLotID(self, lotID: int):
+        self.__activePurchases.RemoveLot(lotID)
+        self.__lotsToSell = None
+
+    """
+    SetActivePurchaseAmount
+    Changes how much coin an active purchase holds, EX: the part of it left after a sell
+    @param lotID: the lot ID of the active purchase
+    @param amountInCoin: the amount of coin it holds now
+    """
+    def SetActivePurchaseAmount(self, lotID: int, amountInCoin: float):
+        self.__activePurchases.SetLotAmount(lotID, amountInCoin)
+        self.__lotsToSell = None
 
     """
     GetActivePurchases
-    @return: the list of active purchases
+    @return: the list of active purchases, each one can be indexed
+    like a [amount, referencePrice, boughtPrice, state] list
     """
     def GetActivePurchases(self):
-        return self.__activePurchases
+        return self.__activePurchases.ToList()
+
+    """
+    RestoreActivePurchaseColumns
+    Replaces the active purchases with ones which keep their lot IDs, EX: from a journal
+    @param columns: the lot ID, amount, reference price, bought price and percentage state columns
+    @param nextLotID: the lot ID the next purchase added will get
+    """
+    def RestoreActivePurchaseColumns(self, columns, nextLotID: int):
+        lotIDs, amounts, referencePrices, boughtPrices, states = columns
+        self.__activePurchases.RestoreColumns(lotIDs, amounts, referencePrices, boughtPrices, states, nextLotID)
+        self.__lotsToSell = None
+
+    """
+    GetActivePurchaseColumns
+    @return: the lot ID, amount, reference price, bought price and percentage state columns
+    @return: the lot ID the next purchase added will get
+    """
+    def GetActivePurchaseColumns(self):
+        return self.__activePurchases.GetColumns()
+
+    """
+    GetActivePurchaseCount
+    @return: how many active purchases are being held
+    """
+    def GetActivePurchaseCount(self):
+        return len(self.__activePurchases)
+
+    """
+    EvaluateActivePurchases
+    Updates the percentage state of every active purchase against the current
+    price and raises the reference price of the ones which have gone up enough
+    """
+    def EvaluateActivePurchases(self):
+        self.__lotsToSell = self.__activePurchases.Evaluate(self.__currentPrice, self.__cryptoSettings)
+
+    """
+    GetLotsToSell
+    @return: the lot IDs of the active purchases which should be sold at the current
+    price, reusing the ones from the latest evaluation if nothing changed
+    """
+    def __GetLotsToSell(self):
+        if self.__lotsToSell is None:
+            self.__lotsToSell = self.__activePurchases.GetLotsToSell(
+                self.__currentPrice, self.__cryptoSettings.HighToDownSellOutPercentageThreshold)
+        return self.__lotsToSell
+
+    """
+    ShouldSellActivePurchases
+    @return: if any of the active purchases should be sold at the current price
+    """
+    def ShouldSellActivePurchases(self):
+        return len(self.__GetLotsToSell()) > 0
+
+    """
+    GetActivePurchasesToSell
+    @return: the active purchases which should be sold at the current price
+    """
+    def GetActivePurchasesToSell(self):
+        return self.__activePurchases.GetLots(self.__GetLotsToSell())
 
     """
     GetCryptoSettings
@@ -263,3 +408,44 @@ class CryptoAccountTracker:
     """
     def GetCryptoSettings(self):
         return self.__cryptoSettings
+
+    """
+    SetCryptoSettings
+    Replaces the settings of this crypto account, EX: when its settings file was edited
+    @param cryptoSettingsJsonRaw: the new settings as read from the settings .json file
+    """
+    def SetCryptoSettings(self, cryptoSettingsJsonRaw):
+        self.__cryptoSettings = self.__InitCryptoSettings(cryptoSettingsJsonRaw)
+        self.__cryptoSettingsVersion = self.__cryptoSettingsVersion + 1
+        self.__lotsToSell = None
+
+    """
+    GetCryptoSettingsVersion
+    @return: how many times the settings of this crypto account have been replaced
+    """
+    def GetCryptoSettingsVersion(self):
+        return self.__cryptoSettingsVersion
+
+    """
+    IsBackupDirty
+    @return: if anything which is written to the backup has changed since it was last written
+    """
+    def IsBackupDirty(self):
+        return self.__isBackupDirty or self.__activePurchases.GetVersion() != self.__activePurchasesVersionInBackup
+
+    """
+    MarkBackupClean
+    Records that the backup was just written with the current values
+    """
+    def MarkBackupClean(self):
+        self.__isBackupDirty = False
+        self.__activePurchasesVersionInBackup = self.__activePurchases.GetVersion()
+
+    """
+    SetMutationListener
+    @param mutationListener: called as mutationListener(mutation, lotID, amount, referencePrice,
+    boughtPrice, state) for every change which is backed up, or None
+    """
+    def SetMutationListener(self, mutationListener):
+        self.__mutationListener = mutationListener
+        self.__activePurchases.SetMutationListener(mutationListener)
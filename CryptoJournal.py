@@ -0,0 +1,232 @@
+# Crypto Journal
+# A class which backs up a crypto account as a write-ahead journal instead
+# of rewriting a text file on every tick. Every change (a lot added or removed,
+# a reference price moved) is appended as one fixed size binary record, and once
+# enough records pile up they are compacted into a snapshot of the whole account.
+# Restoring memory maps the snapshot and replays the records written after it
+#
+# <cryptoID>.snapshot: a header followed by the lot ID, amount, reference price,
+# bought price and percentage state columns of every active purchase
+# <cryptoID>.journal: records, each with a crc so a torn record at the end is thrown away
+import mmap
+import os
+import struct
+import zlib
+import numpy as np
+from CryptoStates import CryptoAccountMutations
+import MasterBotConstants
+
+# mutation, sequence number, lot ID, amount, reference price, bought price, percentage state
+RECORD_FORMAT = struct.Struct("<BQqdddb")
+RECORD_CRC_FORMAT = struct.Struct("<I")
+RECORD_SIZE = RECORD_FORMAT.size + RECORD_CRC_FORMAT.size
+
+# magic, sequence number of the last record included, next lot ID,
+# reference price, last transaction price, number of active purchases
+SNAPSHOT_MAGIC = b"CJSNAP01"
+SNAPSHOT_HEADER_FORMAT = struct.Struct("<8sQqddQ")
+
+class CryptoJournal:
+    def __init__(self, backupFolderPath: str, cryptoID: str,
+                 compactAfterRecords: int = MasterBotConstants.JOURNAL_COMPACT_AFTER_RECORDS,
+                 fsyncOnCommit: bool = MasterBotConstants.JOURNAL_FSYNC_ON_COMMIT):
+
+        self.__snapshotFilePath = backupFolderPath + "/" + cryptoID + ".snapshot"
+        self.__journalFilePath = backupFolderPath + "/" + cryptoID + ".journal"
+        self.__compactAfterRecords = compactAfterRecords
+        self.__fsyncOnCommit = fsyncOnCommit
+
+        self.__journalFile = None
+        self.__pendingRecords = bytearray()  # records waiting for the next commit
+        self.__sequenceNumber = 0  # of the latest record
+        self.__recordsSinceSnapshot = 0
+
+    """
+    Exists
+    @return: if there is a snapshot or journal to restore from
+    """
+    def Exists(self):
+        return os.path.isfile(self.__snapshotFilePath) or os.path.isfile(self.__journalFilePath)
+
+    """
+    ReadSnapshot
+    Memory maps the snapshot and copies its purchases straight into the tracker
+    @param cryptoAccountTracker: the tracker to restore
+    @return: the sequence number of the last record in the snapshot
+    """
+    def __ReadSnapshot(self, cryptoAccountTracker):
+        if not os.path.isfile(self.__snapshotFilePath):
+            return 0
+
+        snapshotFile = open(self.__snapshotFilePath, "rb")
+        snapshotMap = mmap.mmap(snapshotFile.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, sequenceNumber, nextLotID, referencePrice, lastTransactionPrice, count = \
+            SNAPSHOT_HEADER_FORMAT.unpack_from(snapshotMap, 0)
+        if magic != SNAPSHOT_MAGIC:
+            snapshotMap.close()
+            snapshotFile.close()
+            raise ValueError("Not a crypto journal snapshot: " + self.__snapshotFilePath)
+
+        offset = SNAPSHOT_HEADER_FORMAT.size
+        columns = []
+        for dtype in (np.int64, np.float64, np.float64, np.float64, np.int8):
+            columns.append(np.frombuffer(snapshotMap, dtype=dtype, count=count, offset=offset))
+            offset = offset + count * np.dtype(dtype).itemsize
+        cryptoAccountTracker.RestoreActivePurchaseColumns(columns, nextLotID)
+        cryptoAccountTracker.SetReferencePrice(referencePrice)
+        cryptoAccountTracker.SetPriceSinceLastTransaction(lastTransactionPrice)
+
+        del columns  # the views have to go before the map can be closed
+        snapshotMap.close()
+        snapshotFile.close()
+        return sequenceNumber
+
+    """
+    ReadRecords
+    @return: every complete and intact record in the journal, as tuples
+    @return: the length of the journal up to the end of the last good record
+    """
+    def __ReadRecords(self):
+        if not os.path.isfile(self.__journalFilePath):
+            return [], 0
+
+        journalFile = open(self.__journalFilePath, "rb")
+        journalBytes = journalFile.read()
+        journalFile.close()
+
+        records = []
+        offset = 0
+        while offset + RECORD_SIZE <= len(journalBytes):
+            recordBytes = journalBytes[offset:offset + RECORD_FORMAT.size]
+            crc, = RECORD_CRC_FORMAT.unpack_from(journalBytes, offset + RECORD_FORMAT.size)
+            if zlib.crc32(recordBytes) != crc:
+                break
+            records.append(RECORD_FORMAT.unpack(recordBytes))
+            offset = offset + RECORD_SIZE
+        return records, offset
+
+    """
+    Restore
+    Restores a tracker from the snapshot and the journal records written after it
+    @param cryptoAccountTracker: the tracker to restore
+    """
+    def Restore(self, cryptoAccountTracker):
+        snapshotSequenceNumber = self.__ReadSnapshot(cryptoAccountTracker)
+        records, goodLength = self.__ReadRecords()
+        # Records from before the snapshot are left over from a crash while compacting
+        records = [record for record in records if record[1] > snapshotSequenceNumber]
+        self.__sequenceNumber = max([snapshotSequenceNumber] + [record[1] for record in records])
+        self.__recordsSinceSnapshot = len(records)
+
+        if records:
+            (lotIDs, amounts, referencePrices, boughtPrices, states), nextLotID = \
+                cryptoAccountTracker.GetActivePurchaseColumns()
+            activePurchases = {}  # maps the lot ID to [amount, referencePrice, boughtPrice, state], in order
+            for index in range(len(lotIDs)):
+                activePurchases[int(lotIDs[index])] = [float(amounts[index]), float(referencePrices[index]),
+                                                       float(boughtPrices[index]), int(states[index])]
+
+            for mutation, _, lotID, amount, referencePrice, boughtPrice, state in records:
+                if mutation == CryptoAccountMutations.LotAdded:
+                    activePurchases[lotID] = [amount, referencePrice, boughtPrice, state]
+                    nextLotID = max(nextLotID, lotID + 1)
+                elif mutation == CryptoAccountMutations.LotRemoved:
+                    activePurchases.pop(lotID, None)
+                elif mutation == CryptoAccountMutations.LotReferencePriceChanged:
+                    activePurchases[lotID][1] = referencePrice
+                elif mutation == CryptoAccountMutations.LotStateChanged:
+                    activePurchases[lotID][3] = state
+                elif mutation == CryptoAccountMutations.LotAmountChanged:
+                    activePurchases[lotID][0] = amount
+                elif mutation == CryptoAccountMutations.LotsCleared:
+                    activePurchases = {}
+                elif mutation == CryptoAccountMutations.ReferencePriceChanged:
+                    cryptoAccountTracker.SetReferencePrice(referencePrice)
+                elif mutation == CryptoAccountMutations.LastTransactionPriceChanged:
+                    cryptoAccountTracker.SetPriceSinceLastTransaction(referencePrice)
+
+            rows = list(activePurchases.values())
+            columns = (np.array(list(activePurchases.keys()), dtype=np.int64),
+                       np.array([row[0] for row in rows], dtype=np.float64),
+                       np.array([row[1] for row in rows], dtype=np.float64),
+                       np.array([row[2] for row in rows], dtype=np.float64),
+                       np.array([row[3] for row in rows], dtype=np.int8))
+            cryptoAccountTracker.RestoreActivePurchaseColumns(columns, nextLotID)
+
+        # Cut off a torn record at the end so new records are appended after the good ones
+        if os.path.isfile(self.__journalFilePath) and os.path.getsize(self.__journalFilePath) != goodLength:
+            journalFile = open(self.__journalFilePath, "r+b")
+            journalFile.truncate(goodLength)
+            journalFile.close()
+
+    """
+    Open
+    Opens the journal so changes can be appended to it
+    """
+    def Open(self):
+        self.__journalFile = open(self.__journalFilePath, "ab")
+
+    """
+    OnMutation
+    Records a change to the crypto account, it is written on the next commit.
+    Meant to be given to CryptoAccountTracker.SetMutationListener
+    """
+    def OnMutation(self, mutation, lotID: int, amount: float, referencePrice: float, boughtPrice: float, state: int):
+        self.__sequenceNumber = self.__sequenceNumber + 1
+        recordBytes = RECORD_FORMAT.pack(int(mutation), self.__sequenceNumber, lotID,
+                                         amount, referencePrice, boughtPrice, state)
+        self.__pendingRecords += recordBytes
+        self.__pendingRecords += RECORD_CRC_FORMAT.pack(zlib.crc32(recordBytes))
+
+    """
+    Commit
+    Appends the pending records to the journal, and compacts it
+    into a new snapshot once enough records have been written
+    @param cryptoAccountTracker: the tracker the journal belongs to
+    """
+    def Commit(self, cryptoAccountTracker):
+        if self.__pendingRecords:
+            self.__journalFile.write(self.__pendingRecords)
+            self.__journalFile.flush()
+            if self.__fsyncOnCommit:
+                os.fsync(self.__journalFile.fileno())
+            self.__recordsSinceSnapshot = self.__recordsSinceSnapshot + len(self.__pendingRecords) // RECORD_SIZE
+            self.__pendingRecords = bytearray()
+
+        if self.__recordsSinceSnapshot >= self.__compactAfterRecords:
+            self.Compact(cryptoAccountTracker)
+
+    """
+    Compact
+    Writes the whole crypto account out as a new snapshot (through a temporary file so a
+    crash leaves the old one) and then empties the journal
+    @param cryptoAccountTracker: the tracker the journal belongs to
+    """
+    def Compact(self, cryptoAccountTracker):
+        columns, nextLotID = cryptoAccountTracker.GetActivePurchaseColumns()
+        snapshotFile = open(self.__snapshotFilePath + ".tmp", "wb")
+        snapshotFile.write(SNAPSHOT_HEADER_FORMAT.pack(SNAPSHOT_MAGIC, self.__sequenceNumber, nextLotID,
+                                                       float(cryptoAccountTracker.GetReferencePrice()),
+                                                       float(cryptoAccountTracker.GetPriceSinceLastTransaction()),
+                                                       len(columns[0])))
+        for column, dtype in zip(columns, (np.int64, np.float64, np.float64, np.float64, np.int8)):
+            snapshotFile.write(np.ascontiguousarray(column, dtype=dtype).tobytes())
+        snapshotFile.flush()
+        os.fsync(snapshotFile.fileno())
+        snapshotFile.close()
+        os.replace(self.__snapshotFilePath + ".tmp", self.__snapshotFilePath)
+
+        # Every record so far is in the snapshot, any left behind by a crash here are skipped on restore
+        if self.__journalFile is not None:
+            self.__journalFile.truncate(0)
+        self.__pendingRecords = bytearray()
+        self.__recordsSinceSnapshot = 0
+
+    """
+    Close
+    Closes the journal file
+    """
+    def Close(self):
+        if self.__journalFile is not None:
+            self.__journalFile.close()
+            self.__journalFile = None
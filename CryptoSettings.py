@@ -16,3 +16,6 @@ class CryptoSettings:
         LargestAmountToBuyInUSD = 0.0
 
         MaxPortfolioPercentage = 0.0
+
+        MinDecisionIntervalSeconds = 0.0
+        MaxDecisionIntervalSeconds = 0.0
@@ -8,3 +8,14 @@ class CryptoCurrencyPercentageStates(IntEnum):
     Neutral = 1
     Up = 2
     Down = 3
+
+# The changes to a crypto account which are recorded in its journal
+class CryptoAccountMutations(IntEnum):
+    LotAdded = 1
+    LotRemoved = 2
+    LotReferencePriceChanged = 3
+    LotStateChanged = 4
+    LotsCleared = 5
+    ReferencePriceChanged = 6
+    LastTransactionPriceChanged = 7
+    LotAmountChanged = 8
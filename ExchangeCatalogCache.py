@@ -0,0 +1,50 @@
+# Exchange Catalog Cache
+# A class which keeps the parts of the exchange catalog the bot needs (the name
+# of every currency and the smallest size of every product) in a json file, so
+# a restart doesn't have to wait on get_currencies and get_products. The cache
+# is only used while it is younger than its time to live
+import json
+import os
+import time
+import MasterBotConstants
+
+class ExchangeCatalogCache:
+    def __init__(self, cacheFilePath: str, ttlSeconds: float = MasterBotConstants.EXCHANGE_CATALOG_TTL_SECONDS):
+        self.__cacheFilePath = cacheFilePath
+        self.__ttlSeconds = ttlSeconds
+
+    """
+    Load
+    @return: the (currency names, product min sizes) dictionaries from the cache,
+    None if there is no cache, it has expired or it can't be read
+    """
+    def Load(self):
+        if not os.path.isfile(self.__cacheFilePath):
+            return None
+        # A cache which can't be read, or is missing any of its parts, is fetched again
+        try:
+            with open(self.__cacheFilePath, "r") as cacheFile:
+                catalog = json.load(cacheFile)
+            if time.time() - catalog["savedTime"] > self.__ttlSeconds:
+                return None
+            currencyNames = catalog["currencyNames"]
+            minSizes = catalog["minSizes"]
+        except (ValueError, KeyError, TypeError, OSError):
+            return None
+        if not isinstance(currencyNames, dict) or not isinstance(minSizes, dict):
+            return None
+        return currencyNames, minSizes
+
+    """
+    Save
+    Writes the catalog to the cache, through a temporary file so a crash never leaves half a cache
+    @param currencyNames: maps the currency ID to its name
+    @param minSizes: maps the product ID to its smallest order size
+    """
+    def Save(self, currencyNames, minSizes):
+        # Named after the process, so shards saving at the same time don't write into each other's file
+        temporaryFilePath = self.__cacheFilePath + "." + str(os.getpid()) + ".tmp"
+        cacheFile = open(temporaryFilePath, "w")
+        json.dump({"savedTime": time.time(), "currencyNames": currencyNames, "minSizes": minSizes}, cacheFile)
+        cacheFile.close()
+        os.replace(temporaryFilePath, self.__cacheFilePath)
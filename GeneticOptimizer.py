@@ -0,0 +1,346 @@
+# Genetic Optimizer
+# Evolves the crypto settings thresholds (LowPercentageThreshold through
+# MaxPortfolioPercentage) against historical prices. Every candidate is scored
+# by a backtest on its own process, with the price history placed in shared
+# memory once so it is never pickled for each candidate. Progress is checkpointed
+# after every generation so a run can be resumed (only with the same price
+# history, cryptos, population size and backtest arguments), and the best
+# genomes are written out as crypto settings .json files
+#
+# Usage: python GeneticOptimizer.py <history.csv> --crypto BTC [--crypto ETH] [--generations 50]
+import argparse
+import concurrent.futures
+import hashlib
+import json
+import os
+import random
+from multiprocessing import shared_memory
+import Backtest
+import MasterBotConstants
+
+# The settings which are evolved, in genome order, with the (low, high) range each one is drawn from
+GENOME_FIELDS = [("LowPercentageThreshold", (-10.0, -0.25)),
+                 ("HighPercentageThreshold", (0.25, 10.0)),
+                 ("LowToUpBuyInPercentageThreshold", (-5.0, 0.0)),
+                 ("MaxPercentageDown", (-30.0, -1.0)),
+                 ("HighToDownSellOutPercentageThreshold", (-2.0, 5.0)),
+                 ("AdjustReferencePriceDownThreshold", (-30.0, -1.0)),
+                 ("AdjustReferencePriceUpThreshold", (0.5, 30.0)),
+                 ("SmallestAmountToBuyInUSD", (5.0, 100.0)),
+                 ("LargestAmountToBuyInUSD", (10.0, 500.0)),
+                 ("MaxPortfolioPercentage", (5.0, 100.0))]
+
+"""
+RepairGenome
+Clamps every gene into its range, rounds it like a hand written setting and
+fixes the pairs of genes which have to be in a certain order
+@param genome: a list of gene values in GENOME_FIELDS order
+@return: the repaired genome
+"""
+def RepairGenome(genome):
+    repairedGenome = []
+    for gene, (fieldName, (low, high)) in zip(genome, GENOME_FIELDS):
+        repairedGenome.append(round(min(max(gene, low), high), 2))
+
+    genes = dict(zip([fieldName for fieldName, _ in GENOME_FIELDS], repairedGenome))
+    # The buy amount slopes from the smallest amount at LowToUpBuyIn down to the largest at MaxPercentageDown
+    if genes["MaxPercentageDown"] >= genes["LowToUpBuyInPercentageThreshold"]:
+        genes["MaxPercentageDown"] = round(genes["LowToUpBuyInPercentageThreshold"] - 1.0, 2)
+    if genes["LargestAmountToBuyInUSD"] < genes["SmallestAmountToBuyInUSD"]:
+        genes["LargestAmountToBuyInUSD"] = genes["SmallestAmountToBuyInUSD"]
+    # An up purchase is sold once it falls back under HighToDownSellOut, and has its
+    # reference price raised once it rises past AdjustReferencePriceUp
+    if genes["HighToDownSellOutPercentageThreshold"] >= genes["HighPercentageThreshold"]:
+        genes["HighToDownSellOutPercentageThreshold"] = round(genes["HighPercentageThreshold"] - 1.0, 2)
+    if genes["AdjustReferencePriceUpThreshold"] <= genes["HighPercentageThreshold"]:
+        genes["AdjustReferencePriceUpThreshold"] = round(genes["HighPercentageThreshold"] + 1.0, 2)
+    return [genes[fieldName] for fieldName, _ in GENOME_FIELDS]
+
+"""
+GenomeToCryptoSettings
+@param genome: a list of gene values in GENOME_FIELDS order
+@param cryptoID: the crypto ID the settings are for
+@return: the genome as a crypto settings dictionary, the same as a settings .json file
+"""
+def GenomeToCryptoSettings(genome, cryptoID: str):
+    cryptoSettings = {"id": cryptoID}
+    for gene, (fieldName, _) in zip(genome, GENOME_FIELDS):
+        cryptoSettings[fieldName] = gene
+    return cryptoSettings
+
+"""
+CalculateFitness
+@param report: the BacktestReport of a candidate
+@return: how good the candidate is, the P&L percentage less a penalty for its drawdown
+"""
+def CalculateFitness(report):
+    return report.profitAndLossPercentage - \
+        MasterBotConstants.OPTIMIZER_DRAWDOWN_PENALTY * report.maxDrawdownPercentage
+
+# Set once in each worker process by InitWorker
+workerState = {}
+
+"""
+InitWorker
+Runs once when a worker process starts and attaches to the shared price history
+@param sharedMemoryName: the name of the shared memory block holding the history
+@param tickCount: the number of ticks in the history
+@param productIds: the product IDs used in the history
+@param backtestArguments: a dictionary of the arguments for each Backtest
+"""
+def InitWorker(sharedMemoryName: str, tickCount: int, productIds, backtestArguments):
+    sharedPriceHistory = shared_memory.SharedMemory(name=sharedMemoryName)
+    workerState["sharedMemory"] = sharedPriceHistory  # must stay referenced for the views to stay valid
+    # Views straight onto the shared memory, nothing is copied
+    prices = sharedPriceHistory.buf[:tickCount * 8].cast("d")
+    productIndexes = sharedPriceHistory.buf[tickCount * 8:tickCount * 10].cast("H")
+    workerState["priceHistory"] = Backtest.PriceHistory(productIds, productIndexes, prices, None)
+    workerState["backtestArguments"] = backtestArguments
+
+"""
+ScoreGenomeInWorker
+@param genome: a list of gene values in GENOME_FIELDS order
+@return: the fitness of the genome over the shared price history
+"""
+def ScoreGenomeInWorker(genome):
+    backtestArguments = workerState["backtestArguments"]
+    cryptoSettingsList = [GenomeToCryptoSettings(genome, cryptoID) for cryptoID in backtestArguments["cryptoIDs"]]
+    backtest = Backtest.Backtest(cryptoSettingsList, backtestArguments["startingUSD"],
+                                 feeRate=backtestArguments["feeRate"],
+                                 slippageRate=backtestArguments["slippageRate"],
+                                 minSizes=backtestArguments["minSizes"])
+    return CalculateFitness(backtest.Run(workerState["priceHistory"]))
+
+class GeneticOptimizer:
+    def __init__(self, priceHistory, cryptoIDs, startingUSD: float, checkpointFilePath: str,
+                 populationSize: int = MasterBotConstants.OPTIMIZER_POPULATION_SIZE,
+                 eliteCount: int = MasterBotConstants.OPTIMIZER_ELITE_COUNT,
+                 mutationRate: float = MasterBotConstants.OPTIMIZER_MUTATION_RATE,
+                 feeRate: float = MasterBotConstants.SIMULATED_FEE_RATE,
+                 slippageRate: float = MasterBotConstants.SIMULATED_SLIPPAGE_RATE,
+                 minSizes=None, maxWorkers=None, seed=None):
+
+        self.__priceHistory = priceHistory
+        self.__cryptoIDs = list(cryptoIDs)
+        self.__checkpointFilePath = checkpointFilePath
+        self.__populationSize = populationSize
+        self.__eliteCount = eliteCount
+        self.__mutationRate = mutationRate
+        self.__backtestArguments = {"cryptoIDs": self.__cryptoIDs,
+                                    "startingUSD": startingUSD,
+                                    "feeRate": feeRate,
+                                    "slippageRate": slippageRate,
+                                    "minSizes": minSizes}
+        self.__maxWorkers = maxWorkers if maxWorkers is not None else os.cpu_count()
+        self.__random = random.Random(seed)
+
+        self.__generation = 0
+        self.__population = []
+        self.__fitnesses = []
+        self.__fitnessCache = {}  # maps a genome (as a tuple) to its fitness so repeats are not scored again
+        # A checkpoint is only resumed when it was written for the same inputs
+        self.__inputsFingerprint = self.__GetInputsFingerprint()
+
+    """
+    GetInputsFingerprint
+    @return: a hash of everything the fitnesses depend on (the price history, the crypto IDs
+    and the backtest arguments) and of the population size
+    """
+    def __GetInputsFingerprint(self):
+        inputsHash = hashlib.sha256()
+        inputsHash.update(json.dumps([self.__priceHistory.productIds, self.__backtestArguments,
+                                      self.__populationSize], sort_keys=True).encode("utf-8"))
+        inputsHash.update(memoryview(self.__priceHistory.productIndexes).tobytes())
+        inputsHash.update(memoryview(self.__priceHistory.prices).tobytes())
+        return inputsHash.hexdigest()
+
+    """
+    RandomGenome
+    @return: a genome with every gene drawn at random from its range
+    """
+    def __RandomGenome(self):
+        return RepairGenome([self.__random.uniform(low, high) for _, (low, high) in GENOME_FIELDS])
+
+    """
+    SelectParent
+    Picks the fittest of a few random members of the population
+    @return: the selected genome
+    """
+    def __SelectParent(self):
+        contenders = self.__random.sample(range(len(self.__population)),
+                                          min(MasterBotConstants.OPTIMIZER_TOURNAMENT_SIZE, len(self.__population)))
+        winner = max(contenders, key=lambda index: self.__fitnesses[index])
+        return self.__population[winner]
+
+    """
+    Breed
+    @param firstParent: a genome
+    @param secondParent: a genome
+    @return: a child genome mixing the genes of both parents, with some genes mutated
+    """
+    def __Breed(self, firstParent, secondParent):
+        child = []
+        for firstGene, secondGene, (_, (low, high)) in zip(firstParent, secondParent, GENOME_FIELDS):
+            blend = self.__random.random()
+            gene = firstGene * blend + secondGene * (1.0 - blend)
+            if self.__random.random() < self.__mutationRate:
+                gene = gene + self.__random.gauss(0.0, (high - low) * 0.1)
+            child.append(gene)
+        return RepairGenome(child)
+
+    """
+    NextGeneration
+    Keeps the elite genomes and fills the rest of the population with their children
+    """
+    def __NextGeneration(self):
+        ranking = sorted(range(len(self.__population)), key=lambda index: self.__fitnesses[index], reverse=True)
+        nextPopulation = [self.__population[index] for index in ranking[:self.__eliteCount]]
+        while len(nextPopulation) < self.__populationSize:
+            nextPopulation.append(self.__Breed(self.__SelectParent(), self.__SelectParent()))
+        self.__population = nextPopulation
+        self.__fitnesses = []
+        self.__generation = self.__generation + 1
+
+    """
+    ScorePopulation
+    Scores every genome of the population which has not been scored before on the worker processes
+    @param executor: the process pool to score on
+    """
+    def __ScorePopulation(self, executor):
+        unscoredGenomes = list(set(tuple(genome) for genome in self.__population
+                                   if tuple(genome) not in self.__fitnessCache))
+        for genome, fitness in zip(unscoredGenomes, executor.map(ScoreGenomeInWorker, unscoredGenomes)):
+            self.__fitnessCache[genome] = fitness
+        self.__fitnesses = [self.__fitnessCache[tuple(genome)] for genome in self.__population]
+
+    """
+    SaveCheckpoint
+    Writes the population, scores and random state out so the run can be resumed,
+    through a temporary file so a crash never leaves a half written checkpoint
+    """
+    def __SaveCheckpoint(self):
+        randomVersion, randomInternalState, gaussNext = self.__random.getstate()
+        checkpoint = {"inputsFingerprint": self.__inputsFingerprint,
+                      "generation": self.__generation,
+                      "population": self.__population,
+                      "fitnesses": self.__fitnesses,
+                      "fitnessCache": [[list(genome), fitness] for genome, fitness in self.__fitnessCache.items()],
+                      "randomState": [randomVersion, list(randomInternalState), gaussNext]}
+        temporaryFilePath = self.__checkpointFilePath + ".tmp"
+        checkpointFile = open(temporaryFilePath, "w")
+        json.dump(checkpoint, checkpointFile)
+        checkpointFile.flush()
+        os.fsync(checkpointFile.fileno())
+        checkpointFile.close()
+        os.replace(temporaryFilePath, self.__checkpointFilePath)
+
+    """
+    LoadCheckpoint
+    @return: if a checkpoint of the same inputs was found and the run will resume from it
+    """
+    def __LoadCheckpoint(self):
+        if not os.path.exists(self.__checkpointFilePath):
+            return False
+
+        checkpointFile = open(self.__checkpointFilePath, "r")
+        checkpoint = json.load(checkpointFile)
+        checkpointFile.close()
+        # Its fitnesses were scored against other prices or settings, so none of them carry over
+        if checkpoint.get("inputsFingerprint") != self.__inputsFingerprint:
+            print("The checkpoint " + self.__checkpointFilePath + " was written for other inputs, starting over")
+            return False
+        self.__generation = checkpoint["generation"]
+        self.__population = checkpoint["population"]
+        self.__fitnesses = checkpoint["fitnesses"]
+        self.__fitnessCache = {tuple(genome): fitness for genome, fitness in checkpoint["fitnessCache"]}
+        randomVersion, randomInternalState, gaussNext = checkpoint["randomState"]
+        self.__random.setstate((randomVersion, tuple(randomInternalState), gaussNext))
+        return True
+
+    """
+    Run
+    Evolves the population, resuming from the checkpoint if there is one
+    @param generations: the generation to stop after
+    @return: the final population as (fitness, genome) pairs, best first
+    """
+    def Run(self, generations: int):
+        if not self.__LoadCheckpoint():
+            self.__population = [self.__RandomGenome() for _ in range(self.__populationSize)]
+
+        # Put the prices and then the product indexes (so the prices stay aligned) into shared memory
+        tickCount = len(self.__priceHistory)
+        sharedPriceHistory = shared_memory.SharedMemory(create=True, size=max(tickCount * 10, 1))
+        try:
+            sharedPriceHistory.buf[:tickCount * 8].cast("d")[:] = self.__priceHistory.prices
+            sharedPriceHistory.buf[tickCount * 8:tickCount * 10].cast("H")[:] = self.__priceHistory.productIndexes
+
+            with concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.__maxWorkers, initializer=InitWorker,
+                    initargs=(sharedPriceHistory.name, tickCount,
+                              self.__priceHistory.productIds, self.__backtestArguments)) as executor:
+                while True:
+                    if len(self.__fitnesses) != len(self.__population):
+                        self.__ScorePopulation(executor)
+                        self.__SaveCheckpoint()
+                        print("Generation " + str(self.__generation) + ": best fitness " +
+                              str(round(max(self.__fitnesses), 2)))
+                    if self.__generation >= generations:
+                        break
+                    self.__NextGeneration()
+        finally:
+            sharedPriceHistory.close()
+            sharedPriceHistory.unlink()
+
+        return sorted(zip(self.__fitnesses, self.__population), key=lambda ranked: ranked[0], reverse=True)
+
+    """
+    WriteBestGenomes
+    Writes the best genomes out as crypto settings .json files, one folder
+    per rank (rank_1 is the best) with one file for each crypto ID
+    @param rankedGenomes: (fitness, genome) pairs, best first
+    @param outputFolderPath: the folder to write the settings into
+    @param count: how many of the best genomes to write
+    """
+    def WriteBestGenomes(self, rankedGenomes, outputFolderPath: str, count: int):
+        writtenGenomes = []
+        for fitness, genome in rankedGenomes:
+            if len(writtenGenomes) == count:
+                break
+            if genome in writtenGenomes:
+                continue
+            writtenGenomes.append(genome)
+
+            rankFolderPath = os.path.join(outputFolderPath, "rank_" + str(len(writtenGenomes)))
+            os.makedirs(rankFolderPath, exist_ok=True)
+            for cryptoID in self.__cryptoIDs:
+                cryptoSettingsFile = open(os.path.join(rankFolderPath, cryptoID + ".json"), "w")
+                json.dump(GenomeToCryptoSettings(genome, cryptoID), cryptoSettingsFile, indent=4)
+                cryptoSettingsFile.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evolve crypto settings thresholds against price history")
+    parser.add_argument("historyFile", help="a csv of ticks (time,product_id,price) or candles (time,product_id,...,close)")
+    parser.add_argument("--crypto", action="append", required=True, metavar="CRYPTOID",
+                        help="a crypto ID the settings are evolved for, may be repeated")
+    parser.add_argument("--usd", type=float, default=1000.0, help="the USD each backtest starts with")
+    parser.add_argument("--generations", type=int, default=MasterBotConstants.OPTIMIZER_GENERATIONS)
+    parser.add_argument("--population", type=int, default=MasterBotConstants.OPTIMIZER_POPULATION_SIZE)
+    parser.add_argument("--workers", type=int, default=None, help="the number of processes, every core by default")
+    parser.add_argument("--fee", type=float, default=MasterBotConstants.SIMULATED_FEE_RATE)
+    parser.add_argument("--slippage", type=float, default=MasterBotConstants.SIMULATED_SLIPPAGE_RATE)
+    parser.add_argument("--checkpoint", default="optimizer_checkpoint.json",
+                        help="the checkpoint file, an existing one is resumed from")
+    parser.add_argument("--output", default="optimized_settings", help="the folder the best settings are written to")
+    parser.add_argument("--top", type=int, default=3, help="how many of the best genomes to write")
+    parser.add_argument("--seed", type=int, default=None)
+    arguments = parser.parse_args()
+
+    priceHistory = Backtest.LoadPriceHistory(arguments.historyFile,
+                                             set(cryptoID + "-USD" for cryptoID in arguments.crypto))
+    optimizer = GeneticOptimizer(priceHistory, arguments.crypto, arguments.usd, arguments.checkpoint,
+                                 populationSize=arguments.population, feeRate=arguments.fee,
+                                 slippageRate=arguments.slippage, maxWorkers=arguments.workers,
+                                 seed=arguments.seed)
+    rankedGenomes = optimizer.Run(arguments.generations)
+    optimizer.WriteBestGenomes(rankedGenomes, arguments.output, arguments.top)
+    print("Best fitness: " + str(round(rankedGenomes[0][0], 2)))
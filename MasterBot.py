@@ -7,84 +7,162 @@ import sys
 import datetime
 import time
 import json
+import concurrent.futures
 from math import log10
 import CryptoAccount
+import AccountSnapshot
+import BotLogger
+import TransactionStore
+import RecordingStore
+import CandleAggregator
+import CryptoJournal
+import RequestScheduler
+import RetryPolicy
+import ExchangeCatalogCache
+import OrderExecutor
+import OrderPipeline
+import Metrics
 from CryptoStates import CryptoCurrencyPercentageStates
 import MasterBotConstants
 
+# The retry keys of the calls which aren't made for a single product
+INIT_RETRY_KEY = "init"
+ACCOUNTS_RETRY_KEY = "accounts"
+
 class MasterBot:
     def __init__(self, accountKey: str, accountB64secret: str, accountPassphrase: str,
                  usdAccountID: str, operatingPath: str, recordingLogFilename: str,
                  exceptionsLogFilename: str, transactionsLogFoldername: str,
-                 cryptoBackupFoldername: str, cryptoSettingsFolderName: str):
-
-        self.__recordingLogFilePath = operatingPath + "/" + recordingLogFilename
-        self.__recordingLogFile = self.__InitRecordingFile()
-
-        self.__exceptionsLogFilePath = operatingPath + "/" + exceptionsLogFilename
-        self.__exceptionsLogFile = self.__InitExceptionsFile()
+                 cryptoBackupFoldername: str, cryptoSettingsFolderName: str,
+                 priceRefreshMaxWorkers: int = MasterBotConstants.PRICE_REFRESH_MAX_WORKERS,
+                 priceRefreshDeadlineSeconds: float = MasterBotConstants.PRICE_REFRESH_DEADLINE_SECONDS,
+                 client=None, cryptoSettingsList=None, enableFileOutput: bool = True,
+                 backupCoalesceSeconds: float = MasterBotConstants.BACKUP_COALESCE_SECONDS,
+                 recordingTextOutput: bool = MasterBotConstants.RECORDING_TEXT_OUTPUT,
+                 asynchronousOrders: bool = MasterBotConstants.ORDER_PIPELINE_ASYNCHRONOUS,
+                 metricsEnabled: bool = MasterBotConstants.METRICS_ENABLED,
+                 cryptoIDsToTrade=None, shardCoordinator=None, shardIndex: int = 0):
+
+        # When file output is disabled (EX: for backtesting) nothing is read from or written to
+        # the operating path, the logs are sent to the null device and backups are neither restored nor exported
+        self.__enableFileOutput = enableFileOutput
+
+        if self.__enableFileOutput:
+            self.__recordingLogFilePath = operatingPath + "/" + recordingLogFilename
+            self.__exceptionsLogFilePath = operatingPath + "/" + exceptionsLogFilename
+        else:
+            self.__recordingLogFilePath = os.devnull
+            self.__exceptionsLogFilePath = os.devnull
+        # Both logs are written by their own thread so the trading loop never waits on them
+        self.__recordingLogger = BotLogger.BotLogger(self.__recordingLogFilePath,
+                                                     MasterBotConstants.RECORDING_LOG_FILE_FIRST_MESSAGE,
+                                                     aggregateDuplicates=False)
+        self.__exceptionsLogger = BotLogger.BotLogger(self.__exceptionsLogFilePath,
+                                                      MasterBotConstants.EXCEPTION_LOG_FILE_FIRST_MESSAGE)
+        # Times the phases of each crypto and counts the calls to the exchange, does nothing when disabled
+        self.__metrics = Metrics.Metrics(metricsEnabled)
+        # Backs off between failed calls to the exchange and skips the ones which keep failing
+        self.__retryPolicy = RetryPolicy.RetryPolicy(metrics=self.__metrics)
+        # Recordings are stored as columns, the old free text record file is only written if asked for
+        self.__recordingTextOutput = recordingTextOutput
+        self.__recordingStore = None
+        if self.__enableFileOutput:
+            self.__recordingStore = RecordingStore.RecordingStore(
+                operatingPath + "/" + MasterBotConstants.RECORDING_FOLDER_NAME)
+        # Candles are built from every price the bot sees and written alongside the recordings
+        self.__candleAggregator = None
+        if self.__enableFileOutput:
+            self.__candleAggregator = CandleAggregator.CandleAggregator(
+                operatingPath + "/" + MasterBotConstants.CANDLE_FOLDER_NAME)
 
         self.__transactionsLogFolderPath = operatingPath + "/" + transactionsLogFoldername
-        self.__InitTransactionsFolder()
+        self.__transactionStore = None
+        if self.__enableFileOutput:
+            self.__InitTransactionsFolder()
+            self.__transactionStore = TransactionStore.TransactionStore(self.__transactionsLogFolderPath)
 
         self.__cryptoBackupFolderPath = operatingPath + "/" + cryptoBackupFoldername
+        # Changed backups are written at most once per this many seconds per crypto
+        self.__backupCoalesceSeconds = backupCoalesceSeconds
+        self.__lastBackupWriteTimes = {}  # maps the crypto ID to when its backup was last written
+        self.__cryptoJournals = {}  # maps the crypto ID to the journal its changes are backed up to
+        self.__cryptoAccountTrackers = {}
+
+        # Used to refresh the prices of all the crypto accounts at once
+        self.__priceRefreshExecutor = concurrent.futures.ThreadPoolExecutor(max_workers=priceRefreshMaxWorkers)
+        self.__priceRefreshDeadlineSeconds = priceRefreshDeadlineSeconds
+        self.__pendingPriceRefreshes = {}  # maps the crypto ID to the ticker request still in flight
+        self.__tickerFeed = None  # optional streaming price source, REST is used when it is None or stale
 
         self.__cryptoSettingsFolderPath = operatingPath + "/" + cryptoSettingsFolderName
-        self.__cryptoIDs, cryptoSettings = self.__GetCryptoIDsAndSettingsFromCryptoSettingsFolder()
-
-        self.__client = self.__InitClient(accountKey, accountB64secret, accountPassphrase)
+        self.__cryptoSettingsModifiedTimes = {}  # maps the crypto ID to the (path, modified time) of its settings file
+        # When sharded only this process's cryptos are traded, the USD and total holdings are shared with the others
+        self.__cryptoIDsToTrade = None if cryptoIDsToTrade is None else set(cryptoIDsToTrade)
+        self.__shardCoordinator = shardCoordinator
+        self.__shardIndex = shardIndex
+        self.__usdReservations = {}  # maps the crypto ID to the USD reserved for its pending buy
+        # Built once the client is, left as None if the bot exits before then
+        self.__orderPipeline = None
+        self.__orderExecutor = None
+        if cryptoSettingsList is None:
+            self.__cryptoIDs, cryptoSettings = self.__GetCryptoIDsAndSettingsFromCryptoSettingsFolder()
+        else:
+            self.__cryptoIDs = [cryptoSetting["id"] for cryptoSetting in cryptoSettingsList]
+            cryptoSettings = cryptoSettingsList
+
+        self.__requestScheduler = None
+        if client is None:
+            # Every call to the exchange is rate limited and prioritized so adding products can't trip its limits
+            # The shards share the account's rate limits between them
+            shardCount = 1 if self.__shardCoordinator is None else self.__shardCoordinator.GetShardCount()
+            self.__requestScheduler = RequestScheduler.RequestScheduler(
+                self.__InitClient(accountKey, accountB64secret, accountPassphrase),
+                publicRatePerSecond=MasterBotConstants.REQUEST_PUBLIC_RATE_PER_SECOND / shardCount,
+                publicBurst=max(MasterBotConstants.REQUEST_PUBLIC_BURST / shardCount, 1.0),
+                privateRatePerSecond=MasterBotConstants.REQUEST_PRIVATE_RATE_PER_SECOND / shardCount,
+                privateBurst=max(MasterBotConstants.REQUEST_PRIVATE_BURST / shardCount, 1.0),
+                metrics=self.__metrics)
+            self.__client = self.__requestScheduler
+        else:
+            # An already set up client, EX: a simulated exchange
+            self.__client = client
+        # Places buys and sells in the background and follows every order until it fills
+        self.__orderPipeline = OrderPipeline.OrderPipeline(self.__client, self.__retryPolicy, self.__exceptionsLogger,
+                                                           asynchronous=asynchronousOrders)
+        self.__cryptoIDsWithPendingBuys = set()  # cryptos with a buy placed whose fill hasn't been applied yet
+        # Nets the lots of each product into one sell and keeps them as pending until the sell fills
+        self.__orderExecutor = OrderExecutor.OrderExecutor(self.__orderPipeline, metrics=self.__metrics)
         self.__usdAccountID = usdAccountID
-        # Get the USD Account
-        runLoop = True
-        while runLoop:
-            try:
-                self.__usdAccount = self.__client.get_account(self.__usdAccountID)
-                self.__usdAmount = round(float(self.__usdAccount['balance']), 2)
-                runLoop = False
-            except:
-                self.__exceptionsLogFile.write(str(datetime.datetime.now()) + "\n")
-                self.__exceptionsLogFile.write("An exception occurred trying to initialize the USD account\n\n")
-                self.__exceptionsLogFile.close()
-                self.__exceptionsLogFile = open(self.__exceptionsLogFilePath, 'a')
-                time.sleep(1)
-                runLoop = True  # an error occurred so try again
-
+        # The settlements the USD amount was fetched after, the shard coordinator ignores older amounts
+        self.__usdAmountSettlementCount = self.__GetSettlementCount()
+        self.__accountSnapshotSettlementCount = self.__usdAmountSettlementCount
+        # Get the USD Account, alongside the calls the account trackers need
+        usdAccountFuture = self.__SubmitInitCall(
+            "init usd account", lambda: self.__client.get_account(self.__usdAccountID),
+            "An exception occurred trying to initialize the USD account")
+        self.__exchangeCatalogCache = None
+        if self.__enableFileOutput:
+            self.__exchangeCatalogCache = ExchangeCatalogCache.ExchangeCatalogCache(
+                operatingPath + "/" + MasterBotConstants.EXCHANGE_CATALOG_CACHE_FILENAME)
+        cryptoAccountTrackers = self.__InitCryptoAccountTrackers(cryptoSettings)
+        self.__usdAccount = usdAccountFuture.result()
+        self.__usdAmount = round(float(self.__usdAccount['balance']), 2)
+
+        # A running total which is kept up to date as each account changes
+        self.__totalUSDHoldings = self.__usdAmount
 
-        self.__totalUSDHoldings = 0.0
+        # Balances of all the accounts, fetched at most once per tick
+        self.__accountSnapshot = AccountSnapshot.AccountSnapshot()
 
-        self.__cryptoAccountTrackers = self.__InitCryptoAccountTrackers(cryptoSettings)
-        self.__RestoreCryptoAccountsFromBackup()
+        self.__cryptoAccountTrackers = cryptoAccountTrackers
+        if self.__enableFileOutput:
+            self.__RestoreCryptoAccountsFromBackup()
+        # The holdings in USD of each crypto account as it was last added to the running total
+        self.__cryptoHoldingsInUSD = {cryptoID: 0.0 for cryptoID in self.__cryptoIDs}
         for cryptoID in self.__cryptoIDs:
             if self.__cryptoAccountTrackers[cryptoID].GetReferencePrice() != 0.0:
                 self.__cryptoAccountTrackers[cryptoID].SetRenewPriceFlag(False)
-
-    """
-    InitRecordingFile
-    Initializes and returns the file used to export recorded data
-    @return: an opened file used to log recorded data
-    """
-    def __InitRecordingFile(self):
-        if not os.path.exists(self.__recordingLogFilePath):
-            recordingLogFile = open(self.__recordingLogFilePath, 'w')
-            recordingLogFile.write(MasterBotConstants.RECORDING_LOG_FILE_FIRST_MESSAGE)
-            return recordingLogFile
-        else:
-            recordingLogFile = open(self.__recordingLogFilePath, 'a')
-            return recordingLogFile
-
-    """
-    InitExceptionsFile
-    Initializes and returns the files used to export exceptions
-    @return: an opened files used to log exceptions
-    """
-    def __InitExceptionsFile(self):
-        if not os.path.exists(self.__exceptionsLogFilePath):
-            exceptionsLogFile = open(self.__exceptionsLogFilePath, 'w')
-            exceptionsLogFile.write(MasterBotConstants.EXCEPTION_LOG_FILE_FIRST_MESSAGE)
-            return exceptionsLogFile
-        else:
-            exceptionsLogFile = open(self.__exceptionsLogFilePath, 'a')
-            return exceptionsLogFile
+        self.__PublishToShardCoordinator(publishUSDAmount=True)
 
     """
     InitTransactionsFolder
@@ -105,21 +183,12 @@ class MasterBot:
     @return: The authenticated coinbase pro account client
     """
     def __InitClient(self, accountKey: str, accountB64secret: str, accountPassphrase: str):
-        runLoop = True
-        while runLoop:
-            try:
-                client = cbpro.AuthenticatedClient(key=accountKey,
-                                                   b64secret=accountB64secret,
-                                                   passphrase=accountPassphrase)
-                return client
-            except:
-                self.__exceptionsLogFile.write(str(datetime.datetime.now()) + "\n")
-                self.__exceptionsLogFile.write("This Exception occurred trying to initialize the base CBPro client")
-                self.__exceptionsLogFile.write("Trying again now")
-                self.__exceptionsLogFile.close()
-                self.__exceptionsLogFile = open(self.__exceptionsLogFilePath, 'a')
-                time.sleep(1)
-                runLoop = True
+        return self.__retryPolicy.Call(
+            INIT_RETRY_KEY, lambda: cbpro.AuthenticatedClient(key=accountKey,
+                                                              b64secret=accountB64secret,
+                                                              passphrase=accountPassphrase),
+            onFailure=lambda exception: self.__exceptionsLogger.LogMessage(
+                "This Exception occurred trying to initialize the base CBPro client\nTrying again now"))
 
     """
     InitCryptoAccountTrackers
@@ -133,103 +202,138 @@ class MasterBot:
     @return: a list of crypto account trackers
     """
     def __InitCryptoAccountTrackers(self, cryptoSettings):
-        runLoop = True
-        while runLoop:
-            try:
-                dataOnAllAccounts = self.__client.get_accounts()
-                dataOnAllCurrencies = self.__client.get_currencies()
-                dataOnAllProducts = self.__client.get_products()
-                runLoop = False
-            except:
-                self.__exceptionsLogFile.write(str(datetime.datetime.now()) + "\n")
-                self.__exceptionsLogFile.write("An exception occurred in the InitCryptoAccountTrackers function\n\n")
-                self.__exceptionsLogFile.close()
-                self.__exceptionsLogFile = open(self.__exceptionsLogFilePath, 'a')
-                time.sleep(1)
-                runLoop = True  # an error occurred so try again
+        # The accounts and the catalog are fetched at the same time, the catalog only if the cache is out of date
+        accountsFuture = self.__SubmitInitCall("init accounts", self.__client.get_accounts,
+                                               "An exception occurred in the InitCryptoAccountTrackers function")
+        currencyNames, minSizes = self.__LoadExchangeCatalog()
+
+        # Index everything by ID, the first match wins like it would scanning the lists
+        accountIDs = {}
+        for accountData in accountsFuture.result():
+            accountIDs.setdefault(accountData["currency"], accountData["id"])
+        cryptoSettingsByID = {}
+        for cryptoSetting in cryptoSettings:
+            cryptoSettingsByID.setdefault(cryptoSetting["id"], cryptoSetting)
 
         cryptoAccountTrackers = {}
         for cryptoID in self.__cryptoIDs:
-            currentCryptoAccountID = ""
-            currentCryptoName = ""
-            currentMinSize = 0.0
-            currentCryptoSettings = ""
-
-            for accountData in dataOnAllAccounts:
-                if cryptoID == accountData["currency"]:
-                    currentCryptoAccountID = accountData["id"]
-                    break
-
-            for currencyData in dataOnAllCurrencies:
-                if cryptoID == currencyData["id"]:
-                    currentCryptoName = currencyData["name"]
-                    break
-
-            for productData in dataOnAllProducts:
-                if cryptoID + "-USD" == productData["id"]:
-                    currentMinSize = float(productData["base_min_size"])
-                    break
-
-            for cryptoSetting in cryptoSettings:
-                if cryptoID == cryptoSetting["id"]:
-                    currentCryptoSettings = cryptoSetting
-                    break
-
+            productId = cryptoID + "-USD"
             cryptoAccountTracker = CryptoAccount.CryptoAccountTracker(
-                accountId=currentCryptoAccountID,
-                productId=(cryptoID + "-USD"),
-                cryptoName=currentCryptoName,
+                accountId=accountIDs.get(cryptoID, ""),
+                productId=productId,
+                cryptoName=currencyNames.get(cryptoID, ""),
                 cryptoID=cryptoID,
-                minSize=currentMinSize,
-                cryptoSettingsJsonRaw=currentCryptoSettings)
+                minSize=float(minSizes.get(productId, 0.0)),
+                cryptoSettingsJsonRaw=cryptoSettingsByID.get(cryptoID, ""))
             # Use a map to map the crypto ID to the account tracker
             cryptoAccountTrackers.update({cryptoID: cryptoAccountTracker})
 
         return cryptoAccountTrackers
 
+    """
+    LoadExchangeCatalog
+    Gets the names of the currencies and the smallest order sizes of the products,
+    from the cache if it is fresh and has every crypto, otherwise from coinbase pro
+    @return: the (currency names, product min sizes) dictionaries
+    """
+    def __LoadExchangeCatalog(self):
+        if self.__exchangeCatalogCache is not None:
+            cachedCatalog = self.__exchangeCatalogCache.Load()
+            if cachedCatalog is not None:
+                currencyNames, minSizes = cachedCatalog
+                if all(cryptoID in currencyNames and cryptoID + "-USD" in minSizes for cryptoID in self.__cryptoIDs):
+                    return currencyNames, minSizes
+
+        currenciesFuture = self.__SubmitInitCall("init currencies", self.__client.get_currencies,
+                                                 "An exception occurred in the InitCryptoAccountTrackers function")
+        productsFuture = self.__SubmitInitCall("init products", self.__client.get_products,
+                                               "An exception occurred in the InitCryptoAccountTrackers function")
+        currencyNames = {}
+        for currencyData in currenciesFuture.result():
+            currencyNames.setdefault(currencyData["id"], currencyData["name"])
+        minSizes = {}
+        for productData in productsFuture.result():
+            minSizes.setdefault(productData["id"], float(productData["base_min_size"]))
+
+        if self.__exchangeCatalogCache is not None:
+            self.__exchangeCatalogCache.Save(currencyNames, minSizes)
+        return currencyNames, minSizes
+
+    """
+    SubmitInitCall
+    Makes a start up call on the price refresh threads, retrying it until it works
+    @param retryKey: the key the call is retried under
+    @param function: the function making the call, with no arguments
+    @param failureMessage: what to log each time the call fails
+    @return: the future of what the call returns
+    """
+    def __SubmitInitCall(self, retryKey: str, function, failureMessage: str):
+        return self.__priceRefreshExecutor.submit(
+            self.__retryPolicy.Call, retryKey, function,
+            onFailure=lambda exception: self.__exceptionsLogger.LogMessage(failureMessage))
+
     """
     RestoreCryptoAccountsFromBackup
-    Loads the backup files for each crypto account and restores
+    Loads the backup journal for each crypto account and restores
     the active buy orders and the last reference price and the
-    price since the last transaction was made on that crypto account
+    price since the last transaction was made on that crypto account,
+    then hooks the journal up to record every change from then on
     """
     def __RestoreCryptoAccountsFromBackup(self):
         if not os.path.isdir(self.__cryptoBackupFolderPath):
             print("Fatal Error!!, no cryptocurrency backup folder found")
             print("Nothing to do exiting!!")
-            self.__exceptionsLogFile.write(str(datetime.datetime.now()) + "\n")
-            self.__exceptionsLogFile.write("Fatal Error!!, no cryptocurrency backup folder found\n")
-            self.__exceptionsLogFile.write("Nothing to do exiting!!\n")
+            self.__exceptionsLogger.LogMessage("Fatal Error!!, no cryptocurrency backup folder found\n"
+                                               "Nothing to do exiting!!")
             self.CleanUp()
             sys.exit(-1)
 
-        cryptoBackupFilenames = [f for f in os.listdir(self.__cryptoBackupFolderPath)
-                              if os.path.isfile(os.path.join(self.__cryptoBackupFolderPath, f))]
-
-        for filename in cryptoBackupFilenames:
-            cryptoID = (filename[:filename.find(".")])
-            backupFile = open(self.__cryptoBackupFolderPath + "/" + filename, "r")
-            fileContent = backupFile.read().splitlines()
-            backupBuyOrders = []
-            for line in fileContent:
-                if line[:17] == "Reference Price: ":
-                    backupReferencePrice = float(line[17:])
-                    self.__cryptoAccountTrackers[cryptoID].SetReferencePrice(backupReferencePrice)
-                elif line[:24] == "Last Transaction Price: ":
-                    backupLastTransactionPrice = float(line[24:])
-                    self.__cryptoAccountTrackers[cryptoID].SetPriceSinceLastTransaction(backupLastTransactionPrice)
-                else:
-                    backupAmountBoughtInCoin = float(line.split(",")[0])
-                    backupReferencePriceBoughtInUSD = float(line.split(",")[1])
-                    backupPriceBoughtAtInUSD = float(line.split(",")[2])
-                    backupCryptoPercentageState = CryptoCurrencyPercentageStates(int(line.split(",")[3]))
-                    backupBuyOrders.append([backupAmountBoughtInCoin,
-                                            backupReferencePriceBoughtInUSD,
-                                            backupPriceBoughtAtInUSD,
-                                            backupCryptoPercentageState])
-
-            backupFile.close()
-            self.__cryptoAccountTrackers[cryptoID].RestoreActivePurchasesFromBackup(backupBuyOrders)
+        for cryptoID in self.__cryptoIDs:
+            cryptoAccountTracker = self.__cryptoAccountTrackers[cryptoID]
+            cryptoJournal = CryptoJournal.CryptoJournal(self.__cryptoBackupFolderPath, cryptoID)
+            textBackupPath = self.__cryptoBackupFolderPath + "/" + cryptoID + ".txt"
+            if cryptoJournal.Exists():
+                cryptoJournal.Restore(cryptoAccountTracker)
+            elif os.path.isfile(textBackupPath):
+                # A backup from before the journal, move it into a snapshot and keep the old file aside
+                self.__RestoreCryptoAccountFromTextBackup(cryptoID, textBackupPath)
+                cryptoJournal.Compact(cryptoAccountTracker)
+                os.replace(textBackupPath, textBackupPath + ".migrated")
+
+            cryptoJournal.Open()
+            cryptoAccountTracker.MarkBackupClean()
+            cryptoAccountTracker.SetMutationListener(cryptoJournal.OnMutation)
+            self.__cryptoJournals[cryptoID] = cryptoJournal
+
+    """
+    RestoreCryptoAccountFromTextBackup
+    Restores a crypto account from the text backup file used before the journal
+    @param cryptoID: The crypto ID of the cryptocurrency to restore
+    @param textBackupPath: the path of the text backup file
+    """
+    def __RestoreCryptoAccountFromTextBackup(self, cryptoID, textBackupPath):
+        backupFile = open(textBackupPath, "r")
+        fileContent = backupFile.read().splitlines()
+        backupBuyOrders = []
+        for line in fileContent:
+            if line[:17] == "Reference Price: ":
+                backupReferencePrice = float(line[17:])
+                self.__cryptoAccountTrackers[cryptoID].SetReferencePrice(backupReferencePrice)
+            elif line[:24] == "Last Transaction Price: ":
+                backupLastTransactionPrice = float(line[24:])
+                self.__cryptoAccountTrackers[cryptoID].SetPriceSinceLastTransaction(backupLastTransactionPrice)
+            else:
+                backupAmountBoughtInCoin = float(line.split(",")[0])
+                backupReferencePriceBoughtInUSD = float(line.split(",")[1])
+                backupPriceBoughtAtInUSD = float(line.split(",")[2])
+                backupCryptoPercentageState = CryptoCurrencyPercentageStates(int(line.split(",")[3]))
+                backupBuyOrders.append([backupAmountBoughtInCoin,
+                                        backupReferencePriceBoughtInUSD,
+                                        backupPriceBoughtAtInUSD,
+                                        backupCryptoPercentageState])
+
+        backupFile.close()
+        self.__cryptoAccountTrackers[cryptoID].RestoreActivePurchasesFromBackup(backupBuyOrders)
 
     """
     GetCryptoIDsAndSettingsFromCryptoSettingsFolder
@@ -242,9 +346,8 @@ class MasterBot:
         if not os.path.isdir(self.__cryptoSettingsFolderPath):
             print("Fatal Error!!, no cryptocurrency settings folder found")
             print("Nothing to do exiting!!")
-            self.__exceptionsLogFile.write(str(datetime.datetime.now()) + "\n")
-            self.__exceptionsLogFile.write("Fatal Error!!, no cryptocurrency settings folder found\n")
-            self.__exceptionsLogFile.write("Nothing to do exiting!!\n")
+            self.__exceptionsLogger.LogMessage("Fatal Error!!, no cryptocurrency settings folder found\n"
+                                               "Nothing to do exiting!!")
             self.CleanUp()
             sys.exit(-1)
 
@@ -253,8 +356,12 @@ class MasterBot:
         cryptoIDs = []
         cryptoSettings = []
         for filename in cryptoSettingsFilenames:
+            if self.__cryptoIDsToTrade is not None and filename[:filename.find(".")] not in self.__cryptoIDsToTrade:
+                continue  # traded by another shard
             cryptoIDs.append(filename[:filename.find(".")])
             cryptoSettingsPath = self.__cryptoSettingsFolderPath + "/" + filename
+            self.__cryptoSettingsModifiedTimes[cryptoIDs[-1]] = (cryptoSettingsPath,
+                                                                 os.path.getmtime(cryptoSettingsPath))
 
             cryptoSettingsFile = open(cryptoSettingsPath, "r")
             cryptoSettings.append(json.load(cryptoSettingsFile))
@@ -262,26 +369,68 @@ class MasterBot:
 
         return cryptoIDs, cryptoSettings
 
+    """
+    ReloadChangedCryptoSettings
+    Reloads the settings of every crypto whose settings file was modified since
+    it was last read. New settings files are only picked up on a restart
+    @return: the crypto IDs whose settings were reloaded
+    """
+    def ReloadChangedCryptoSettings(self):
+        reloadedCryptoIDs = []
+        for cryptoID, (cryptoSettingsPath, modifiedTime) in list(self.__cryptoSettingsModifiedTimes.items()):
+            try:
+                newModifiedTime = os.path.getmtime(cryptoSettingsPath)
+                if newModifiedTime == modifiedTime:
+                    continue
+                cryptoSettingsFile = open(cryptoSettingsPath, "r")
+                cryptoSettings = json.load(cryptoSettingsFile)
+                cryptoSettingsFile.close()
+                self.__cryptoAccountTrackers[cryptoID].SetCryptoSettings(cryptoSettings)
+                self.__cryptoSettingsModifiedTimes[cryptoID] = (cryptoSettingsPath, newModifiedTime)
+                reloadedCryptoIDs.append(cryptoID)
+            except:
+                # The file may be half written or invalid, keep the old settings and try again next time
+                self.__exceptionsLogger.LogMessage("An exception occurred reloading the settings of " + cryptoID)
+        return reloadedCryptoIDs
+
     """
     UpdateHoldings
     Updates the amount of crypto currency you have in an account,
     this value will not change unless a buy or sell occurs
     @param cryptoID: The crypto ID of the cryptocurrency account to update the holdings of
+    @return: if the holdings were updated, otherwise they are left as they were for this tick
     """
     def __UpdateHoldings(self, cryptoID: str):
-        runLoop = True
-        while runLoop:
-            try:
-                accountData = self.__client.get_account(self.__cryptoAccountTrackers[cryptoID].GetAccountId())
-                self.__cryptoAccountTrackers[cryptoID].SetCurrentHoldingsInCoin(float(accountData['balance']))
-                runLoop = False  # if succeeded, don't run the loop again
-            except:
-                self.__exceptionsLogFile.write(str(datetime.datetime.now()) + "\n")
-                self.__exceptionsLogFile.write("An exception occurred in the Update Holdings function\n\n")
-                self.__exceptionsLogFile.close()
-                self.__exceptionsLogFile = open(self.__exceptionsLogFilePath, 'a')
-                time.sleep(1)
-                runLoop = True  # an error occurred so try again
+        if not self.__RefreshAccountSnapshotIfStale():
+            return False
+        try:
+            balance = self.__accountSnapshot.GetBalance(self.__cryptoAccountTrackers[cryptoID].GetAccountId())
+        except:
+            self.__exceptionsLogger.LogMessage("An exception occurred in the Update Holdings function")
+            return False
+        self.__cryptoAccountTrackers[cryptoID].SetCurrentHoldingsInCoin(balance)
+        self.__ApplyHoldingsChangeToTotal(cryptoID)
+        return True
+
+    """
+    RefreshAccountSnapshotIfStale
+    Fetches the balances of all of the accounts with a single
+    get_accounts call if they have not been fetched yet this tick
+    @return: if the balances are up to date, otherwise the call is given up on until the next tick
+    """
+    def __RefreshAccountSnapshotIfStale(self):
+        if not self.__accountSnapshot.IsStale():
+            return True
+        settlementCount = self.__GetSettlementCount()
+        try:
+            self.__accountSnapshot.Load(self.__retryPolicy.Call(
+                ACCOUNTS_RETRY_KEY, self.__client.get_accounts, MasterBotConstants.RETRY_TICK_DEADLINE_SECONDS,
+                lambda exception: self.__exceptionsLogger.LogMessage(
+                    "An exception occurred fetching the account balances")))
+            self.__accountSnapshotSettlementCount = settlementCount
+            return True
+        except RetryPolicy.RetryFailedError:
+            return False
 
     """
     UpdateCurrentPrice
@@ -290,26 +439,220 @@ class MasterBot:
     @param cryptoID: The crypto ID of the cryptocurrency account to update the holdings of
     """
     def __UpdateCurrentPrice(self, cryptoID: str):
-        runLoop = True
-        while runLoop:
+        if self.__UpdateCurrentPriceFromTickerFeed(cryptoID):
+            return
+
+        productId = self.__cryptoAccountTrackers[cryptoID].GetProductId()
+        try:
+            currentPrice = self.__retryPolicy.Call(
+                self.__GetTickerRetryKey(productId), lambda: self.__FetchCurrentPrice(cryptoID, productId),
+                MasterBotConstants.RETRY_TICK_DEADLINE_SECONDS,
+                lambda exception: self.__exceptionsLogger.LogMessage(
+                    "An exception occurred in the Update Current Price function"))
+        except RetryPolicy.RetryFailedError:
+            # Keep the old price, the crypto is skipped until it can be refreshed
+            self.__cryptoAccountTrackers[cryptoID].SetPriceStale(True)
+            return
+        self.__SetCurrentPrice(cryptoID, currentPrice)
+        self.__ApplyHoldingsChangeToTotal(cryptoID)
+        self.__cryptoAccountTrackers[cryptoID].SetPriceStale(False)
+
+    """
+    SetCurrentPrice
+    Sets the current price of a crypto account and adds it to the candles of that crypto
+    @param cryptoID: The crypto ID of the cryptocurrency account to set the price of
+    @param currentPrice: the price of one full coin in USD
+    """
+    def __SetCurrentPrice(self, cryptoID: str, currentPrice: float):
+        priceTime = time.time()
+        self.__cryptoAccountTrackers[cryptoID].SetCurrentPrice(currentPrice, priceTime)
+        if self.__candleAggregator is not None:
+            self.__candleAggregator.AddPrice(cryptoID, currentPrice, priceTime)
+
+    """
+    GetTickerRetryKey
+    @param productId: The product ID pair, EX: BTC-USD
+    @return: the retry key the ticker calls of that product are made under
+    """
+    @staticmethod
+    def __GetTickerRetryKey(productId: str):
+        return "ticker " + productId
+
+    """
+    UpdateCurrentPriceFromTickerFeed
+    Sets the current price of a crypto account from the ticker feed
+    @param cryptoID: The crypto ID of the cryptocurrency account to update the price of
+    @return: if the ticker feed had a fresh price, otherwise the price should come from REST
+    """
+    def __UpdateCurrentPriceFromTickerFeed(self, cryptoID: str):
+        if self.__tickerFeed is None:
+            return False
+
+        lastPrice = self.__tickerFeed.GetLastPrice(self.__cryptoAccountTrackers[cryptoID].GetProductId())
+        if lastPrice is None:
+            return False
+
+        self.__SetCurrentPrice(cryptoID, lastPrice)
+        self.__ApplyHoldingsChangeToTotal(cryptoID)
+        self.__cryptoAccountTrackers[cryptoID].SetPriceStale(False)
+        return True
+
+    """
+    SetTickerFeed
+    @param tickerFeed: a started TickerFeed to read prices from before
+    falling back to REST, or None to only use REST
+    """
+    def SetTickerFeed(self, tickerFeed):
+        self.__tickerFeed = tickerFeed
+
+    """
+    FetchCurrentPrice
+    Queries coinbase pro for the current price of a product, this is run on
+    the price refresh threads so it must not touch the account trackers
+    @param productId: The product ID pair to get the price of, EX: BTC-USD
+    @return: the current price of the product
+    """
+    def __FetchCurrentPrice(self, cryptoID: str, productId: str):
+        with self.__metrics.Time("update_price", cryptoID):
+            accountProductTables = self.__client.get_product_ticker(product_id=productId)
+        return float(accountProductTables['price'])
+
+    """
+    UpdateCurrentPricesOfAllAccounts
+    Refreshes the current price of every crypto account at the same time.
+    Prices are taken from the ticker feed when it has a fresh one, the rest come from REST.
+    Waits until all of the prices are in or the refresh deadline passes,
+    any price which did not make it in time (or failed) keeps its old value
+    and is marked as stale for this tick instead of blocking the others
+    """
+    def UpdateCurrentPricesOfAllAccounts(self):
+        with self.__metrics.Time("update_prices"):
+            self.__UpdateCurrentPricesOfAllAccounts()
+
+    """
+    UpdateCurrentPricesOfAllAccounts
+    The body of UpdateCurrentPricesOfAllAccounts, each product's own REST refresh is timed in its worker
+    """
+    def __UpdateCurrentPricesOfAllAccounts(self):
+        refreshedFromTickerFeed = set()
+        for cryptoID in self.__cryptoIDs:
+            if self.__UpdateCurrentPriceFromTickerFeed(cryptoID):
+                refreshedFromTickerFeed.add(cryptoID)
+                continue
+            # A product whose ticker keeps failing is left stale until its circuit lets a trial call through
+            if self.__retryPolicy.IsOpen(self.__GetTickerRetryKey(self.__cryptoAccountTrackers[cryptoID].GetProductId())):
+                self.__cryptoAccountTrackers[cryptoID].SetPriceStale(True)
+                continue
+            # A request which missed an earlier deadline is still in flight, so don't pile on another one
+            if cryptoID not in self.__pendingPriceRefreshes:
+                self.__pendingPriceRefreshes[cryptoID] = self.__priceRefreshExecutor.submit(
+                    self.__FetchCurrentPrice, cryptoID, self.__cryptoAccountTrackers[cryptoID].GetProductId())
+
+        concurrent.futures.wait(list(self.__pendingPriceRefreshes.values()),
+                                timeout=self.__priceRefreshDeadlineSeconds)
+
+        for cryptoID in list(self.__pendingPriceRefreshes):
+            priceRefresh = self.__pendingPriceRefreshes[cryptoID]
+            if not priceRefresh.done():
+                if cryptoID not in refreshedFromTickerFeed:
+                    self.__cryptoAccountTrackers[cryptoID].SetPriceStale(True)
+                continue
+
+            del self.__pendingPriceRefreshes[cryptoID]
+            tickerRetryKey = self.__GetTickerRetryKey(self.__cryptoAccountTrackers[cryptoID].GetProductId())
             try:
-                accountProductTables = self.__client.get_product_ticker(
-                    product_id=self.__cryptoAccountTrackers[cryptoID].GetProductId())
-                self.__cryptoAccountTrackers[cryptoID].SetCurrentPrice(float(accountProductTables['price']))
-                runLoop = False
+                currentPrice = priceRefresh.result()
+                self.__retryPolicy.RecordSuccess(tickerRetryKey)
             except:
-                self.__exceptionsLogFile.write(str(datetime.datetime.now()) + "\n")
-                self.__exceptionsLogFile.write("An exception occurred in the Update Current Price function\n\n")
-                self.__exceptionsLogFile.close()
-                self.__exceptionsLogFile = open(self.__exceptionsLogFilePath, 'a')
-                time.sleep(1)
-                runLoop = True  # an error occurred so try again
+                self.__exceptionsLogger.LogMessage("An exception occurred refreshing the price of: " + cryptoID)
+                self.__retryPolicy.RecordFailure(tickerRetryKey)
+                if cryptoID not in refreshedFromTickerFeed:
+                    self.__cryptoAccountTrackers[cryptoID].SetPriceStale(True)
+                continue
+            if cryptoID in refreshedFromTickerFeed:
+                continue  # the ticker feed price is newer than this leftover request
+            self.__SetCurrentPrice(cryptoID, currentPrice)
+            self.__ApplyHoldingsChangeToTotal(cryptoID)
+            self.__cryptoAccountTrackers[cryptoID].SetPriceStale(False)
+
+    """
+    IsPriceStale
+    @param cryptoID: The crypto ID of the cryptocurrency to check
+    @return: if the price of that cryptocurrency could not be refreshed this tick
+    """
+    def IsPriceStale(self, cryptoID):
+        return self.__cryptoAccountTrackers[cryptoID].IsPriceStale()
+
+    """
+    ApplyHoldingsChangeToTotal
+    Adds the change in a crypto account's holdings in USD (from a new price
+    or a new balance) to the running total instead of re-adding every account
+    @param cryptoID: The crypto ID of the cryptocurrency account which changed
+    """
+    def __ApplyHoldingsChangeToTotal(self, cryptoID: str):
+        holdingsInUSD = self.__cryptoAccountTrackers[cryptoID].GetCurrentHoldingsInUSD()
+        self.__totalUSDHoldings = self.__totalUSDHoldings + (holdingsInUSD - self.__cryptoHoldingsInUSD[cryptoID])
+        self.__cryptoHoldingsInUSD[cryptoID] = holdingsInUSD
+        self.__PublishToShardCoordinator()
+
+    """
+    PublishToShardCoordinator
+    Shares the holdings of this shard's cryptos with the other shards
+    @param publishUSDAmount: if the USD balance was fetched and should be shared too, the
+    coordinator ignores it if a buy was settled since it was fetched
+    """
+    def __PublishToShardCoordinator(self, publishUSDAmount: bool = False):
+        if self.__shardCoordinator is None:
+            return
+        if publishUSDAmount:
+            self.__shardCoordinator.PublishUSDAmount(self.__usdAmount, self.__usdAmountSettlementCount)
+        self.__shardCoordinator.PublishShardHoldings(self.__shardIndex, self.__totalUSDHoldings - self.__usdAmount)
+
+    """
+    GetSettlementCount
+    @return: how many buys the shard coordinator has settled, 0 when not sharded
+    """
+    def __GetSettlementCount(self):
+        if self.__shardCoordinator is None:
+            return 0
+        return self.__shardCoordinator.GetSettlementCount()
+
+    """
+    ReserveUSD
+    Sets aside the USD of a buy so another shard can't spend it, does nothing when not sharded
+    @param cryptoID: The cryptoID of the cryptocurrency to buy
+    @param amountToBuyInUSD: the amount the buy needs
+    @return: the amount which can be bought, 0 if not enough USD was available
+    """
+    def __ReserveUSD(self, cryptoID: str, amountToBuyInUSD: float):
+        if self.__shardCoordinator is None or amountToBuyInUSD == 0.0:
+            return amountToBuyInUSD
+        cryptoSettings = self.__cryptoAccountTrackers[cryptoID].GetCryptoSettings()
+        reservedUSD = self.__shardCoordinator.ReserveUSD(self.__shardIndex, amountToBuyInUSD,
+                                                         cryptoSettings.SmallestAmountToBuyInUSD)
+        if reservedUSD != 0.0:
+            self.__usdReservations[cryptoID] = reservedUSD
+        return reservedUSD
+
+    """
+    SettleUSDReservation
+    Gives back the USD reserved for a crypto's buy once it is done with
+    @param cryptoID: The cryptoID of the cryptocurrency which was bought
+    @param spentUSD: the USD the buy spent including its fee
+    """
+    def __SettleUSDReservation(self, cryptoID: str, spentUSD: float = 0.0):
+        if cryptoID not in self.__usdReservations:
+            return
+        self.__shardCoordinator.SettleReservation(self.__shardIndex, self.__usdReservations.pop(cryptoID), spentUSD)
 
     """
     GetUSDAmount
     @return: the amount of USD available
     """
     def GetUSDAmount(self):
+        if self.__shardCoordinator is not None:
+            # Less whatever the shards have set aside for their buys
+            return self.__shardCoordinator.GetAvailableUSD()
         return self.__usdAmount
 
     """
@@ -339,21 +682,53 @@ class MasterBot:
     """
     UpdateUSDAccountAndAccountHoldings
     Updates the USD account and the amount of USD in the account
+    @return: if the USD amount was updated, otherwise it is left as it was for this tick
     """
     def UpdateUSDAccountAndAccountHoldings(self):
-        runLoop = True
-        while runLoop:
-            try:
-                self.__usdAccount = self.__client.get_account(self.__usdAccountID)
-                self.__usdAmount = round(float(self.__usdAccount['balance']), 2)
-                runLoop = False
-            except:
-                self.__exceptionsLogFile.write((str(datetime.datetime.now())) + "\n")
-                self.__exceptionsLogFile.write("An exception occurred in the Update USD Account loop\n\n")
-                self.__exceptionsLogFile.close()
-                self.__exceptionsLogFile = open(self.__exceptionsLogFilePath, 'a')
-                time.sleep(1)
-                runLoop = True
+        if not self.__RefreshAccountSnapshotIfStale():
+            return False
+        try:
+            usdAmount = round(self.__accountSnapshot.GetBalance(self.__usdAccountID), 2)
+        except:
+            self.__exceptionsLogger.LogMessage("An exception occurred in the Update USD Account loop")
+            return False
+        self.__totalUSDHoldings = self.__totalUSDHoldings + (usdAmount - self.__usdAmount)
+        self.__usdAmount = usdAmount
+        self.__usdAmountSettlementCount = self.__accountSnapshotSettlementCount
+        self.__PublishToShardCoordinator(publishUSDAmount=True)
+        return True
+
+    """
+    StartNewTick
+    Marks the account balances as out of date so they are fetched
+    again (once) the next time a balance is needed
+    """
+    def StartNewTick(self):
+        self.__accountSnapshot.Invalidate()
+
+    """
+    GetRESTCallsSavedByAccountSnapshot
+    @return: how many account REST calls were avoided by sharing
+    one get_accounts call between all of the accounts in a tick
+    """
+    def GetRESTCallsSavedByAccountSnapshot(self):
+        return self.__accountSnapshot.GetRESTCallsSaved()
+
+    """
+    GetRequestSchedulerReport
+    @return: the queued, throttled and coalesced request counters, empty if requests aren't scheduled
+    """
+    def GetRequestSchedulerReport(self):
+        if self.__requestScheduler is None:
+            return ""
+        return self.__requestScheduler.GetReport()
+
+    """
+    GetMetrics
+    @return: the Metrics the phases and calls to the exchange are recorded to
+    """
+    def GetMetrics(self):
+        return self.__metrics
 
     """
     UpdateCryptoAccount
@@ -365,6 +740,17 @@ class MasterBot:
         self.__UpdateHoldings(cryptoID)
         self.__UpdateCurrentPrice(cryptoID)
 
+    """
+    UpdateCryptoHoldings
+    Updates only the current holdings in coin of a particular crypto account,
+    used when the prices are refreshed with UpdateCurrentPricesOfAllAccounts
+    @param cryptoID: The crypto ID of the cryptocurrency to update
+    @return: if the holdings were updated, otherwise they are stale for this tick
+    """
+    def UpdateCryptoHoldings(self, cryptoID):
+        with self.__metrics.Time("update_holdings", cryptoID):
+            return self.__UpdateHoldings(cryptoID)
+
     """
     RenewPricesForCryptoAccount
     Used to reset the reference price and the
@@ -401,9 +787,21 @@ class MasterBot:
     """
     def UpdatePortfolioPercentagesOfAllAccounts(self):
         for cryptoID in self.__cryptoIDs:
-            currentUSDHoldingsInCrypto = self.__cryptoAccountTrackers[cryptoID].GetCurrentHoldingsInUSD()
-            portfolioPercentage = round((currentUSDHoldingsInCrypto / self.__totalUSDHoldings) * 100.0, 2)
-            self.__cryptoAccountTrackers[cryptoID].SetPortfolioPercentage(portfolioPercentage)
+            self.__cryptoAccountTrackers[cryptoID].SetPortfolioPercentage(self.GetPortfolioPercentage(cryptoID))
+
+    """
+    GetPortfolioPercentage
+    Calculates how much percentage of funds is allocated to an account
+    from the running total when it is asked for
+    @param cryptoID: The crypto ID of the cryptocurrency to check
+    @return: the portfolio percentage of that cryptocurrency
+    """
+    def GetPortfolioPercentage(self, cryptoID):
+        totalUSDHoldings = self.GetTotalHoldingsInUSD()
+        if totalUSDHoldings == 0.0:
+            return 0.0
+        currentUSDHoldingsInCrypto = self.__cryptoAccountTrackers[cryptoID].GetCurrentHoldingsInUSD()
+        return round((currentUSDHoldingsInCrypto / totalUSDHoldings) * 100.0, 2)
 
     """
     IsCryptoUp
@@ -443,6 +841,9 @@ class MasterBot:
     @return: If a buy order should be made for this cryptocurrency
     """
     def ShouldBuy(self, cryptoID):
+        # Wait for the buy already placed to fill before deciding on another one
+        if self.HasPendingBuy(cryptoID):
+            return False
         cryptoSettings = self.__cryptoAccountTrackers[cryptoID].GetCryptoSettings()
         return self.IsCryptoDown(cryptoID) and \
                self.__cryptoAccountTrackers[cryptoID].GetPercentage() >= cryptoSettings.LowToUpBuyInPercentageThreshold
@@ -471,16 +872,19 @@ class MasterBot:
             amountToBuyInUSD = cryptoSettings.LargestAmountToBuyInUSD
 
         # check to make sure you are not going over the portfolio percentage limit
+        # (of the whole portfolio, across every shard when sharded)
+        totalUSDHoldings = self.GetTotalHoldingsInUSD()
         currentCryptoHoldingsInUSD = self.__cryptoAccountTrackers[cryptoID].GetCurrentHoldingsInUSD()
-        holdingsPercentageAfterPurchase = round(((amountToBuyInUSD + currentCryptoHoldingsInUSD) / self.__totalUSDHoldings) * 100.0, 2)
+        holdingsPercentageAfterPurchase = round(((amountToBuyInUSD + currentCryptoHoldingsInUSD) / totalUSDHoldings) * 100.0, 2)
         if holdingsPercentageAfterPurchase > cryptoSettings.MaxPortfolioPercentage:
-            currentPortfolioPercentage = self.__cryptoAccountTrackers[cryptoID].GetPortfolioPercentage()
+            currentPortfolioPercentage = self.GetPortfolioPercentage(cryptoID)
             holdingsPercentageDifference = cryptoSettings.MaxPortfolioPercentage - currentPortfolioPercentage
-            amountToBuyInUSD = round(self.__totalUSDHoldings * (holdingsPercentageDifference / 100.0), 2)
+            amountToBuyInUSD = round(totalUSDHoldings * (holdingsPercentageDifference / 100.0), 2)
 
         # account for the fees if you barely have enough to buy in
-        if amountToBuyInUSD >= round(self.__usdAmount - (self.__usdAmount * 0.006), 2):
-            amountToBuyInUSD = round(self.__usdAmount - (self.__usdAmount * 0.006), 2)
+        usdAmount = self.GetUSDAmount()
+        if amountToBuyInUSD >= round(usdAmount - (usdAmount * 0.006), 2):
+            amountToBuyInUSD = round(usdAmount - (usdAmount * 0.006), 2)
 
         if amountToBuyInUSD < cryptoSettings.SmallestAmountToBuyInUSD:
             amountToBuyInUSD = 0.0
@@ -505,31 +909,93 @@ class MasterBot:
 
     """
     BuyIn
-    Buys a certain amount of the cryptocurrency and adds it to the
-    list of active buy orders
+    Places a buy of a certain amount of the cryptocurrency. Once it fills
+    (see ApplyCompletedOrders) the amount and price it actually filled at
+    are added to the list of active buy orders
     @param cryptoID: The cryptoID of the cryptocurrency to buy in
     @param amountToBuyInCoin: The amount of cryptocurrency to buy in
     the native coin amount
+    @return: if the buy was placed, or with synchronous orders if it was filled
     """
     #TODO: Test in simulation
     def BuyIn(self, cryptoID, amountToBuyInCoin):
-        runLoop = True
-        while runLoop:
-            try:
-                self.__client.buy(product_id=self.__cryptoAccountTrackers[cryptoID].GetProductId(),
-                                      order_type="market",
-                                      size=amountToBuyInCoin)
-                runLoop = False
-            except:
-                self.__exceptionsLogFile.write(str(datetime.datetime.now()) + "\n")
-                self.__exceptionsLogFile.write("An exception occurred trying to buy: ")
-                self.__exceptionsLogFile.write(str(amountToBuyInCoin) + " " + cryptoID + "\n")
-                self.__exceptionsLogFile.close()
-                self.__exceptionsLogFile = open(self.__exceptionsLogFilePath, 'a')
-                runLoop = True
-                time.sleep(1)
-
-        self.__cryptoAccountTrackers[cryptoID].AddActivePurchase(amountToBuyInCoin)
+        cryptoAccountTracker = self.__cryptoAccountTrackers[cryptoID]
+        self.__cryptoIDsWithPendingBuys.add(cryptoID)
+        self.__orderPipeline.SubmitOrder(cryptoID, "buy", cryptoAccountTracker.GetProductId(), amountToBuyInCoin,
+                                         cryptoAccountTracker.GetCurrentPrice())
+        # The exchange holds the USD for the order as soon as it is placed, so the balances must be fetched again
+        self.__accountSnapshot.Invalidate()
+
+        activePurchaseCount = cryptoAccountTracker.GetActivePurchaseCount()
+        self.ApplyCompletedOrders()
+        if cryptoID in self.__cryptoIDsWithPendingBuys:
+            return True  # still being placed in the background
+        return cryptoAccountTracker.GetActivePurchaseCount() != activePurchaseCount
+
+    """
+    HasPendingBuy
+    @param cryptoID: The cryptoID of the cryptocurrency to check
+    @return: if a buy of the cryptocurrency has been placed but its fill hasn't been applied yet
+    """
+    def HasPendingBuy(self, cryptoID):
+        return cryptoID in self.__cryptoIDsWithPendingBuys
+
+    """
+    HasPendingSell
+    @param cryptoID: The cryptoID of the cryptocurrency to check
+    @return: if a sell of the cryptocurrency has been placed but its fill hasn't been applied yet
+    """
+    def HasPendingSell(self, cryptoID):
+        return self.__orderExecutor.HasPendingSell(cryptoID)
+
+    """
+    ApplyCompletedOrders
+    Applies the orders which have finished since the last call, at the size and price they
+    really filled at, and writes their transactions. A buy is added to its crypto account
+    as an active purchase, a sell takes the coin it sold off the lots it was made of
+    @return: maps the crypto ID to the LotFills of its sells which were applied
+    """
+    def ApplyCompletedOrders(self):
+        lotFillsByCryptoID = {}
+        for orderCompletion in self.__orderPipeline.GetCompletedOrders():
+            cryptoID = orderCompletion.cryptoID
+            if orderCompletion.side == "sell":
+                lotFills = self.__orderExecutor.ApplySellCompletion(orderCompletion)
+                if lotFills:
+                    self.__ApplyLotFills(cryptoID, lotFills)
+                    lotFillsByCryptoID[cryptoID] = lotFills
+                continue
+
+            self.__cryptoIDsWithPendingBuys.discard(cryptoID)
+            self.__SettleUSDReservation(cryptoID, orderCompletion.executedValue + orderCompletion.fee)
+            if orderCompletion.filledSize == 0.0:
+                continue
+            self.__cryptoAccountTrackers[cryptoID].AddActivePurchase(orderCompletion.filledSize,
+                                                                     orderCompletion.GetPrice())
+            self.WriteBuyTransactionToLogFile(cryptoID, orderCompletion.filledSize, orderCompletion.executedValue)
+            # The balances changed so they must be fetched again
+            self.__accountSnapshot.Invalidate()
+        return lotFillsByCryptoID
+
+    """
+    ApplyLotFills
+    Takes what a sell sold off the lots it was made of and writes the sell's transactions
+    @param cryptoID: The cryptoID of the cryptocurrency which was sold
+    @param lotFills: the LotFills of the sell
+    """
+    def __ApplyLotFills(self, cryptoID, lotFills):
+        cryptoAccountTracker = self.__cryptoAccountTrackers[cryptoID]
+        for lotFill in lotFills:
+            if lotFill.remainingInCoin == 0.0:
+                cryptoAccountTracker.RemoveActivePurchase(lotFill.lot)
+            else:
+                # Only part of it was sold, the rest is kept to be sold with the next lots
+                cryptoAccountTracker.SetActivePurchaseAmount(lotFill.lot.lotID, lotFill.remainingInCoin)
+            self.WriteSellTransactionToLogFile(cryptoID, lotFill.amountInCoin, lotFill.amountInUSD)
+        # The reference price is renewed from the price the next run sees
+        self.SetRenewPriceFlagForCryptoAccount(cryptoID, True)
+        # The balances changed so they must be fetched again
+        self.__accountSnapshot.Invalidate()
 
     """
     EvaluateAndAdjustBuyOrders
@@ -541,34 +1007,7 @@ class MasterBot:
     buy orders of
     """
     def EvaluateAndAdjustBuyOrders(self, cryptoID):
-        cryptoSettings = self.__cryptoAccountTrackers[cryptoID].GetCryptoSettings()
-        activeBuys = self.__cryptoAccountTrackers[cryptoID].GetActivePurchases()
-        lenOfActiveBuys = len(activeBuys)
-        i = 0
-        while i < lenOfActiveBuys:
-            activeBuy = activeBuys[i]
-            referencePrice = activeBuy[1]
-            currentPercentageState = activeBuy[3]
-            referencePercentDifference = round(
-                ((self.__cryptoAccountTrackers[cryptoID].GetCurrentPrice() / referencePrice) - 1.0) * 100, 2)
-            if currentPercentageState == CryptoCurrencyPercentageStates.Neutral or currentPercentageState == CryptoCurrencyPercentageStates.Down:
-                if referencePercentDifference <= cryptoSettings.LowPercentageThreshold:
-                    currentPercentageState = CryptoCurrencyPercentageStates.Down
-
-                elif referencePercentDifference >= cryptoSettings.HighPercentageThreshold:
-                    currentPercentageState = CryptoCurrencyPercentageStates.Up
-                else:
-                    currentPercentageState = CryptoCurrencyPercentageStates.Neutral
-            self.__cryptoAccountTrackers[cryptoID].UpdateActivePurchasePercentageState(i, currentPercentageState)
-
-            if currentPercentageState == CryptoCurrencyPercentageStates.Up:
-                if referencePercentDifference >= cryptoSettings.AdjustReferencePriceUpThreshold:
-                    currentPrice = self.__cryptoAccountTrackers[cryptoID].GetCurrentPrice()
-                    desiredPercentageDifferenceInDecimal = cryptoSettings.HighPercentageThreshold / 100.0
-                    newReferencePrice = round(currentPrice * ((desiredPercentageDifferenceInDecimal - 1.0) * -1.0), 2)
-                    self.__cryptoAccountTrackers[cryptoID].UpdateActivePurchaseReferencePrice(i, newReferencePrice)
-
-            i = i + 1
+        self.__cryptoAccountTrackers[cryptoID].EvaluateActivePurchases()
 
     """
     ShouldSell
@@ -576,16 +1015,10 @@ class MasterBot:
     @return: If a sell should be made on one of the active purchases
     """
     def ShouldSell(self, cryptoID):
-        cryptoSettings = self.__cryptoAccountTrackers[cryptoID].GetCryptoSettings()
-        activeBuys = self.__cryptoAccountTrackers[cryptoID].GetActivePurchases()
-        for activeBuy in activeBuys:
-            currentPrice = self.__cryptoAccountTrackers[cryptoID].GetCurrentPrice()
-            percentage = round(((float(currentPrice) / float(activeBuy[1])) - 1) * 100, 2)
-            currentPercentageState = activeBuy[3]
-            if currentPercentageState == CryptoCurrencyPercentageStates.Up and \
-                    percentage <= cryptoSettings.HighToDownSellOutPercentageThreshold:
-                return True
-        return False
+        # Wait for the sell already placed to fill, its lots are still held until then
+        if self.HasPendingSell(cryptoID):
+            return False
+        return self.__cryptoAccountTrackers[cryptoID].ShouldSellActivePurchases()
 
     """
     GetOrdersToSell
@@ -593,46 +1026,42 @@ class MasterBot:
     @return: The orders that should be sold
     """
     def GetOrdersToSell(self, cryptoID):
-        cryptoSettings = self.__cryptoAccountTrackers[cryptoID].GetCryptoSettings()
-        activeBuys = self.__cryptoAccountTrackers[cryptoID].GetActivePurchases()
-        ordersToSell = []
-        for activeBuy in activeBuys:
-            currentPrice = self.__cryptoAccountTrackers[cryptoID].GetCurrentPrice()
-            percentage = round(((float(currentPrice) / float(activeBuy[1])) - 1) * 100, 2)
-            currentPercentageState = activeBuy[3]
-            if currentPercentageState == CryptoCurrencyPercentageStates.Up and \
-                    percentage <= cryptoSettings.HighToDownSellOutPercentageThreshold:
-                ordersToSell.append(activeBuy)
-
-        return ordersToSell
+        return self.__cryptoAccountTrackers[cryptoID].GetActivePurchasesToSell()
 
     """
     SellOut
-    Sells out a particular group of orders which have been held
+    Sells out a particular group of orders which have been held, as a single market sell
     @param cryptoID: The cryptoID of the cryptocurrency to sell
     @param ordersToSell: A list of the orders to sell
+    @return: if the sell was placed, or with synchronous orders if it sold anything (otherwise the orders are kept)
     """
     # TODO: Test in simulation
     def SellOut(self, cryptoID, ordersToSell):
-        for orderToSell in ordersToSell:
-            amountToSellInCoin = orderToSell[0]
-            runLoop = True
-            while runLoop:
-                try:
-                    self.__client.sell(product_id=self.__cryptoAccountTrackers[cryptoID].GetProductId(),
-                                      order_type="market",
-                                      size=amountToSellInCoin)
-                    runLoop = False
-                except:
-                    self.__exceptionsLogFile.write(str(datetime.datetime.now()) + "\n")
-                    self.__exceptionsLogFile.write("An exceptions occurred trying to sell: ")
-                    self.__exceptionsLogFile.write(str(amountToSellInCoin) + " " + cryptoID + "\n")
-                    self.__exceptionsLogFile.close()
-                    self.__exceptionsLogFile = open(self.__exceptionsLogFilePath, 'a')
-                    runLoop = True
-                    time.sleep(1)
-
-            self.__cryptoAccountTrackers[cryptoID].RemoveActivePurchase(orderToSell)
+        return self.SellOutOfAll({cryptoID: ordersToSell}).get(cryptoID, False)
+
+    """
+    SellOutOfAll
+    Places one market sell per crypto in the background. The orders being sold are kept (and
+    no other sell of the crypto is placed) until the sell fills and ApplyCompletedOrders takes them off
+    @param ordersToSellByCryptoID: maps the crypto ID to the list of its orders to sell
+    @return: maps the crypto ID to if its sell was placed, or with synchronous orders if it sold anything
+    """
+    def SellOutOfAll(self, ordersToSellByCryptoID):
+        sellOrders = []
+        currentPrices = {}
+        for cryptoID, ordersToSell in ordersToSellByCryptoID.items():
+            cryptoAccountTracker = self.__cryptoAccountTrackers[cryptoID]
+            sellOrders.append(OrderExecutor.SellOrder(cryptoID, cryptoAccountTracker.GetProductId(),
+                                                      cryptoAccountTracker.GetMinSize(), ordersToSell))
+            currentPrices[cryptoID] = cryptoAccountTracker.GetCurrentPrice()
+        if not sellOrders:
+            return {}
+
+        submittedCryptoIDs = self.__orderExecutor.SubmitSells(sellOrders, currentPrices)
+        lotFillsByCryptoID = self.ApplyCompletedOrders()
+        # A sell which was given up on is tried again on the next run
+        return {cryptoID: self.HasPendingSell(cryptoID) or cryptoID in lotFillsByCryptoID
+                for cryptoID in submittedCryptoIDs}
 
     """
     WriteBuyTransactionToLogFile
@@ -641,29 +1070,10 @@ class MasterBot:
     @param amountInUSD: The amount of the cryptocurrency in USD
     @param amountInCoin: The amount of the cryptocurrency in terms of
     the crypto coin
+    @param amountInUSD: what the buy was filled for, None to value it at the current price
     """
-    def WriteBuyTransactionToLogFile(self, cryptoID, amountInCoin):
-        amountInUSD = amountInCoin * self.__cryptoAccountTrackers[cryptoID].GetCurrentPrice()
-        filePath = self.__transactionsLogFolderPath + "/" + cryptoID + ".csv"
-        if not os.path.exists(filePath):
-            TransactionLogFile = open(filePath, 'w')
-            TransactionLogFile.write("Transaction,Amount ($),Amount (" + cryptoID + "),Current Price,Price Since Last Transaction,Date-Time\n")
-            TransactionLogFile.write("Buy,")
-            TransactionLogFile.write(str(amountInUSD) + ",")
-            TransactionLogFile.write(str(amountInCoin) + ",")
-            TransactionLogFile.write(str(self.__cryptoAccountTrackers[cryptoID].GetCurrentPrice()) + ",")
-            TransactionLogFile.write(str(self.__cryptoAccountTrackers[cryptoID].GetPriceSinceLastTransaction()) + ",")
-            TransactionLogFile.write(str(datetime.datetime.now()) + "\n")
-            TransactionLogFile.close()
-        else:
-            TransactionLogFile = open(filePath, 'a')
-            TransactionLogFile.write("Buy,")
-            TransactionLogFile.write(str(amountInUSD) + ",")
-            TransactionLogFile.write(str(amountInCoin) + ",")
-            TransactionLogFile.write(str(self.__cryptoAccountTrackers[cryptoID].GetCurrentPrice()) + ",")
-            TransactionLogFile.write(str(self.__cryptoAccountTrackers[cryptoID].GetPriceSinceLastTransaction()) + ",")
-            TransactionLogFile.write(str(datetime.datetime.now()) + "\n")
-            TransactionLogFile.close()
+    def WriteBuyTransactionToLogFile(self, cryptoID, amountInCoin, amountInUSD=None):
+        self.__WriteTransactionToLogFile(cryptoID, "Buy", amountInCoin, amountInUSD)
 
     """
     WriteSellTransactionToLogFile
@@ -671,29 +1081,63 @@ class MasterBot:
     @param cryptoID: the crypto ID of the cryptocurrency
     @param amountInCoin: The amount of the cryptocurrency in terms of
     the crypto coin
+    @param amountInUSD: what the sell was filled for, None to value it at the current price
     """
-    def WriteSellTransactionToLogFile(self, cryptoID, amountInCoin):
-        amountInUSD = amountInCoin * self.__cryptoAccountTrackers[cryptoID].GetCurrentPrice()
-        filePath = self.__transactionsLogFolderPath + "/" + cryptoID + ".csv"
-        if not os.path.exists(filePath):
-            TransactionLogFile = open(filePath, 'w')
-            TransactionLogFile.write("Transaction,Amount ($),Amount (" + cryptoID + "),Current Price,Price Since Last Transaction,Date-Time\n")
-            TransactionLogFile.write("Sell,")
-            TransactionLogFile.write(str(amountInUSD) + ",")
-            TransactionLogFile.write(str(amountInCoin) + ",")
-            TransactionLogFile.write(str(self.__cryptoAccountTrackers[cryptoID].GetCurrentPrice()) + ",")
-            TransactionLogFile.write(str(self.__cryptoAccountTrackers[cryptoID].GetPriceSinceLastTransaction()) + ",")
-            TransactionLogFile.write(str(datetime.datetime.now()) + "\n")
-            TransactionLogFile.close()
-        else:
-            TransactionLogFile = open(filePath, 'a')
-            TransactionLogFile.write("Sell,")
-            TransactionLogFile.write(str(amountInUSD) + ",")
-            TransactionLogFile.write(str(amountInCoin) + ",")
-            TransactionLogFile.write(str(self.__cryptoAccountTrackers[cryptoID].GetCurrentPrice()) + ",")
-            TransactionLogFile.write(str(self.__cryptoAccountTrackers[cryptoID].GetPriceSinceLastTransaction()) + ",")
-            TransactionLogFile.write(str(datetime.datetime.now()) + "\n")
-            TransactionLogFile.close()
+    def WriteSellTransactionToLogFile(self, cryptoID, amountInCoin, amountInUSD=None):
+        self.__WriteTransactionToLogFile(cryptoID, "Sell", amountInCoin, amountInUSD)
+
+    """
+    WriteTransactionToLogFile
+    Adds a transaction to the transaction store, it is written out with the next batch
+    @param cryptoID: the crypto ID of the cryptocurrency
+    @param transaction: "Buy" or "Sell"
+    @param amountInCoin: The amount of the cryptocurrency in terms of
+    the crypto coin
+    @param amountInUSD: what the transaction was filled for, None to value it at the current price
+    """
+    def __WriteTransactionToLogFile(self, cryptoID, transaction: str, amountInCoin, amountInUSD=None):
+        if not self.__enableFileOutput:
+            return
+        currentPrice = self.__cryptoAccountTrackers[cryptoID].GetCurrentPrice()
+        if amountInUSD is None:
+            amountInUSD = amountInCoin * currentPrice
+        elif amountInCoin != 0.0:
+            currentPrice = amountInUSD / amountInCoin
+        self.__transactionStore.Append(cryptoID, transaction, amountInUSD, amountInCoin, currentPrice,
+                                       self.__cryptoAccountTrackers[cryptoID].GetPriceSinceLastTransaction())
+
+    """
+    FlushTransactions
+    Writes out the transactions which are waiting in the current batch
+    """
+    def FlushTransactions(self):
+        if self.__enableFileOutput:
+            self.__transactionStore.Flush()
+
+    """
+    FlushCandles
+    Writes out the candles which closed since the last flush, closing first the ones
+    of any crypto whose price stopped coming in
+    """
+    def FlushCandles(self):
+        if not self.__enableFileOutput:
+            return
+        flushTime = time.time()
+        for cryptoID in self.__cryptoAccountTrackers:
+            self.__candleAggregator.CloseCandlesBefore(cryptoID, flushTime)
+        self.__candleAggregator.Flush()
+
+    """
+    QueryTransactions
+    @param cryptoID: the crypto ID of the cryptocurrency
+    @param startTime: the earliest time (a datetime or seconds since the epoch) to include
+    @param endTime: the latest time (a datetime or seconds since the epoch) to include
+    @return: the transactions of that cryptocurrency between the two times, as TransactionRecords
+    """
+    def QueryTransactions(self, cryptoID, startTime, endTime):
+        if not self.__enableFileOutput:
+            return []
+        return self.__transactionStore.Query(cryptoID, startTime, endTime)
 
     """
     ShouldRenewPriceForCryptoAccount
@@ -764,70 +1208,257 @@ class MasterBot:
     """
     UpdateTotalHoldingsInUSDFromAllAccounts
     Updates the total amount of holdings from all of the active
-    crypto accounts
+    crypto accounts. The total is otherwise kept up to date as each
+    account changes, so this only needs to run to resynchronize it
     """
     def UpdateTotalHoldingsInUSDFromAllAccounts(self):
         self.__totalUSDHoldings = self.__usdAmount
         for cryptoID in self.__cryptoIDs:
-            self.__totalUSDHoldings = self.__totalUSDHoldings + self.__cryptoAccountTrackers[cryptoID].GetCurrentHoldingsInUSD()
+            holdingsInUSD = self.__cryptoAccountTrackers[cryptoID].GetCurrentHoldingsInUSD()
+            self.__cryptoHoldingsInUSD[cryptoID] = holdingsInUSD
+            self.__totalUSDHoldings = self.__totalUSDHoldings + holdingsInUSD
+        self.__PublishToShardCoordinator()
+
+    """
+    GetTotalHoldingsInUSD
+    @return: the total amount of holdings in USD from the USD account
+    and all of the crypto accounts
+    """
+    def GetTotalHoldingsInUSD(self):
+        if self.__shardCoordinator is not None:
+            return self.__shardCoordinator.GetTotalHoldingsInUSD()
+        return self.__totalUSDHoldings
 
     # USED FOR TESTING PURPOSES ONLY
     def SetUSDAmount(self, usdAmount):
+        self.__totalUSDHoldings = self.__totalUSDHoldings + (usdAmount - self.__usdAmount)
         self.__usdAmount = usdAmount
     # USED FOR TESTING PURPOSES ONLY
     def SetTotalHoldings(self, totalHoldings):
         self.__totalUSDHoldings = totalHoldings
 
     #TODO: test in simulation
-    def LogCryptoDataToRecordingFile(self):
+    # extraText (EX: the decision latency report) is written after the accounts in the text recording
+    def LogCryptoDataToRecordingFile(self, extraText: str = ""):
+        if not self.__enableFileOutput:
+            return
+        recordingTime = time.time()
+        for cryptoID in self.__cryptoIDs:
+            cryptoAccountTracker = self.__cryptoAccountTrackers[cryptoID]
+            self.__recordingStore.Append(cryptoID, (recordingTime,
+                                                    cryptoAccountTracker.GetReferencePrice(),
+                                                    cryptoAccountTracker.GetCurrentPrice(),
+                                                    cryptoAccountTracker.GetPercentage(),
+                                                    cryptoAccountTracker.GetCurrentHoldingsInCoin(),
+                                                    cryptoAccountTracker.GetCurrentHoldingsInUSD(),
+                                                    self.GetPortfolioPercentage(cryptoID)))
+        if not self.__recordingTextOutput:
+            return
+
         # for the first crypto ID, put in the date and time
-        self.__recordingLogFile.write(str(datetime.datetime.now()) + "\n")
+        recordingText = str(datetime.datetime.now()) + "\n"
         for cryptoID in self.__cryptoIDs:
-            self.__recordingLogFile.write(self.__cryptoAccountTrackers[cryptoID].GetCryptoName() + ":\n")
-            self.__recordingLogFile.write(
-                "   Reference Price: " + str(self.__cryptoAccountTrackers[cryptoID].GetReferencePrice()) + "\n")
-            self.__recordingLogFile.write(
-                "   Current Price: " + str(self.__cryptoAccountTrackers[cryptoID].GetCurrentPrice()) + "\n")
-            self.__recordingLogFile.write(
-                "   Percentage: " + str(self.__cryptoAccountTrackers[cryptoID].GetPercentage()) + "\n")
-            self.__recordingLogFile.write(
-                "   Holdings in Coin: " + str(self.__cryptoAccountTrackers[cryptoID].GetCurrentHoldingsInCoin()) + "\n")
-            self.__recordingLogFile.write(
-                "   Holdings in USD: " + str(self.__cryptoAccountTrackers[cryptoID].GetCurrentHoldingsInUSD()) + "\n")
-            self.__recordingLogFile.write(
-                "   Portfolio Percentage: " + str(self.__cryptoAccountTrackers[cryptoID].GetPortfolioPercentage()) +
-                "\n")
-
-        usdPortfolioPercentage = round((self.__usdAmount / self.__totalUSDHoldings) * 100.0, 2)
-        self.__recordingLogFile.write("USD Account:\n")
-        self.__recordingLogFile.write("   Holdings: " + str(self.__usdAmount) + "\n")
-        self.__recordingLogFile.write("   Portfolio Percentage: " + str(usdPortfolioPercentage) + "\n\n")
-        self.__recordingLogFile.close()
-        self.__recordingLogFile = open(self.__recordingLogFilePath, 'a')
+            cryptoAccountTracker = self.__cryptoAccountTrackers[cryptoID]
+            recordingText = (recordingText + cryptoAccountTracker.GetCryptoName() + ":\n" +
+                             "   Reference Price: " + str(cryptoAccountTracker.GetReferencePrice()) + "\n" +
+                             "   Current Price: " + str(cryptoAccountTracker.GetCurrentPrice()) + "\n" +
+                             "   Percentage: " + str(cryptoAccountTracker.GetPercentage()) + "\n" +
+                             "   Holdings in Coin: " + str(cryptoAccountTracker.GetCurrentHoldingsInCoin()) + "\n" +
+                             "   Holdings in USD: " + str(cryptoAccountTracker.GetCurrentHoldingsInUSD()) + "\n" +
+                             "   Portfolio Percentage: " + str(self.GetPortfolioPercentage(cryptoID)) + "\n")
+
+        usdPortfolioPercentage = round((self.__usdAmount / self.GetTotalHoldingsInUSD()) * 100.0, 2)
+        recordingText = (recordingText + "USD Account:\n" +
+                         "   Holdings: " + str(self.__usdAmount) + "\n" +
+                         "   Portfolio Percentage: " + str(usdPortfolioPercentage) + "\n" +
+                         extraText + "\n")
+        self.__recordingLogger.Write(recordingText)
 
     """
     ExportCryptoBackup
-    Exports backup information pertaining to the cryptocurrency such as active buy orders,
-    the reference price and the price since the last transaction
+    Commits the changes to the cryptocurrency's active buy orders, reference price and
+    price since the last transaction to its backup journal.
+    Nothing is written unless one of those changed, and a change within the coalescing
+    interval of the last write is left for FlushCryptoBackups to write later
     @param cryptoID: The cryptoID of the cryptocurrency to write a backup on
     """
     def ExportCryptoBackup(self, cryptoID):
-        backupFile = open(self.__cryptoBackupFolderPath + "/" + cryptoID + ".txt", "w")
-        activeBuyOrders = self.__cryptoAccountTrackers[cryptoID].GetActivePurchases()
-        for activeBuyOrder in activeBuyOrders:
-            backupFile.write(str(activeBuyOrder[0]) + ", ")
-            backupFile.write(str(activeBuyOrder[1]) + ", ")
-            backupFile.write(str(activeBuyOrder[2]) + ", ")
-            backupFile.write(str(int(activeBuyOrder[3])) + "\n")
-        backupFile.write("Reference Price: " + str(self.__cryptoAccountTrackers[cryptoID].GetReferencePrice()) + "\n")
-        backupFile.write("Last Transaction Price: " +
-                         str(self.__cryptoAccountTrackers[cryptoID].GetPriceSinceLastTransaction()) + "\n")
-        backupFile.close()
+        if not self.__enableFileOutput:
+            return
+        if not self.__cryptoAccountTrackers[cryptoID].IsBackupDirty():
+            return
+        lastBackupWriteTime = self.__lastBackupWriteTimes.get(cryptoID)
+        if lastBackupWriteTime is not None and time.monotonic() - lastBackupWriteTime < self.__backupCoalesceSeconds:
+            return
+        self.__CommitCryptoJournal(cryptoID)
+
+    """
+    FlushCryptoBackups
+    Writes the backup of every crypto which changed since its backup was last written
+    @param force: write them even if they are inside the coalescing interval
+    """
+    def FlushCryptoBackups(self, force: bool = False):
+        if not self.__enableFileOutput:
+            return
+        for cryptoID in self.__cryptoJournals:
+            if force:
+                if self.__cryptoAccountTrackers[cryptoID].IsBackupDirty():
+                    self.__CommitCryptoJournal(cryptoID)
+            else:
+                self.ExportCryptoBackup(cryptoID)
+
+    """
+    CommitCryptoJournal
+    Appends the changes recorded since the last commit to the crypto's journal
+    @param cryptoID: The cryptoID of the cryptocurrency to write a backup on
+    """
+    def __CommitCryptoJournal(self, cryptoID):
+        self.__cryptoJournals[cryptoID].Commit(self.__cryptoAccountTrackers[cryptoID])
+        self.__cryptoAccountTrackers[cryptoID].MarkBackupClean()
+        self.__lastBackupWriteTimes[cryptoID] = time.monotonic()
+
+    """
+    GetDecisionInputs
+    @param cryptoID: The crypto ID of the cryptocurrency to check
+    @return: everything the decisions for that cryptocurrency depend on, its price, its
+    holdings (along with the USD and its share of the portfolio), its settings, its own state
+    and if it has a buy or sell in flight.
+    If this is the same as when its decisions last ran, running them again would do nothing
+    """
+    def GetDecisionInputs(self, cryptoID):
+        cryptoAccountTracker = self.__cryptoAccountTrackers[cryptoID]
+        return (cryptoAccountTracker.GetCurrentPrice(),
+                cryptoAccountTracker.GetCurrentHoldingsInCoin(),
+                self.GetUSDAmount(),
+                self.GetPortfolioPercentage(cryptoID),
+                cryptoAccountTracker.GetCryptoSettingsVersion(),
+                cryptoAccountTracker.GetReferencePrice(),
+                cryptoAccountTracker.GetPriceSinceLastTransaction(),
+                cryptoAccountTracker.GetCryptoPercentageState(),
+                cryptoAccountTracker.GetRenewPriceFlag(),
+                cryptoAccountTracker.GetActivePurchaseCount(),
+                self.HasPendingBuy(cryptoID),
+                self.HasPendingSell(cryptoID))
+
+    """
+    RunDecisionPipelineForCryptoAccount
+    Runs every buying and selling decision for a crypto account whose
+    price and holdings have already been updated for this tick, places
+    any orders which are needed and exports its backup
+    @param cryptoID: The crypto ID of the cryptocurrency to run the decisions on
+    @return: if a buy or sell decision was made (so the recording file should be updated)
+    """
+    def RunDecisionPipelineForCryptoAccount(self, cryptoID):
+        return self.RunDecisionPipelinesForCryptoAccounts([cryptoID])[cryptoID]
+
+    """
+    RunDecisionPipelinesForCryptoAccounts
+    Runs the decision pipeline of several crypto accounts whose prices and holdings
+    have already been updated for this tick. The buys are decided and made one crypto
+    after another (each sees the USD the ones before it spent), then the sells of
+    every crypto are handed to the order pipeline together
+    @param cryptoIDs: The crypto IDs of the cryptocurrencies to run the decisions on
+    @return: maps the crypto ID to if a buy or sell decision was made for it
+    """
+    def RunDecisionPipelinesForCryptoAccounts(self, cryptoIDs):
+        with self.__metrics.Time("apply_orders"):
+            self.ApplyCompletedOrders()
+        madeTransactions = {}
+        ordersToSellByCryptoID = {}
+        for cryptoID in cryptoIDs:
+            # A buy on an earlier crypto changed the balances, so bring them in again
+            if self.__accountSnapshot.IsStale():
+                if not self.UpdateUSDAccountAndAccountHoldings() or not self.UpdateCryptoHoldings(cryptoID):
+                    madeTransactions[cryptoID] = False
+                    continue
+            madeTransactions[cryptoID] = self.__RunBuyDecisionsForCryptoAccount(cryptoID)
+
+            # Check the active buy orders and see if we should sell
+            if self.ShouldSell(cryptoID):
+                ordersToSellByCryptoID[cryptoID] = self.GetOrdersToSell(cryptoID)
+
+        # Each crypto's own sell is timed as it is placed, their transactions are written once they fill
+        with self.__metrics.Time("sell_all"):
+            soldOut = self.SellOutOfAll(ordersToSellByCryptoID)
+        for cryptoID, placedSell in soldOut.items():
+            if placedSell:
+                madeTransactions[cryptoID] = True
+
+        for cryptoID in cryptoIDs:
+            with self.__metrics.Time("export_backup", cryptoID):
+                self.ExportCryptoBackup(cryptoID)
+        return madeTransactions
+
+    """
+    RunBuyDecisionsForCryptoAccount
+    Runs every decision of a crypto account's pipeline which comes before selling,
+    making a buy if one is needed
+    @param cryptoID: The crypto ID of the cryptocurrency to run the decisions on
+    @return: if a buy decision was made
+    """
+    def __RunBuyDecisionsForCryptoAccount(self, cryptoID):
+        madeTransaction = False
+        with self.__metrics.Time("evaluate", cryptoID):
+            if self.ShouldRenewPriceForCryptoAccount(cryptoID):
+                self.RenewPricesForCryptoAccount(cryptoID)
+                self.SetRenewPriceFlagForCryptoAccount(cryptoID, False)
+
+            # Do some evaluation before determining buying or selling
+            self.RunPercentageCalculationOfCryptoAccount(cryptoID)
+            self.EvaluateAndAdjustBuyOrders(cryptoID)
+
+        if self.IsCryptoDown(cryptoID):
+            if self.ShouldBuy(cryptoID):
+                with self.__metrics.Time("buy", cryptoID):
+                    # Another shard can't spend the USD of this buy until it fills
+                    amountToBuyInUSD = self.__ReserveUSD(cryptoID, self.GetAmountToBuyInUSD(cryptoID))
+                    amountToBuyInCoin = self.GetAmountToBuyInCoin(cryptoID, amountToBuyInUSD)
+                    boughtIn = True
+                    if amountToBuyInCoin != 0.0:
+                        # Its transaction is written once it fills
+                        boughtIn = self.BuyIn(cryptoID, amountToBuyInCoin)
+                    else:
+                        self.__SettleUSDReservation(cryptoID)
+                # A buy which was given up on is decided again on the next run
+                if boughtIn:
+                    self.SetRenewPriceFlagForCryptoAccount(cryptoID, True)
+                    madeTransaction = True
+
+            elif self.ShouldAdjustFallingReferencePrice(cryptoID):
+                self.AdjustFallingReferencePrice(cryptoID)
+
+        # If crypto is up check if we should readjust the price
+        if self.IsCryptoUp(cryptoID):
+            if self.ShouldAdjustIncreasingReferencePrice(cryptoID):
+                self.AdjustIncreasingReferencePrice(cryptoID)
+            elif self.IsGoingBackDown(cryptoID):
+                self.SetCryptoNeutral(cryptoID)
+
+        return madeTransaction
 
     """
     CleanUp
     A destructor function for the MasterBot class
     """
     def CleanUp(self):
-        self.__recordingLogFile.close()
-        self.__exceptionsLogFile.close()
+        # Let the orders in flight finish so their lots are backed up
+        if self.__orderPipeline is not None:
+            self.__orderPipeline.Shutdown()
+            self.ApplyCompletedOrders()
+        if self.__shardCoordinator is not None:
+            self.__shardCoordinator.ReleaseShard(self.__shardIndex)
+        self.FlushCryptoBackups(force=True)
+        for cryptoJournal in self.__cryptoJournals.values():
+            cryptoJournal.Close()
+        if self.__transactionStore is not None:
+            self.__transactionStore.Close()
+        if self.__recordingStore is not None:
+            self.__recordingStore.Close()
+        if self.__candleAggregator is not None:
+            self.__candleAggregator.Close()
+        self.__priceRefreshExecutor.shutdown(wait=False, cancel_futures=True)
+        self.__metrics.StopServer()
+        if self.__tickerFeed is not None:
+            self.__tickerFeed.Stop()
+        self.__recordingLogger.Close()
+        self.__exceptionsLogger.Close()
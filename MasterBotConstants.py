@@ -2,3 +2,125 @@
 
 RECORDING_LOG_FILE_FIRST_MESSAGE = "Recording file for Crypto Trading Bot\n"
 EXCEPTION_LOG_FILE_FIRST_MESSAGE = "Exceptions file for Crypto Trading Bot\n"
+
+# The most ticker requests that may be in flight at once when refreshing prices
+PRICE_REFRESH_MAX_WORKERS = 8
+# How long a tick waits for the refreshed prices before marking the rest as stale
+PRICE_REFRESH_DEADLINE_SECONDS = 0.8
+
+# If prices should come from the websocket ticker feed (falling back to REST when it is stale)
+USE_TICKER_FEED = False
+# How old a price (or the whole feed) may get before it is no longer trusted
+TICKER_FEED_STALE_SECONDS = 5.0
+# How often the ticker feed connection is checked and re-established if needed
+TICKER_FEED_RECONNECT_DELAY_SECONDS = 1.0
+
+# The fraction of each order's value the simulated exchange takes as a fee
+SIMULATED_FEE_RATE = 0.005
+# How much worse than the current price the simulated exchange fills market orders
+SIMULATED_SLIPPAGE_RATE = 0.0
+# The smallest amount of a crypto the simulated exchange trades when none is given
+SIMULATED_MIN_SIZE = 0.0001
+
+# The shortest time between two writes of a crypto's backup, changes in between are written together
+BACKUP_COALESCE_SECONDS = 0.0
+
+# How many journal records are written before the journal is compacted into a snapshot
+JOURNAL_COMPACT_AFTER_RECORDS = 1000
+# If every journal commit is synced to disk, otherwise the operating system decides when
+JOURNAL_FSYNC_ON_COMMIT = True
+
+# The most log entries which can be waiting to be written, any more are dropped (and counted)
+LOG_QUEUE_SIZE = 10000
+# The most log entries written out at once
+LOG_MAX_BATCH_SIZE = 500
+# How long the log writer waits for more entries before writing out what it has
+LOG_FLUSH_INTERVAL_SECONDS = 0.5
+# If the logs are synced to disk after every batch ("batch") or left to the operating system ("never")
+LOG_FSYNC_POLICY = "batch"
+# How long a repeating message is counted instead of written before its count is written out
+LOG_DUPLICATE_WINDOW_SECONDS = 60.0
+
+# How many transactions are held before they are written out, the main loop also writes them every tick
+TRANSACTION_BATCH_SIZE = 64
+
+# The folder the column recordings of every crypto are stored in
+RECORDING_FOLDER_NAME = "recordings"
+# How many rows each recording chunk file holds
+RECORDING_CHUNK_ROWS = 16384
+# If the free text record file is written along with the column recordings
+RECORDING_TEXT_OUTPUT = False
+
+# How many requests per second can be made to the public (market data) endpoints, and how many at once
+REQUEST_PUBLIC_RATE_PER_SECOND = 3.0
+REQUEST_PUBLIC_BURST = 6.0
+# How many requests per second can be made to the private (account and order) endpoints, and how many at once
+REQUEST_PRIVATE_RATE_PER_SECOND = 5.0
+REQUEST_PRIVATE_BURST = 10.0
+
+# The first wait between retries of a failed call, it doubles with each failure up to the max (and is jittered)
+RETRY_BASE_DELAY_SECONDS = 0.25
+RETRY_MAX_DELAY_SECONDS = 8.0
+# How long a price or balance call is retried before its crypto is skipped for the tick
+RETRY_TICK_DEADLINE_SECONDS = 2.0
+# How long an order is retried before it is given up on until the next run
+RETRY_ORDER_DEADLINE_SECONDS = 10.0
+# How many failures in a row open a circuit, and how long it stays open before a trial call
+CIRCUIT_FAILURE_THRESHOLD = 3
+CIRCUIT_OPEN_SECONDS = 30.0
+
+# The file the currency names and product min sizes are cached in, and how long the cache is trusted
+EXCHANGE_CATALOG_CACHE_FILENAME = "exchange_catalog.json"
+EXCHANGE_CATALOG_TTL_SECONDS = 24.0 * 60.0 * 60.0
+
+# How many sells of different products can be placed at the same time
+ORDER_EXECUTOR_MAX_WORKERS = 8
+
+# If buys are placed and followed in the background (the decisions move straight on) or waited on
+ORDER_PIPELINE_ASYNCHRONOUS = True
+# How often a placed order is checked with get_order, and how long before its fill is estimated instead
+ORDER_POLL_INTERVAL_SECONDS = 0.25
+ORDER_FILL_TIMEOUT_SECONDS = 10.0
+
+# The folder the candles built from the polled prices are stored in
+CANDLE_FOLDER_NAME = "candles"
+# The lengths (in seconds) of the candles built, each one a multiple of the one before it
+CANDLE_INTERVALS_SECONDS = (1, 60, 300, 3600)
+# How often (in seconds) the candles still open are saved, so a crash loses at most this much of them
+CANDLE_OPEN_SAVE_INTERVAL_SECONDS = 30.0
+
+# How many of the latest prices of each crypto are kept in its price history
+PRICE_HISTORY_CAPACITY = 4096
+# The sizes (in prices) of the rolling windows the mean, variance, min and max are kept over
+PRICE_HISTORY_WINDOW_SIZES = (60, 600)
+# The spans (in prices) of the exponential moving averages of each crypto
+PRICE_HISTORY_EMA_SPANS = (12, 26)
+
+# How many worker processes the cryptos are split between, 1 trades them all in one process
+SHARD_COUNT = 1
+
+# If the phases of the main loop are timed and the calls to the exchange counted
+METRICS_ENABLED = False
+# Where the metrics are served in the Prometheus text format, at http://<host>:<port>/metrics
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9108
+
+# The shortest time between two runs of a crypto's decisions, even when its inputs keep changing
+SCHEDULER_MIN_INTERVAL_SECONDS = 1.0
+# The longest time between two runs of a crypto's decisions, even when nothing changes
+SCHEDULER_MAX_INTERVAL_SECONDS = 60.0
+# How long the main loop waits between polling for changes
+SCHEDULER_POLL_INTERVAL_SECONDS = 1.0
+
+# How many genomes the genetic optimizer keeps in each generation
+OPTIMIZER_POPULATION_SIZE = 32
+# How many generations the genetic optimizer runs for
+OPTIMIZER_GENERATIONS = 40
+# How many of the best genomes are carried into the next generation unchanged
+OPTIMIZER_ELITE_COUNT = 2
+# The chance of each gene of a child genome being mutated
+OPTIMIZER_MUTATION_RATE = 0.2
+# How many genomes compete for each parent slot
+OPTIMIZER_TOURNAMENT_SIZE = 3
+# How much each percent of max drawdown takes off a genome's P&L percentage
+OPTIMIZER_DRAWDOWN_PENALTY = 0.5
@@ -0,0 +1,248 @@
+# Metrics
+# A class which times each phase of the main loop (per product where it is per
+# product) and counts the REST calls, retries and errors of each endpoint,
+# keeping the timings as latency histograms. Everything can be scraped in the
+# Prometheus text format from a small HTTP server on the local machine.
+# When metrics are disabled every call returns straight away without taking a
+# lock or reading the clock, so the instrumentation can stay in the hot path
+import http.server
+import threading
+import time
+import MasterBotConstants
+
+# The upper bounds (in seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# The type and help text of every metric
+PHASE_SECONDS = "cryptotrader_phase_seconds"
+TICK_SECONDS = "cryptotrader_tick_seconds"
+REST_SECONDS = "cryptotrader_rest_seconds"
+REST_CALLS_TOTAL = "cryptotrader_rest_calls_total"
+REST_ERRORS_TOTAL = "cryptotrader_rest_errors_total"
+RETRIES_TOTAL = "cryptotrader_retries_total"
+RETRY_FAILURES_TOTAL = "cryptotrader_retry_failures_total"
+CIRCUIT_OPENS_TOTAL = "cryptotrader_circuit_opens_total"
+METRIC_DEFINITIONS = {
+    PHASE_SECONDS: ("histogram", "How long each phase of the main loop took"),
+    TICK_SECONDS: ("histogram", "How long each tick of the main loop took"),
+    REST_SECONDS: ("histogram", "How long REST calls to the exchange took, by endpoint"),
+    REST_CALLS_TOTAL: ("counter", "REST calls made to the exchange, by endpoint"),
+    REST_ERRORS_TOTAL: ("counter", "REST calls to the exchange which raised, by endpoint"),
+    RETRIES_TOTAL: ("counter", "Calls which were retried after failing, by retry key"),
+    RETRY_FAILURES_TOTAL: ("counter", "Failed attempts of retried calls, by retry key"),
+    CIRCUIT_OPENS_TOTAL: ("counter", "Times the circuit of a retry key opened"),
+}
+
+class HistogramData:
+    # The observations of one histogram with one set of labels
+    def __init__(self):
+        self.bucketCounts = [0] * len(LATENCY_BUCKETS)  # not cumulative, the last bucket is below +Inf
+        self.sum = 0.0
+        self.count = 0
+
+class PhaseTimer:
+    # Times a phase in a with block
+    __slots__ = ("metrics", "name", "labels", "startTime")
+
+    def __init__(self, metrics, name: str, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+        self.startTime = 0.0
+
+    def __enter__(self):
+        self.startTime = time.perf_counter()
+        return self
+
+    def __exit__(self, exceptionType, exceptionValue, traceback):
+        self.metrics.Observe(self.name, time.perf_counter() - self.startTime, self.labels)
+        return False
+
+class NullPhaseTimer:
+    # What is timed when metrics are disabled
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exceptionType, exceptionValue, traceback):
+        return False
+
+NULL_PHASE_TIMER = NullPhaseTimer()
+
+class Metrics:
+    def __init__(self, enabled: bool = MasterBotConstants.METRICS_ENABLED):
+        self.__enabled = enabled
+        self.__lock = threading.Lock()
+        self.__counters = {}  # maps (name, labels) to the count
+        self.__histograms = {}  # maps (name, labels) to the HistogramData
+        self.__server = None
+
+    """
+    IsEnabled
+    @return: if metrics are being recorded
+    """
+    def IsEnabled(self):
+        return self.__enabled
+
+    """
+    Time
+    Times a phase, EX: with metrics.Time("update_price", "BTC"):
+    @param phase: the name of the phase
+    @param cryptoID: the crypto the phase is run for, empty if it isn't for one crypto
+    @return: the timer to use in a with block
+    """
+    def Time(self, phase: str, cryptoID: str = ""):
+        if not self.__enabled:
+            return NULL_PHASE_TIMER
+        return PhaseTimer(self, PHASE_SECONDS, (("phase", phase), ("crypto", cryptoID)))
+
+    """
+    Measure
+    Times anything into a histogram, EX: with metrics.Measure(Metrics.TICK_SECONDS):
+    @param name: the name of the histogram
+    @param labels: a tuple of (label, value) pairs
+    @return: the timer to use in a with block
+    """
+    def Measure(self, name: str, labels=()):
+        if not self.__enabled:
+            return NULL_PHASE_TIMER
+        return PhaseTimer(self, name, labels)
+
+    """
+    Observe
+    Adds an observation to a histogram
+    @param name: the name of the histogram
+    @param seconds: the latency observed
+    @param labels: a tuple of (label, value) pairs
+    """
+    def Observe(self, name: str, seconds: float, labels=()):
+        if not self.__enabled:
+            return
+        bucketIndex = 0
+        while bucketIndex < len(LATENCY_BUCKETS) and seconds > LATENCY_BUCKETS[bucketIndex]:
+            bucketIndex = bucketIndex + 1
+        with self.__lock:
+            histogramData = self.__histograms.get((name, labels))
+            if histogramData is None:
+                histogramData = HistogramData()
+                self.__histograms[(name, labels)] = histogramData
+            if bucketIndex < len(LATENCY_BUCKETS):
+                histogramData.bucketCounts[bucketIndex] = histogramData.bucketCounts[bucketIndex] + 1
+            histogramData.sum = histogramData.sum + seconds
+            histogramData.count = histogramData.count + 1
+
+    """
+    Increment
+    Adds to a counter
+    @param name: the name of the counter
+    @param labels: a tuple of (label, value) pairs
+    @param amount: how much to add
+    """
+    def Increment(self, name: str, labels=(), amount: float = 1):
+        if not self.__enabled:
+            return
+        with self.__lock:
+            self.__counters[(name, labels)] = self.__counters.get((name, labels), 0) + amount
+
+    """
+    GetCounter
+    @param name: the name of the counter
+    @param labels: a tuple of (label, value) pairs
+    @return: the value of the counter
+    """
+    def GetCounter(self, name: str, labels=()):
+        with self.__lock:
+            return self.__counters.get((name, labels), 0)
+
+    """
+    FormatLabels
+    @param labels: a tuple of (label, value) pairs
+    @return: the labels in the Prometheus text format, EX: {phase="sell",crypto="BTC"}
+    """
+    @staticmethod
+    def __FormatLabels(labels):
+        if not labels:
+            return ""
+        formattedLabels = []
+        for label, value in labels:
+            value = str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+            formattedLabels.append(label + "=\"" + value + "\"")
+        return "{" + ",".join(formattedLabels) + "}"
+
+    """
+    Render
+    @return: every metric in the Prometheus text format
+    """
+    def Render(self):
+        with self.__lock:
+            counters = dict(self.__counters)
+            histograms = {key: (list(data.bucketCounts), data.sum, data.count)
+                          for key, data in self.__histograms.items()}
+
+        lines = []
+        for name, (metricType, helpText) in METRIC_DEFINITIONS.items():
+            lines.append("# HELP " + name + " " + helpText)
+            lines.append("# TYPE " + name + " " + metricType)
+            if metricType == "counter":
+                for (counterName, labels), value in sorted(counters.items()):
+                    if counterName == name:
+                        lines.append(name + self.__FormatLabels(labels) + " " + repr(float(value)))
+                continue
+
+            for (histogramName, labels), (bucketCounts, histogramSum, histogramCount) in sorted(histograms.items()):
+                if histogramName != name:
+                    continue
+                cumulativeCount = 0
+                for upperBound, bucketCount in zip(LATENCY_BUCKETS, bucketCounts):
+                    cumulativeCount = cumulativeCount + bucketCount
+                    lines.append(name + "_bucket" + self.__FormatLabels(labels + (("le", repr(upperBound)),)) +
+                                 " " + str(cumulativeCount))
+                lines.append(name + "_bucket" + self.__FormatLabels(labels + (("le", "+Inf"),)) +
+                             " " + str(histogramCount))
+                lines.append(name + "_sum" + self.__FormatLabels(labels) + " " + repr(histogramSum))
+                lines.append(name + "_count" + self.__FormatLabels(labels) + " " + str(histogramCount))
+        return "\n".join(lines) + "\n"
+
+    """
+    StartServer
+    Serves the metrics at http://<host>:<port>/metrics from a background thread, if they are enabled
+    @param port: the port to listen on
+    @param host: the address to listen on, only the local machine by default
+    """
+    def StartServer(self, port: int = MasterBotConstants.METRICS_PORT, host: str = MasterBotConstants.METRICS_HOST):
+        if not self.__enabled or self.__server is not None:
+            return
+        metrics = self
+
+        class MetricsRequestHandler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.Render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # scrapes aren't worth logging
+
+        self.__server = http.server.ThreadingHTTPServer((host, port), MetricsRequestHandler)
+        self.__server.daemon_threads = True
+        threading.Thread(target=self.__server.serve_forever, daemon=True).start()
+
+    """
+    StopServer
+    Stops serving the metrics
+    """
+    def StopServer(self):
+        if self.__server is not None:
+            self.__server.shutdown()
+            self.__server.server_close()
+            self.__server = None
+
+# Shared by everything which isn't given metrics to record to
+DISABLED_METRICS = Metrics(False)
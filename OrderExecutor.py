@@ -0,0 +1,142 @@
+# Order Executor
+# A class which places the sells of the bot. All of the lots of a product which
+# should be sold are netted into a single market sell (rounded down to the
+# product's min size) instead of one order per lot, and the sell is handed to
+# the order pipeline so the decision loop moves on while it is placed and
+# filled. The lots of a sell in flight are held as a pending sell, and once it
+# completes its fill is handed back to the lots it was made of in order, so
+# every lot but the last is sold whole and the coin left over from the
+# rounding stays in the last one
+import math
+from math import log10
+import Metrics
+
+# How much of a lot (as a fraction of it) can be left unsold and still count as sold whole,
+# the float error from adding up and splitting the lots is far smaller than this
+LOT_REMAINDER_TOLERANCE = 1e-9
+
+"""
+GetOrderRetryKey
+@param cryptoID: The cryptoID of the cryptocurrency
+@return: the retry key the orders of that crypto are made under
+"""
+def GetOrderRetryKey(cryptoID: str):
+    return "orders " + cryptoID
+
+class SellOrder:
+    # The lots of one product to be sold together
+    def __init__(self, cryptoID: str, productId: str, minSize: float, lots):
+        self.cryptoID = cryptoID
+        self.productId = productId  # EX: BTC-USD
+        self.minSize = minSize  # the smallest amount of the crypto which can be traded
+        self.lots = lots  # the ActivePurchases to sell
+
+class PendingSell:
+    # A sell handed to the order pipeline whose fill hasn't come back yet
+    def __init__(self, sellOrder: SellOrder, netAmountInCoin: float):
+        self.sellOrder = sellOrder
+        self.netAmountInCoin = netAmountInCoin  # the amount the sell was placed for
+
+class LotFill:
+    # The part of a sell's fill which belongs to one of its lots
+    def __init__(self, lot, amountInCoin: float, amountInUSD: float, fee: float, remainingInCoin: float = 0.0):
+        self.lot = lot
+        self.amountInCoin = amountInCoin
+        self.amountInUSD = amountInUSD  # before the fee
+        self.fee = fee
+        self.remainingInCoin = remainingInCoin  # what is left of the lot after the sell, 0 if it was sold whole
+
+    """
+    GetPrice
+    @return: the price the lot was sold at
+    """
+    def GetPrice(self):
+        if self.amountInCoin == 0.0:
+            return 0.0
+        return self.amountInUSD / self.amountInCoin
+
+class OrderExecutor:
+    def __init__(self, orderPipeline, metrics=Metrics.DISABLED_METRICS):
+        self.__orderPipeline = orderPipeline  # places each sell and follows it until it fills
+        self.__metrics = metrics
+        self.__pendingSells = {}  # maps the crypto ID to its PendingSell
+
+    """
+    RoundToMinSize
+    @param amountInCoin: an amount of a crypto
+    @param minSize: the smallest amount of the crypto which can be traded
+    @return: the amount rounded down to a whole number of min sizes
+    """
+    @staticmethod
+    def RoundToMinSize(amountInCoin: float, minSize: float):
+        decimalPlacesToRoundTo = int(log10(1.0 / minSize))
+        # Rounded first so the float error from adding up lots can't floor it a whole min size down
+        return round(math.floor(round(amountInCoin / minSize, 6)) * minSize, decimalPlacesToRoundTo)
+
+    """
+    AttributeFill
+    Hands the fill of a netted order back to its lots in order. Only what was filled is handed
+    out, so the lot it runs out on keeps the rest of its coin (EX: what was rounded off to the
+    min size) and the lots after that aren't sold at all. The USD and fee are split by coin sold
+    @param lots: the ActivePurchases the order was made of
+    @param filledSize: the amount of coin the order filled
+    @param executedValue: the USD the filled size was sold for, before the fee
+    @param fee: the fee of the order in USD
+    @return: a LotFill for each of the lots which was sold from
+    """
+    @staticmethod
+    def AttributeFill(lots, filledSize: float, executedValue: float, fee: float):
+        lotFills = []
+        unattributedSize = filledSize
+        for lot in lots:
+            if unattributedSize <= 0.0:
+                break
+            amountInCoin = min(lot[0], unattributedSize)
+            remainingInCoin = lot[0] - amountInCoin
+            if remainingInCoin <= lot[0] * LOT_REMAINDER_TOLERANCE:
+                remainingInCoin = 0.0
+            unattributedSize = unattributedSize - amountInCoin
+            share = amountInCoin / filledSize
+            lotFills.append(LotFill(lot, amountInCoin, executedValue * share, fee * share, remainingInCoin))
+        return lotFills
+
+    """
+    SubmitSells
+    Hands one market sell per product to the order pipeline, their fills come back
+    through it as OrderCompletions to be given to ApplySellCompletion
+    @param sellOrders: the SellOrders to place, at most one per crypto and none for a crypto with a pending sell
+    @param fallbackPrices: maps the crypto ID to its current price
+    @return: the crypto IDs whose sells were placed, the others have too little to sell yet and keep their lots
+    """
+    def SubmitSells(self, sellOrders, fallbackPrices):
+        submittedCryptoIDs = []
+        for sellOrder in sellOrders:
+            netAmountInCoin = self.RoundToMinSize(sum(lot[0] for lot in sellOrder.lots), sellOrder.minSize)
+            if netAmountInCoin < sellOrder.minSize:
+                continue
+            self.__pendingSells[sellOrder.cryptoID] = PendingSell(sellOrder, netAmountInCoin)
+            with self.__metrics.Time("sell", sellOrder.cryptoID):
+                self.__orderPipeline.SubmitOrder(sellOrder.cryptoID, "sell", sellOrder.productId, netAmountInCoin,
+                                                 fallbackPrices[sellOrder.cryptoID])
+            submittedCryptoIDs.append(sellOrder.cryptoID)
+        return submittedCryptoIDs
+
+    """
+    HasPendingSell
+    @param cryptoID: The cryptoID of the cryptocurrency to check
+    @return: if a sell of the cryptocurrency has been placed but its fill hasn't been applied yet
+    """
+    def HasPendingSell(self, cryptoID: str):
+        return cryptoID in self.__pendingSells
+
+    """
+    ApplySellCompletion
+    @param orderCompletion: the OrderCompletion of a sell placed with SubmitSells
+    @return: a LotFill for each lot sold from, empty if the sell was given up on or rejected
+    """
+    def ApplySellCompletion(self, orderCompletion):
+        pendingSell = self.__pendingSells.pop(orderCompletion.cryptoID)
+        if orderCompletion.filledSize == 0.0:
+            return []
+        return self.AttributeFill(pendingSell.sellOrder.lots, orderCompletion.filledSize,
+                                  orderCompletion.executedValue, orderCompletion.fee)
@@ -0,0 +1,178 @@
+# Order Pipeline
+# A class which places orders in the background and follows each one through
+# get_order until the exchange reports it done, so the decision loop can move on
+# to the next product while the order is placed and filled. Finished orders are
+# kept as OrderCompletions holding the real size and value they filled at, and
+# are handed back to the main thread to be applied to the account trackers.
+# In synchronous mode (EX: backtesting) orders are placed and confirmed straight away
+import concurrent.futures
+import time
+import RetryPolicy
+import OrderExecutor
+import MasterBotConstants
+
+class OrderCompletion:
+    # What became of an order placed through the pipeline
+    def __init__(self, cryptoID: str, side: str, requestedSize: float, filledSize: float,
+                 executedValue: float, fee: float, isConfirmed: bool):
+        self.cryptoID = cryptoID
+        self.side = side  # "buy" or "sell"
+        self.requestedSize = requestedSize
+        self.filledSize = filledSize  # 0 if the order was rejected or given up on
+        self.executedValue = executedValue  # the USD the filled size was traded for, before the fee
+        self.fee = fee
+        self.isConfirmed = isConfirmed  # if the fill came from the exchange rather than an estimate
+
+    """
+    GetPrice
+    @return: the average price the order filled at
+    """
+    def GetPrice(self):
+        if self.filledSize == 0.0:
+            return 0.0
+        return self.executedValue / self.filledSize
+
+class OrderPipeline:
+    def __init__(self, client, retryPolicy, exceptionsLogger, asynchronous: bool = True,
+                 pollIntervalSeconds: float = MasterBotConstants.ORDER_POLL_INTERVAL_SECONDS,
+                 fillTimeoutSeconds: float = MasterBotConstants.ORDER_FILL_TIMEOUT_SECONDS,
+                 maxWorkers: int = MasterBotConstants.ORDER_EXECUTOR_MAX_WORKERS,
+                 clock=time.monotonic, sleep=time.sleep):
+
+        self.__client = client
+        self.__retryPolicy = retryPolicy
+        self.__exceptionsLogger = exceptionsLogger
+        self.__asynchronous = asynchronous
+        self.__pollIntervalSeconds = pollIntervalSeconds
+        self.__fillTimeoutSeconds = fillTimeoutSeconds  # how long an order is followed before its fill is estimated
+        self.__clock = clock
+        self.__sleep = sleep
+
+        self.__executor = None
+        if self.__asynchronous:
+            self.__executor = concurrent.futures.ThreadPoolExecutor(max_workers=maxWorkers)
+        self.__pendingOrders = []  # the (crypto ID, side, size, future) of the orders still being placed or followed
+        self.__completedOrders = []  # the OrderCompletions not handed back yet
+
+    """
+    IsDone
+    @param order: an order as coinbase pro returns it
+    @return: if the order won't fill any further
+    """
+    @staticmethod
+    def IsDone(order):
+        return order.get("status") == "done" and order.get("settled", True)
+
+    """
+    WaitForFill
+    Follows an order through get_order until it is done
+    @param order: the order as coinbase pro returned it when it was placed
+    @return: the done order, or None if it wasn't done before the fill timeout
+    """
+    def WaitForFill(self, order):
+        deadline = self.__clock() + self.__fillTimeoutSeconds
+        while not self.IsDone(order):
+            if self.__clock() >= deadline:
+                return None
+            self.__sleep(self.__pollIntervalSeconds)
+            try:
+                polledOrder = self.__client.get_order(order["id"])
+            except Exception:
+                continue  # keep following it until the timeout
+            # The order can take a moment to show up
+            if "id" in polledOrder:
+                order = polledOrder
+        return order
+
+    """
+    PlaceAndConfirm
+    Places an order and follows it until it fills
+    @param cryptoID: The cryptoID of the cryptocurrency
+    @param side: "buy" or "sell"
+    @param productId: The product ID pair, EX: BTC-USD
+    @param size: the amount of the crypto to trade
+    @param fallbackPrice: the price to estimate the fill at if the exchange doesn't confirm it in time
+    @return: the OrderCompletion of the order
+    """
+    def __PlaceAndConfirm(self, cryptoID: str, side: str, productId: str, size: float, fallbackPrice: float):
+        placeOrder = self.__client.buy if side == "buy" else self.__client.sell
+        try:
+            order = self.__retryPolicy.Call(
+                OrderExecutor.GetOrderRetryKey(cryptoID),
+                lambda: placeOrder(product_id=productId, order_type="market", size=size),
+                MasterBotConstants.RETRY_ORDER_DEADLINE_SECONDS,
+                lambda exception: self.__exceptionsLogger.LogMessage(
+                    "An exception occurred trying to " + side + ": " + str(size) + " " + cryptoID))
+        except RetryPolicy.RetryFailedError:
+            return OrderCompletion(cryptoID, side, size, 0.0, 0.0, 0.0, True)
+
+        if "id" not in order:
+            self.__exceptionsLogger.LogMessage("The " + side + " of " + str(size) + " " + cryptoID +
+                                               " was rejected: " + str(order.get("message")))
+            return OrderCompletion(cryptoID, side, size, 0.0, 0.0, 0.0, True)
+
+        doneOrder = self.WaitForFill(order)
+        if doneOrder is None:
+            # The order went in, so count it as filled at the price it was placed at
+            self.__exceptionsLogger.LogMessage("The " + side + " of " + str(size) + " " + cryptoID +
+                                               " was not confirmed in time, its fill is estimated")
+            return OrderCompletion(cryptoID, side, size, size, size * fallbackPrice, 0.0, False)
+        return OrderCompletion(cryptoID, side, size, float(doneOrder.get("filled_size", 0.0)),
+                               float(doneOrder.get("executed_value", 0.0)), float(doneOrder.get("fill_fees", 0.0)), True)
+
+    """
+    SubmitOrder
+    Places a market order, in the background unless the pipeline is synchronous.
+    Its OrderCompletion is returned by a later GetCompletedOrders
+    @param cryptoID: The cryptoID of the cryptocurrency
+    @param side: "buy" or "sell"
+    @param productId: The product ID pair, EX: BTC-USD
+    @param size: the amount of the crypto to trade
+    @param fallbackPrice: the price to estimate the fill at if the exchange doesn't confirm it in time
+    """
+    def SubmitOrder(self, cryptoID: str, side: str, productId: str, size: float, fallbackPrice: float):
+        if not self.__asynchronous:
+            self.__completedOrders.append(self.__PlaceAndConfirm(cryptoID, side, productId, size, fallbackPrice))
+            return
+
+        orderFuture = self.__executor.submit(self.__PlaceAndConfirm, cryptoID, side, productId, size, fallbackPrice)
+        self.__pendingOrders.append((cryptoID, side, size, orderFuture))
+
+    """
+    GetCompletedOrders
+    @return: the OrderCompletions of the orders which finished since the last call, in the order they were submitted
+    """
+    def GetCompletedOrders(self):
+        stillPending = []
+        for pendingOrder in self.__pendingOrders:
+            cryptoID, side, size, orderFuture = pendingOrder
+            if not orderFuture.done():
+                stillPending.append(pendingOrder)
+                continue
+            try:
+                self.__completedOrders.append(orderFuture.result())
+            except Exception:
+                self.__exceptionsLogger.LogMessage("An exception occurred following the " + side + " of " +
+                                                   str(size) + " " + cryptoID)
+                self.__completedOrders.append(OrderCompletion(cryptoID, side, size, 0.0, 0.0, 0.0, False))
+        self.__pendingOrders = stillPending
+
+        completedOrders = self.__completedOrders
+        self.__completedOrders = []
+        return completedOrders
+
+    """
+    GetPendingCount
+    @return: how many orders are still being placed or followed
+    """
+    def GetPendingCount(self):
+        return len(self.__pendingOrders)
+
+    """
+    Shutdown
+    Waits for the orders in flight to finish (they are returned by the next GetCompletedOrders)
+    and stops the threads they are placed on
+    """
+    def Shutdown(self):
+        if self.__executor is not None:
+            self.__executor.shutdown(wait=True)
@@ -0,0 +1,219 @@
+# Price History Buffer
+# A class which keeps the latest (timestamp, price) pairs of a crypto in a fixed
+# size ring buffer, so its memory never grows however long the bot runs. As each
+# price comes in it also updates a set of streaming statistics in constant time:
+# an exponential moving average for each span, and the mean, variance, min and
+# max of each rolling window (a number of the latest prices). Nothing is
+# recomputed over a whole window, the mean and variance slide along with the
+# window and the min and max are kept at the front of monotonic deques
+import collections
+import math
+import time
+from array import array
+import numpy as np
+import MasterBotConstants
+
+class RollingWindow:
+    # The streaming statistics of the latest windowSize prices
+    def __init__(self, windowSize: int):
+        self.windowSize = windowSize
+        self.count = 0  # how many prices are in the window, up to windowSize
+        self.mean = 0.0
+        self.squaredDeviationSum = 0.0  # the sum of the squared differences from the mean
+        # The (sample number, price) of the prices which could still be the min (or max) of the window,
+        # the min (or max) itself is at the front
+        self.minCandidates = collections.deque()
+        self.maxCandidates = collections.deque()
+
+    """
+    Add
+    Slides the window along to take in a new price
+    @param sampleNumber: how many prices came before this one
+    @param price: the new price
+    @param removedPrice: the price which fell out of the window, None if the window isn't full yet
+    """
+    def Add(self, sampleNumber: int, price: float, removedPrice: float = None):
+        if removedPrice is None:
+            # Welford's update for a growing window
+            self.count = self.count + 1
+            difference = price - self.mean
+            self.mean = self.mean + difference / self.count
+            self.squaredDeviationSum = self.squaredDeviationSum + difference * (price - self.mean)
+        else:
+            # The same update for a window which swaps its oldest price for the new one
+            oldMean = self.mean
+            self.mean = oldMean + (price - removedPrice) / self.count
+            self.squaredDeviationSum = max(self.squaredDeviationSum +
+                                           (price - removedPrice) * (price - self.mean + removedPrice - oldMean), 0.0)
+
+        oldestSampleNumber = sampleNumber - self.windowSize
+        while self.minCandidates and self.minCandidates[-1][1] >= price:
+            self.minCandidates.pop()
+        self.minCandidates.append((sampleNumber, price))
+        if self.minCandidates[0][0] <= oldestSampleNumber:
+            self.minCandidates.popleft()
+
+        while self.maxCandidates and self.maxCandidates[-1][1] <= price:
+            self.maxCandidates.pop()
+        self.maxCandidates.append((sampleNumber, price))
+        if self.maxCandidates[0][0] <= oldestSampleNumber:
+            self.maxCandidates.popleft()
+
+    """
+    Recompute
+    Sets the mean and variance straight from the prices in the window,
+    clearing the rounding error the sliding updates build up
+    @param prices: every price in the window
+    """
+    def Recompute(self, prices):
+        self.count = len(prices)
+        self.mean = math.fsum(prices) / self.count
+        self.squaredDeviationSum = math.fsum((price - self.mean) ** 2 for price in prices)
+
+    """
+    GetVariance
+    @return: the variance of the prices in the window, 0 with fewer than two prices
+    """
+    def GetVariance(self):
+        if self.count < 2:
+            return 0.0
+        return self.squaredDeviationSum / (self.count - 1)
+
+class PriceHistoryBuffer:
+    def __init__(self, capacity: int = MasterBotConstants.PRICE_HISTORY_CAPACITY,
+                 windowSizes=MasterBotConstants.PRICE_HISTORY_WINDOW_SIZES,
+                 emaSpans=MasterBotConstants.PRICE_HISTORY_EMA_SPANS):
+
+        if max(windowSizes, default=0) > capacity:
+            raise ValueError("A rolling window can't be larger than the capacity of the price history")
+        self.__capacity = capacity
+        # Plain arrays, reading and writing single numpy elements costs more than the whole update
+        self.__timestamps = array("d", bytes(8 * capacity))  # seconds since the epoch
+        self.__prices = array("d", bytes(8 * capacity))
+        self.__nextRow = 0  # the row the next price is written to
+        self.__sampleCount = 0  # every price ever added, the buffer holds the latest capacity of them
+
+        self.__rollingWindows = {windowSize: RollingWindow(windowSize) for windowSize in windowSizes}
+        # maps the span to its (smoothing factor, moving average), None until the first price
+        self.__emas = {emaSpan: (2.0 / (emaSpan + 1.0), None) for emaSpan in emaSpans}
+
+    def __len__(self):
+        return min(self.__sampleCount, self.__capacity)
+
+    """
+    Append
+    Adds a price to the history, overwriting the oldest one once the buffer is full
+    @param price: the price of one full coin in USD
+    @param timestamp: when the price was seen in seconds since the epoch, now if it isn't given
+    """
+    def Append(self, price: float, timestamp: float = None):
+        if timestamp is None:
+            timestamp = time.time()
+        sampleNumber = self.__sampleCount
+
+        for windowSize, rollingWindow in self.__rollingWindows.items():
+            removedPrice = None
+            if sampleNumber >= windowSize:
+                removedPrice = self.__prices[(sampleNumber - windowSize) % self.__capacity]
+            rollingWindow.Add(sampleNumber, price, removedPrice)
+
+        for emaSpan, (smoothingFactor, movingAverage) in self.__emas.items():
+            if movingAverage is None:
+                movingAverage = price
+            else:
+                movingAverage = movingAverage + smoothingFactor * (price - movingAverage)
+            self.__emas[emaSpan] = (smoothingFactor, movingAverage)
+
+        # Written after the windows read the price falling out of them, which may be in this row
+        self.__timestamps[self.__nextRow] = timestamp
+        self.__prices[self.__nextRow] = price
+        self.__nextRow = (self.__nextRow + 1) % self.__capacity
+        self.__sampleCount = sampleNumber + 1
+
+        # Once per window length, which keeps the update constant time on average
+        for windowSize, rollingWindow in self.__rollingWindows.items():
+            if self.__sampleCount % windowSize == 0:
+                rollingWindow.Recompute(self.GetHistory(windowSize)[1])
+
+    """
+    GetLatest
+    @return: the (timestamp, price) most recently added, None if there is none
+    """
+    def GetLatest(self):
+        if self.__sampleCount == 0:
+            return None
+        latestRow = (self.__nextRow - 1) % self.__capacity
+        return self.__timestamps[latestRow], self.__prices[latestRow]
+
+    """
+    GetHistory
+    @param count: how many of the latest prices to get, all of the ones held if None
+    @return: the (timestamps, prices) arrays of those prices, oldest first
+    """
+    def GetHistory(self, count: int = None):
+        if count is None or count > len(self):
+            count = len(self)
+        rows = np.arange(self.__nextRow - count, self.__nextRow) % self.__capacity
+        return (np.frombuffer(self.__timestamps, dtype=np.float64)[rows],
+                np.frombuffer(self.__prices, dtype=np.float64)[rows])
+
+    """
+    GetRollingWindow
+    @param windowSize: the size of a window the buffer was made with
+    @return: the RollingWindow of that size
+    """
+    def __GetRollingWindow(self, windowSize: int):
+        if windowSize not in self.__rollingWindows:
+            raise KeyError("The price history does not keep a window of " + str(windowSize) + " prices")
+        return self.__rollingWindows[windowSize]
+
+    """
+    GetEMA
+    @param emaSpan: a span the buffer was made with
+    @return: the exponential moving average of the prices over that span, 0 before the first price
+    """
+    def GetEMA(self, emaSpan: int):
+        movingAverage = self.__emas[emaSpan][1]
+        return 0.0 if movingAverage is None else movingAverage
+
+    """
+    GetMean
+    @param windowSize: the size of a window the buffer was made with
+    @return: the mean of the latest windowSize prices (of all of them until there are that many)
+    """
+    def GetMean(self, windowSize: int):
+        return self.__GetRollingWindow(windowSize).mean
+
+    """
+    GetVariance
+    @param windowSize: the size of a window the buffer was made with
+    @return: the sample variance of the latest windowSize prices
+    """
+    def GetVariance(self, windowSize: int):
+        return self.__GetRollingWindow(windowSize).GetVariance()
+
+    """
+    GetStandardDeviation
+    @param windowSize: the size of a window the buffer was made with
+    @return: the sample standard deviation of the latest windowSize prices
+    """
+    def GetStandardDeviation(self, windowSize: int):
+        return math.sqrt(self.GetVariance(windowSize))
+
+    """
+    GetMin
+    @param windowSize: the size of a window the buffer was made with
+    @return: the lowest of the latest windowSize prices, 0 before the first price
+    """
+    def GetMin(self, windowSize: int):
+        rollingWindow = self.__GetRollingWindow(windowSize)
+        return rollingWindow.minCandidates[0][1] if rollingWindow.minCandidates else 0.0
+
+    """
+    GetMax
+    @param windowSize: the size of a window the buffer was made with
+    @return: the highest of the latest windowSize prices, 0 before the first price
+    """
+    def GetMax(self, windowSize: int):
+        rollingWindow = self.__GetRollingWindow(windowSize)
+        return rollingWindow.maxCandidates[0][1] if rollingWindow.maxCandidates else 0.0
@@ -0,0 +1,160 @@
+# Purchase Trigger Book
+# A class which keeps the active purchases of a crypto account ordered by their
+# reference price, split up by percentage state. Since the percentage of a purchase
+# only falls as its reference price rises, every purchase which crosses a threshold
+# at the current price sits at one end of its list and can be found with a binary
+# search, instead of checking every purchase on every tick
+from bisect import insort
+from bisect import bisect_left
+from CryptoStates import CryptoCurrencyPercentageStates
+
+"""
+CalculatePercentage
+@param currentPrice: the current price of the crypto currency
+@param referencePrice: the reference price of an active purchase
+@return: the percentage standing of the purchase, rounded the same way as everywhere else
+"""
+def CalculatePercentage(currentPrice: float, referencePrice: float):
+    return round(((float(currentPrice) / float(referencePrice)) - 1.0) * 100, 2)
+
+class PurchaseTriggerBook:
+    def __init__(self):
+        # maps the percentage state to a list of (referencePrice, lotID) sorted by reference price
+        self.__lotsByState = {CryptoCurrencyPercentageStates.Neutral: [],
+                              CryptoCurrencyPercentageStates.Down: [],
+                              CryptoCurrencyPercentageStates.Up: []}
+
+    """
+    Clear
+    Removes every purchase from the book
+    """
+    def Clear(self):
+        for lots in self.__lotsByState.values():
+            del lots[:]
+
+    """
+    Add
+    @param lotID: the lot ID of the purchase
+    @param referencePrice: the reference price of the purchase
+    @param percentageState: the percentage state of the purchase
+    """
+    def Add(self, lotID: int, referencePrice: float, percentageState):
+        insort(self.__lotsByState[CryptoCurrencyPercentageStates(percentageState)], (float(referencePrice), lotID))
+
+    """
+    Remove
+    @param lotID: the lot ID of the purchase
+    @param referencePrice: the reference price the purchase was added with
+    @param percentageState: the percentage state the purchase was added with
+    """
+    def Remove(self, lotID: int, referencePrice: float, percentageState):
+        lots = self.__lotsByState[CryptoCurrencyPercentageStates(percentageState)]
+        index = bisect_left(lots, (float(referencePrice), lotID))
+        if index == len(lots) or lots[index][1] != lotID:
+            raise ValueError("The purchase is not in the trigger book")
+        del lots[index]
+
+    """
+    FindFirstAtOrBelow
+    @param lots: a sorted list of (referencePrice, lotID)
+    @param currentPrice: the current price of the crypto currency
+    @param percentageThreshold: the percentage to compare against
+    @return: the index of the first purchase whose percentage is at or below the
+    threshold, every purchase after it is at or below it too
+    """
+    @staticmethod
+    def __FindFirstAtOrBelow(lots, currentPrice: float, percentageThreshold: float):
+        low = 0
+        high = len(lots)
+        while low < high:
+            middle = (low + high) // 2
+            if CalculatePercentage(currentPrice, lots[middle][0]) <= percentageThreshold:
+                high = middle
+            else:
+                low = middle + 1
+        return low
+
+    """
+    FindFirstBelow
+    @param lots: a sorted list of (referencePrice, lotID)
+    @param currentPrice: the current price of the crypto currency
+    @param percentageThreshold: the percentage to compare against
+    @return: the index of the first purchase whose percentage is below the threshold,
+    every purchase before it is at or above the threshold
+    """
+    @staticmethod
+    def __FindFirstBelow(lots, currentPrice: float, percentageThreshold: float):
+        low = 0
+        high = len(lots)
+        while low < high:
+            middle = (low + high) // 2
+            if CalculatePercentage(currentPrice, lots[middle][0]) < percentageThreshold:
+                high = middle
+            else:
+                low = middle + 1
+        return low
+
+    """
+    Evaluate
+    Moves every neutral or down purchase which crossed the low or high percentage
+    threshold into its new state, and raises the reference price of every up purchase
+    which has gone up far enough. Only the purchases which change are touched
+    @param currentPrice: the current price of the crypto currency
+    @param cryptoSettings: the settings of the crypto currency
+    @return: a list of (lotID, newPercentageState) for the purchases which changed state
+    @return: a list of the lot IDs whose reference price was raised
+    @return: the new reference price of those purchases
+    """
+    def Evaluate(self, currentPrice: float, cryptoSettings):
+        neutralLots = self.__lotsByState[CryptoCurrencyPercentageStates.Neutral]
+        downLots = self.__lotsByState[CryptoCurrencyPercentageStates.Down]
+        upLots = self.__lotsByState[CryptoCurrencyPercentageStates.Up]
+
+        # Neutral purchases: the low end of the list goes up, the high end goes down
+        downStart = self.__FindFirstAtOrBelow(neutralLots, currentPrice, cryptoSettings.LowPercentageThreshold)
+        upEnd = min(self.__FindFirstBelow(neutralLots, currentPrice, cryptoSettings.HighPercentageThreshold), downStart)
+        neutralToDown = neutralLots[downStart:]
+        neutralToUp = neutralLots[:upEnd]
+        del neutralLots[downStart:]
+        del neutralLots[:upEnd]
+
+        # Down purchases: the high end stays down, the low end goes up and the middle goes back to neutral
+        downStart = self.__FindFirstAtOrBelow(downLots, currentPrice, cryptoSettings.LowPercentageThreshold)
+        upEnd = min(self.__FindFirstBelow(downLots, currentPrice, cryptoSettings.HighPercentageThreshold), downStart)
+        downToUp = downLots[:upEnd]
+        downToNeutral = downLots[upEnd:downStart]
+        del downLots[:downStart]
+
+        stateChanges = []
+        for movedLots, percentageState in ((neutralToDown, CryptoCurrencyPercentageStates.Down),
+                                           (neutralToUp, CryptoCurrencyPercentageStates.Up),
+                                           (downToUp, CryptoCurrencyPercentageStates.Up),
+                                           (downToNeutral, CryptoCurrencyPercentageStates.Neutral)):
+            for movedLot in movedLots:
+                insort(self.__lotsByState[percentageState], movedLot)
+                stateChanges.append((movedLot[1], percentageState))
+
+        # Up purchases which have gone up far enough all get the same raised reference price
+        raiseEnd = self.__FindFirstBelow(upLots, currentPrice, cryptoSettings.AdjustReferencePriceUpThreshold)
+        raisedLotIDs = [raisedLot[1] for raisedLot in upLots[:raiseEnd]]
+        newReferencePrice = None
+        if raisedLotIDs:
+            del upLots[:raiseEnd]
+            desiredPercentageDifferenceInDecimal = cryptoSettings.HighPercentageThreshold / 100.0
+            newReferencePrice = round(currentPrice * ((desiredPercentageDifferenceInDecimal - 1.0) * -1.0), 2)
+            for raisedLotID in raisedLotIDs:
+                insort(upLots, (float(newReferencePrice), raisedLotID))
+
+        return stateChanges, raisedLotIDs, newReferencePrice
+
+    """
+    GetLotsToSell
+    @param currentPrice: the current price of the crypto currency
+    @param highToDownSellOutPercentageThreshold: the percentage an up purchase
+    has to fall to before it is sold
+    @return: the lot IDs of the up purchases which should be sold
+    """
+    def GetLotsToSell(self, currentPrice: float, highToDownSellOutPercentageThreshold: float):
+        upLots = self.__lotsByState[CryptoCurrencyPercentageStates.Up]
+        sellStart = self.__FindFirstAtOrBelow(upLots, currentPrice, highToDownSellOutPercentageThreshold)
+        return [lotToSell[1] for lotToSell in upLots[sellStart:]]
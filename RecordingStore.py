@@ -0,0 +1,165 @@
+# Recording Store
+# A class which records one row per product per snapshot (timestamp, reference
+# price, current price, percentage, holdings and portfolio percentage) as fixed
+# width float64 columns, instead of free text in record.txt.
+# Each product has a folder of chunk files. A chunk holds up to CHUNK_ROWS rows
+# with every column stored one after the other, so once the chunk is memory
+# mapped any column (or a time range of it) is a numpy view with nothing copied
+#
+# <recordings folder>/<cryptoID>/<chunk number>.chunk:
+# a header holding the number of rows written, then each column of CHUNK_ROWS values
+import os
+import numpy as np
+import MasterBotConstants
+
+COLUMNS = ["timestamp", "referencePrice", "currentPrice", "percentage",
+           "holdingsInCoin", "holdingsInUSD", "portfolioPercentage"]
+CHUNK_HEADER_SIZE = 64  # keeps the columns aligned, the row count is the first int64
+
+class RecordingChunk:
+    # A memory mapped chunk file
+    def __init__(self, chunkFilePath: str, chunkRows: int, mode: str):
+        if mode == "w+" and not os.path.exists(chunkFilePath):
+            # Sized up front, the file system only stores what is written
+            chunkFile = open(chunkFilePath, "wb")
+            chunkFile.truncate(CHUNK_HEADER_SIZE + len(COLUMNS) * chunkRows * 8)
+            chunkFile.close()
+        openMode = "r+" if mode == "w+" else "r"
+        self.rowCount = np.memmap(chunkFilePath, dtype=np.int64, mode=openMode, offset=0, shape=(1,))
+        self.columns = np.memmap(chunkFilePath, dtype=np.float64, mode=openMode,
+                                 offset=CHUNK_HEADER_SIZE, shape=(len(COLUMNS), chunkRows))
+
+    """
+    GetRowCount
+    @return: how many rows have been written to the chunk
+    """
+    def GetRowCount(self):
+        return int(self.rowCount[0])
+
+class RecordingStore:
+    def __init__(self, recordingsFolderPath: str, chunkRows: int = MasterBotConstants.RECORDING_CHUNK_ROWS):
+        self.__recordingsFolderPath = recordingsFolderPath
+        self.__chunkRows = chunkRows
+        # maps the crypto ID to the (chunk number, RecordingChunk) being written to
+        self.__currentChunks = {}
+        if not os.path.isdir(self.__recordingsFolderPath):
+            os.mkdir(self.__recordingsFolderPath)
+
+    """
+    GetChunkNumbers
+    @param cryptoID: the crypto ID of the cryptocurrency
+    @return: the numbers of the chunks recorded for that crypto, in order
+    """
+    def __GetChunkNumbers(self, cryptoID: str):
+        productFolderPath = self.__recordingsFolderPath + "/" + cryptoID
+        if not os.path.isdir(productFolderPath):
+            return []
+        return sorted(int(filename[:filename.find(".")]) for filename in os.listdir(productFolderPath)
+                      if filename.endswith(".chunk"))
+
+    """
+    GetChunkFilePath
+    @param cryptoID: the crypto ID of the cryptocurrency
+    @param chunkNumber: the number of the chunk
+    @return: the path of that chunk file
+    """
+    def __GetChunkFilePath(self, cryptoID: str, chunkNumber: int):
+        return self.__recordingsFolderPath + "/" + cryptoID + "/" + str(chunkNumber).zfill(6) + ".chunk"
+
+    """
+    GetChunkForWriting
+    @param cryptoID: the crypto ID of the cryptocurrency
+    @return: the chunk the next row of that crypto goes into, a new one if the last is full
+    """
+    def __GetChunkForWriting(self, cryptoID: str):
+        if cryptoID not in self.__currentChunks:
+            productFolderPath = self.__recordingsFolderPath + "/" + cryptoID
+            if not os.path.isdir(productFolderPath):
+                os.mkdir(productFolderPath)
+            chunkNumbers = self.__GetChunkNumbers(cryptoID)
+            chunkNumber = chunkNumbers[-1] if chunkNumbers else 0
+            self.__currentChunks[cryptoID] = (chunkNumber, RecordingChunk(
+                self.__GetChunkFilePath(cryptoID, chunkNumber), self.__chunkRows, "w+"))
+
+        chunkNumber, chunk = self.__currentChunks[cryptoID]
+        if chunk.GetRowCount() >= self.__chunkRows:
+            chunk.columns.flush()
+            chunk.rowCount.flush()
+            chunkNumber = chunkNumber + 1
+            chunk = RecordingChunk(self.__GetChunkFilePath(cryptoID, chunkNumber), self.__chunkRows, "w+")
+            self.__currentChunks[cryptoID] = (chunkNumber, chunk)
+        return chunk
+
+    """
+    Append
+    Records one row for a crypto
+    @param cryptoID: the crypto ID of the cryptocurrency
+    @param row: the values of the row in COLUMNS order
+    """
+    def Append(self, cryptoID: str, row):
+        chunk = self.__GetChunkForWriting(cryptoID)
+        rowIndex = chunk.GetRowCount()
+        chunk.columns[:, rowIndex] = row
+        # The count goes up last so a reader never sees a half written row
+        chunk.rowCount[0] = rowIndex + 1
+
+    """
+    Flush
+    Writes the recorded rows out to disk
+    """
+    def Flush(self):
+        for _, chunk in self.__currentChunks.values():
+            chunk.columns.flush()
+            chunk.rowCount.flush()
+
+    """
+    GetColumnChunks
+    Reads one column of a crypto's recording, optionally only between two times
+    @param cryptoID: the crypto ID of the cryptocurrency
+    @param columnName: one of COLUMNS
+    @param startTime: the earliest timestamp (seconds since the epoch) to include, or None
+    @param endTime: the latest timestamp (seconds since the epoch) to include, or None
+    @return: a list of numpy views (one per chunk, nothing copied) holding the column in time order
+    """
+    def GetColumnChunks(self, cryptoID: str, columnName: str, startTime=None, endTime=None):
+        columnIndex = COLUMNS.index(columnName)
+        columnChunks = []
+        for chunkNumber in self.__GetChunkNumbers(cryptoID):
+            chunk = RecordingChunk(self.__GetChunkFilePath(cryptoID, chunkNumber), self.__chunkRows, "r")
+            rowCount = chunk.GetRowCount()
+            if rowCount == 0:
+                continue
+            timestamps = chunk.columns[0, :rowCount]
+            if startTime is not None and timestamps[rowCount - 1] < startTime:
+                continue
+            if endTime is not None and timestamps[0] > endTime:
+                break
+
+            startRow = 0 if startTime is None else int(np.searchsorted(timestamps, startTime, side="left"))
+            endRow = rowCount if endTime is None else int(np.searchsorted(timestamps, endTime, side="right"))
+            columnChunks.append(chunk.columns[columnIndex, startRow:endRow])
+        return columnChunks
+
+    """
+    GetColumn
+    @param cryptoID: the crypto ID of the cryptocurrency
+    @param columnName: one of COLUMNS
+    @param startTime: the earliest timestamp (seconds since the epoch) to include, or None
+    @param endTime: the latest timestamp (seconds since the epoch) to include, or None
+    @return: the column as one numpy array, only copied when it spans more than one chunk
+    """
+    def GetColumn(self, cryptoID: str, columnName: str, startTime=None, endTime=None):
+        columnChunks = self.GetColumnChunks(cryptoID, columnName, startTime, endTime)
+        if len(columnChunks) == 1:
+            return columnChunks[0]
+        if not columnChunks:
+            return np.zeros(0, dtype=np.float64)
+        return np.concatenate(columnChunks)
+
+    """
+    Close
+    Writes the recorded rows out and lets go of the chunks being written to
+    """
+    def Close(self):
+        self.Flush()
+        self.__currentChunks = {}
@@ -0,0 +1,235 @@
+# Request Scheduler
+# A class which wraps the coinbase pro authenticated client so that every REST
+# call goes through a token bucket, one for the public endpoints and one for the
+# private ones, instead of being fired off as fast as the bot can make them.
+# When calls have to wait for a token, orders go first, then account balances,
+# then ticker and product data. Identical read only calls which are already in
+# flight are coalesced, the later callers wait for and share the first result
+import concurrent.futures
+import heapq
+import itertools
+import threading
+import time
+import Metrics
+import MasterBotConstants
+
+# Priorities of the calls, lower goes first
+ORDER_PRIORITY = 0
+ACCOUNT_PRIORITY = 1
+MARKET_DATA_PRIORITY = 2
+
+# Which rate limit an endpoint counts against
+PUBLIC_ENDPOINT = "public"
+PRIVATE_ENDPOINT = "private"
+
+class TokenBucket:
+    # Holds up to capacity tokens which come back at ratePerSecond
+    def __init__(self, ratePerSecond: float, capacity: float, now: float):
+        self.ratePerSecond = ratePerSecond
+        self.capacity = capacity
+        self.tokens = capacity
+        self.lastRefillTime = now
+
+    """
+    Refill
+    @param now: the current time in seconds
+    """
+    def Refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.lastRefillTime) * self.ratePerSecond)
+        self.lastRefillTime = now
+
+    """
+    TryTake
+    @param now: the current time in seconds
+    @return: if a token was taken
+    """
+    def TryTake(self, now: float):
+        self.Refill(now)
+        if self.tokens >= 1.0:
+            self.tokens = self.tokens - 1.0
+            return True
+        return False
+
+    """
+    GetSecondsUntilToken
+    @return: how long until the next token is available, as of the last refill
+    """
+    def GetSecondsUntilToken(self):
+        return max(1.0 - self.tokens, 0.0) / self.ratePerSecond
+
+class RequestScheduler:
+    def __init__(self, client,
+                 publicRatePerSecond: float = MasterBotConstants.REQUEST_PUBLIC_RATE_PER_SECOND,
+                 publicBurst: float = MasterBotConstants.REQUEST_PUBLIC_BURST,
+                 privateRatePerSecond: float = MasterBotConstants.REQUEST_PRIVATE_RATE_PER_SECOND,
+                 privateBurst: float = MasterBotConstants.REQUEST_PRIVATE_BURST,
+                 clock=time.monotonic, metrics=Metrics.DISABLED_METRICS):
+
+        self.__client = client
+        self.__clock = clock
+        self.__metrics = metrics
+        now = self.__clock()
+        self.__tokenBuckets = {PUBLIC_ENDPOINT: TokenBucket(publicRatePerSecond, publicBurst, now),
+                               PRIVATE_ENDPOINT: TokenBucket(privateRatePerSecond, privateBurst, now)}
+        # maps the endpoint kind to a heap of the (priority, ticket) of every call waiting on its bucket
+        self.__waitingCalls = {PUBLIC_ENDPOINT: [], PRIVATE_ENDPOINT: []}
+        self.__tickets = itertools.count()
+        self.__condition = threading.Condition()
+
+        # maps the key of a read only call to the future of the copy of it in flight
+        self.__inFlightCalls = {}
+
+        self.__queuedCount = 0  # calls which went through the scheduler
+        self.__throttledCount = 0  # calls which had to wait for a token or for a higher priority call
+        self.__coalescedCount = 0  # calls answered by an identical call already in flight
+
+    """
+    Acquire
+    Waits until the call is at the front of its endpoint's queue and a token is available.
+    If the wait is abandoned (EX: a KeyboardInterrupt) the call leaves the queue so it can't hold up the rest
+    @param endpointKind: PUBLIC_ENDPOINT or PRIVATE_ENDPOINT
+    @param priority: the priority of the call
+    """
+    def __Acquire(self, endpointKind: str, priority: int):
+        tokenBucket = self.__tokenBuckets[endpointKind]
+        waitingCalls = self.__waitingCalls[endpointKind]
+        with self.__condition:
+            waitingCall = (priority, next(self.__tickets))
+            heapq.heappush(waitingCalls, waitingCall)
+            self.__queuedCount = self.__queuedCount + 1
+            throttled = False
+            acquired = False
+            try:
+                while True:
+                    if waitingCalls[0] == waitingCall and tokenBucket.TryTake(self.__clock()):
+                        heapq.heappop(waitingCalls)
+                        acquired = True
+                        return
+                    if not throttled:
+                        throttled = True
+                        self.__throttledCount = self.__throttledCount + 1
+                    if waitingCalls[0] == waitingCall:
+                        self.__condition.wait(tokenBucket.GetSecondsUntilToken())
+                    else:
+                        self.__condition.wait()
+            finally:
+                if not acquired:
+                    waitingCalls.remove(waitingCall)
+                    heapq.heapify(waitingCalls)
+                # The next call in line may be able to go now too
+                self.__condition.notify_all()
+
+    """
+    Call
+    Makes a call on the client once its rate limit and priority allow it
+    @param endpointKind: PUBLIC_ENDPOINT or PRIVATE_ENDPOINT
+    @param priority: the priority of the call
+    @param coalesce: if an identical call in flight can answer this one, only for read only calls
+    @param methodName: the name of the client method to call
+    @return: what the client method returns, any exception it raises is raised again
+    """
+    def __Call(self, endpointKind: str, priority: int, coalesce: bool, methodName: str, *args, **kwargs):
+        callFuture = None
+        if coalesce:
+            callKey = (methodName, args, tuple(sorted(kwargs.items())))
+            with self.__condition:
+                inFlightCall = self.__inFlightCalls.get(callKey)
+                if inFlightCall is None:
+                    callFuture = concurrent.futures.Future()
+                    self.__inFlightCalls[callKey] = callFuture
+                else:
+                    self.__coalescedCount = self.__coalescedCount + 1
+            if callFuture is None:
+                return inFlightCall.result()
+
+        endpointLabels = (("endpoint", methodName),)
+        try:
+            # Inside the try so the coalesced callers are let go even if the wait is abandoned
+            self.__Acquire(endpointKind, priority)
+            self.__metrics.Increment(Metrics.REST_CALLS_TOTAL, endpointLabels)
+            try:
+                with self.__metrics.Measure(Metrics.REST_SECONDS, endpointLabels):
+                    result = getattr(self.__client, methodName)(*args, **kwargs)
+            except BaseException:
+                self.__metrics.Increment(Metrics.REST_ERRORS_TOTAL, endpointLabels)
+                raise
+        except BaseException as exception:
+            if callFuture is not None:
+                self.__FinishCall(callKey, callFuture)
+                callFuture.set_exception(exception)
+            raise
+        if callFuture is not None:
+            self.__FinishCall(callKey, callFuture)
+            callFuture.set_result(result)
+        return result
+
+    """
+    FinishCall
+    Takes a call out of the in flight calls so the next identical call is made again
+    @param callKey: the key of the call
+    @param callFuture: the future the coalesced callers are waiting on
+    """
+    def __FinishCall(self, callKey, callFuture):
+        with self.__condition:
+            if self.__inFlightCalls.get(callKey) is callFuture:
+                del self.__inFlightCalls[callKey]
+
+    """
+    GetQueuedCount
+    @return: how many calls went through the scheduler
+    """
+    def GetQueuedCount(self):
+        return self.__queuedCount
+
+    """
+    GetThrottledCount
+    @return: how many calls had to wait before they could be made
+    """
+    def GetThrottledCount(self):
+        return self.__throttledCount
+
+    """
+    GetCoalescedCount
+    @return: how many calls were answered by an identical call already in flight
+    """
+    def GetCoalescedCount(self):
+        return self.__coalescedCount
+
+    """
+    GetReport
+    @return: the counters as text for the recording file
+    """
+    def GetReport(self):
+        return ("Queued: " + str(self.__queuedCount) + " Throttled: " + str(self.__throttledCount) +
+                " Coalesced: " + str(self.__coalescedCount) + "\n")
+
+    # The client methods the bot uses, with the same names and arguments as the coinbase pro client
+
+    def get_account(self, account_id):
+        return self.__Call(PRIVATE_ENDPOINT, ACCOUNT_PRIORITY, True, "get_account", account_id)
+
+    def get_accounts(self):
+        return self.__Call(PRIVATE_ENDPOINT, ACCOUNT_PRIORITY, True, "get_accounts")
+
+    def get_currencies(self):
+        return self.__Call(PUBLIC_ENDPOINT, MARKET_DATA_PRIORITY, True, "get_currencies")
+
+    def get_products(self):
+        return self.__Call(PUBLIC_ENDPOINT, MARKET_DATA_PRIORITY, True, "get_products")
+
+    def get_product_ticker(self, product_id):
+        return self.__Call(PUBLIC_ENDPOINT, MARKET_DATA_PRIORITY, True, "get_product_ticker", product_id=product_id)
+
+    def get_order(self, order_id):
+        return self.__Call(PRIVATE_ENDPOINT, ORDER_PRIORITY, True, "get_order", order_id)
+
+    def buy(self, product_id, order_type, **kwargs):
+        return self.__Call(PRIVATE_ENDPOINT, ORDER_PRIORITY, False, "buy",
+                           product_id=product_id, order_type=order_type, **kwargs)
+
+    def sell(self, product_id, order_type, **kwargs):
+        return self.__Call(PRIVATE_ENDPOINT, ORDER_PRIORITY, False, "sell",
+                           product_id=product_id, order_type=order_type, **kwargs)
+
+    def cancel_order(self, order_id):
+        return self.__Call(PRIVATE_ENDPOINT, ORDER_PRIORITY, False, "cancel_order", order_id)
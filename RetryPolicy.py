@@ -0,0 +1,186 @@
+# Retry Policy
+# A class which retries calls to the exchange with jittered exponential backoff
+# instead of sleeping a fixed second and trying forever. Each call is made under
+# a key (EX: the ticker of one product, or the account balances) which has its own
+# circuit breaker. Once a key fails enough times in a row its circuit opens, and
+# calls under it fail straight away until the circuit has been open long enough
+# to let one trial call through. That way one failing product is skipped for the
+# tick (its data is left stale) while the healthy ones keep trading at full rate.
+# One policy is shared by the main thread, the price refresh threads and the
+# order threads, so the circuits are only ever looked at or changed under a lock
+import random
+import threading
+import time
+import Metrics
+import MasterBotConstants
+
+# The states of a circuit
+CIRCUIT_CLOSED = "closed"  # calls go through
+CIRCUIT_OPEN = "open"  # calls fail straight away
+CIRCUIT_HALF_OPEN = "half open"  # one trial call goes through to see if the key works again
+
+class RetryFailedError(Exception):
+    # Raised when a call could not be made before its deadline
+    pass
+
+class CircuitOpenError(RetryFailedError):
+    # Raised when a call is not made because the circuit of its key is open
+    pass
+
+class CircuitBreaker:
+    # The failures of a single key
+    def __init__(self):
+        self.state = CIRCUIT_CLOSED
+        self.consecutiveFailures = 0
+        self.openedTime = 0.0  # when the circuit last opened
+
+class RetryPolicy:
+    def __init__(self, baseDelaySeconds: float = MasterBotConstants.RETRY_BASE_DELAY_SECONDS,
+                 maxDelaySeconds: float = MasterBotConstants.RETRY_MAX_DELAY_SECONDS,
+                 failureThreshold: int = MasterBotConstants.CIRCUIT_FAILURE_THRESHOLD,
+                 openSeconds: float = MasterBotConstants.CIRCUIT_OPEN_SECONDS,
+                 clock=time.monotonic, sleep=time.sleep, randomSource=random.random,
+                 metrics=Metrics.DISABLED_METRICS):
+
+        self.__baseDelaySeconds = baseDelaySeconds
+        self.__maxDelaySeconds = maxDelaySeconds
+        self.__failureThreshold = failureThreshold  # failures in a row which open a circuit
+        self.__openSeconds = openSeconds  # how long a circuit stays open before a trial call
+        self.__clock = clock
+        self.__sleep = sleep
+        self.__randomSource = randomSource
+        self.__metrics = metrics
+        self.__circuitBreakers = {}  # maps the key to its CircuitBreaker
+        # Held to look up or change a circuit, never across a call or a sleep
+        self.__lock = threading.Lock()
+
+    """
+    GetCircuitBreaker
+    Must be called with the lock held
+    @param key: the key of the calls
+    @return: the circuit breaker of that key
+    """
+    def __GetCircuitBreaker(self, key: str):
+        if key not in self.__circuitBreakers:
+            self.__circuitBreakers[key] = CircuitBreaker()
+        return self.__circuitBreakers[key]
+
+    """
+    IsCircuitOpen
+    Must be called with the lock held
+    @param circuitBreaker: the circuit breaker of a key
+    @return: if the circuit is open, moving it to half open first if it is due a trial call
+    """
+    def __IsCircuitOpen(self, circuitBreaker: CircuitBreaker):
+        if circuitBreaker.state == CIRCUIT_OPEN and self.__clock() - circuitBreaker.openedTime >= self.__openSeconds:
+            circuitBreaker.state = CIRCUIT_HALF_OPEN
+        return circuitBreaker.state == CIRCUIT_OPEN
+
+    """
+    GetBackoffSeconds
+    @param attempt: how many attempts have failed so far, starting at 1
+    @return: how long to wait before the next attempt, a random amount up to the exponential backoff
+    """
+    def GetBackoffSeconds(self, attempt: int):
+        return self.__randomSource() * min(self.__maxDelaySeconds, self.__baseDelaySeconds * 2 ** (attempt - 1))
+
+    """
+    IsOpen
+    @param key: the key of the calls
+    @return: if calls under that key would fail straight away, a circuit due a trial call is not open
+    """
+    def IsOpen(self, key: str):
+        with self.__lock:
+            return self.__IsCircuitOpen(self.__GetCircuitBreaker(key))
+
+    """
+    GetSecondsUntilTrial
+    @param key: the key of the calls
+    @return: how long until the circuit of that key lets a trial call through, 0 if it isn't open
+    """
+    def GetSecondsUntilTrial(self, key: str):
+        with self.__lock:
+            circuitBreaker = self.__GetCircuitBreaker(key)
+            if not self.__IsCircuitOpen(circuitBreaker):
+                return 0.0
+            return max(self.__openSeconds - (self.__clock() - circuitBreaker.openedTime), 0.0)
+
+    """
+    RecordSuccess
+    Closes the circuit of a key
+    @param key: the key of the call which worked
+    """
+    def RecordSuccess(self, key: str):
+        with self.__lock:
+            circuitBreaker = self.__GetCircuitBreaker(key)
+            circuitBreaker.state = CIRCUIT_CLOSED
+            circuitBreaker.consecutiveFailures = 0
+
+    """
+    RecordFailure
+    Counts a failure of a key, opening its circuit if it has failed too many times
+    in a row or if its trial call failed
+    @param key: the key of the call which failed
+    """
+    def RecordFailure(self, key: str):
+        self.__metrics.Increment(Metrics.RETRY_FAILURES_TOTAL, (("key", key),))
+        with self.__lock:
+            circuitBreaker = self.__GetCircuitBreaker(key)
+            circuitBreaker.consecutiveFailures = circuitBreaker.consecutiveFailures + 1
+            circuitOpened = False
+            if (circuitBreaker.state == CIRCUIT_HALF_OPEN or
+                    circuitBreaker.consecutiveFailures >= self.__failureThreshold):
+                circuitOpened = circuitBreaker.state != CIRCUIT_OPEN
+                circuitBreaker.state = CIRCUIT_OPEN
+                circuitBreaker.openedTime = self.__clock()
+        if circuitOpened:
+            self.__metrics.Increment(Metrics.CIRCUIT_OPENS_TOTAL, (("key", key),))
+
+    """
+    GetOpenCircuits
+    @return: the keys whose circuits are open
+    """
+    def GetOpenCircuits(self):
+        with self.__lock:
+            return [key for key, circuitBreaker in self.__circuitBreakers.items()
+                    if self.__IsCircuitOpen(circuitBreaker)]
+
+    """
+    Call
+    Calls a function until it works, backing off between attempts
+    @param key: the key the call is made under
+    @param function: the function to call, with no arguments
+    @param deadlineSeconds: how long to keep trying, None to keep trying until it works
+    (waiting out an open circuit instead of failing)
+    @param onFailure: called with the exception every time an attempt fails, EX: to log it
+    @return: what the function returns
+    @raise CircuitOpenError: if the circuit of the key is open and won't let a call through before the deadline
+    @raise RetryFailedError: if the deadline passed before the call worked
+    """
+    def Call(self, key: str, function, deadlineSeconds: float = None, onFailure=None):
+        startTime = self.__clock()
+        attempt = 0
+        while True:
+            secondsUntilTrial = self.GetSecondsUntilTrial(key)
+            if secondsUntilTrial > 0.0:
+                if deadlineSeconds is not None and self.__clock() + secondsUntilTrial > startTime + deadlineSeconds:
+                    raise CircuitOpenError("The circuit of " + key + " is open")
+                self.__sleep(secondsUntilTrial)
+                continue
+
+            if attempt > 0:
+                self.__metrics.Increment(Metrics.RETRIES_TOTAL, (("key", key),))
+            try:
+                result = function()
+                self.RecordSuccess(key)
+                return result
+            except Exception as exception:
+                self.RecordFailure(key)
+                if onFailure is not None:
+                    onFailure(exception)
+
+            attempt = attempt + 1
+            backoffSeconds = self.GetBackoffSeconds(attempt)
+            if deadlineSeconds is not None and self.__clock() + backoffSeconds > startTime + deadlineSeconds:
+                raise RetryFailedError(key + " did not work within " + str(deadlineSeconds) + " seconds")
+            self.__sleep(backoffSeconds)
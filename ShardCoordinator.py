@@ -0,0 +1,157 @@
+# Shard Coordinator
+# Splits the cryptos between worker processes (shards) so the bot can use more
+# than one core and a slow product only holds up the shard it is in. Every
+# shard trades out of the same USD account, so the coordinator keeps the USD
+# balance, the USD each shard has set aside for its buys and the crypto
+# holdings of each shard in shared memory. A shard reserves the USD of a buy
+# before placing it (atomically, so two shards can never spend the same
+# dollars) and settles the reservation once the buy fills, which keeps the
+# amount to buy and the max portfolio percentage checks correct across shards.
+# Settling takes what a buy spent off the shared balance straight away, so a
+# balance is only published if it was fetched after the latest settlement,
+# otherwise a fill could be taken off twice or given back before it is seen
+import multiprocessing
+import multiprocessing.connection
+
+"""
+AssignCryptoIDsToShards
+@param cryptoIDs: the crypto IDs to trade
+@param shardCount: how many shards to split them between
+@return: a list of the crypto IDs of each shard, dealt out in sorted order so the split is stable
+"""
+def AssignCryptoIDsToShards(cryptoIDs, shardCount: int):
+    shardCryptoIDs = [[] for shardIndex in range(shardCount)]
+    for cryptoIndex, cryptoID in enumerate(sorted(cryptoIDs)):
+        shardCryptoIDs[cryptoIndex % shardCount].append(cryptoID)
+    return shardCryptoIDs
+
+class ShardCoordinator:
+    def __init__(self, shardCount: int):
+        self.__shardCount = shardCount
+        # Guards all of the shared values below, the shared memory itself is unlocked
+        self.__lock = multiprocessing.Lock()
+        self.__usdAmount = multiprocessing.RawValue("d", 0.0)  # the balance of the USD account
+        self.__shardHoldingsInUSD = multiprocessing.RawArray("d", shardCount)  # the crypto holdings of each shard
+        self.__shardReservedUSD = multiprocessing.RawArray("d", shardCount)  # the USD each shard has set aside
+        self.__settlementCount = multiprocessing.RawValue("q", 0)  # how many buys have been taken off the balance
+
+    """
+    GetShardCount
+    @return: how many shards the cryptos are split between
+    """
+    def GetShardCount(self):
+        return self.__shardCount
+
+    """
+    GetSettlementCount
+    @return: how many buys have been settled, read before fetching a balance to publish
+    """
+    def GetSettlementCount(self):
+        with self.__lock:
+            return self.__settlementCount.value
+
+    """
+    PublishUSDAmount
+    Sets the balance of the USD account, as the shard which fetched it last saw it. A balance
+    fetched before the latest settlement is ignored, the settled buy is already taken off the
+    shared balance and it can't be told if the fetched one has it too
+    @param usdAmount: the balance of the USD account
+    @param settlementCount: the GetSettlementCount from before the balance was fetched
+    @return: if the balance was published
+    """
+    def PublishUSDAmount(self, usdAmount: float, settlementCount: int):
+        with self.__lock:
+            if settlementCount != self.__settlementCount.value:
+                return False
+            self.__usdAmount.value = usdAmount
+            return True
+
+    """
+    PublishShardHoldings
+    @param shardIndex: the index of the shard
+    @param holdingsInUSD: the holdings of all of the shard's cryptos in USD
+    """
+    def PublishShardHoldings(self, shardIndex: int, holdingsInUSD: float):
+        with self.__lock:
+            self.__shardHoldingsInUSD[shardIndex] = holdingsInUSD
+
+    """
+    GetAvailableUSD
+    @return: the USD which isn't set aside for a buy of any shard
+    """
+    def GetAvailableUSD(self):
+        with self.__lock:
+            return max(self.__usdAmount.value - sum(self.__shardReservedUSD), 0.0)
+
+    """
+    GetTotalHoldingsInUSD
+    @return: the total holdings of the USD account and the cryptos of every shard
+    """
+    def GetTotalHoldingsInUSD(self):
+        with self.__lock:
+            return self.__usdAmount.value + sum(self.__shardHoldingsInUSD)
+
+    """
+    ReserveUSD
+    Sets aside USD for a buy, as much of it as is available
+    @param shardIndex: the index of the shard placing the buy
+    @param amountInUSD: how much the buy needs
+    @param minimumAmountInUSD: the least which is worth buying, less than this reserves nothing
+    @return: the USD reserved, 0 if there wasn't enough available
+    """
+    def ReserveUSD(self, shardIndex: int, amountInUSD: float, minimumAmountInUSD: float = 0.0):
+        with self.__lock:
+            availableUSD = self.__usdAmount.value - sum(self.__shardReservedUSD)
+            reservedUSD = min(amountInUSD, availableUSD)
+            if reservedUSD <= 0.0 or reservedUSD < minimumAmountInUSD:
+                return 0.0
+            self.__shardReservedUSD[shardIndex] = self.__shardReservedUSD[shardIndex] + reservedUSD
+            return reservedUSD
+
+    """
+    SettleReservation
+    Gives back the USD a buy reserved and takes off what it really spent,
+    until a balance fetched after this brings in the exact balance
+    @param shardIndex: the index of the shard which placed the buy
+    @param reservedUSD: the USD the buy reserved
+    @param spentUSD: the USD the buy spent including its fee, 0 if it didn't fill
+    """
+    def SettleReservation(self, shardIndex: int, reservedUSD: float, spentUSD: float = 0.0):
+        with self.__lock:
+            self.__shardReservedUSD[shardIndex] = max(self.__shardReservedUSD[shardIndex] - reservedUSD, 0.0)
+            if spentUSD != 0.0:
+                self.__usdAmount.value = self.__usdAmount.value - spentUSD
+                self.__settlementCount.value = self.__settlementCount.value + 1
+
+    """
+    ReleaseShard
+    Clears the reservations and holdings of a shard which stopped
+    @param shardIndex: the index of the shard
+    """
+    def ReleaseShard(self, shardIndex: int):
+        with self.__lock:
+            self.__shardReservedUSD[shardIndex] = 0.0
+            self.__shardHoldingsInUSD[shardIndex] = 0.0
+
+"""
+RunShards
+Starts a worker process for each shard and waits for all of them to stop.
+A shard which stops has its reservations released so the others can use the USD
+@param target: the function each worker runs, called with (crypto IDs, shard coordinator, shard index)
+@param cryptoIDs: the crypto IDs to split between the shards
+@param shardCount: how many shards to run
+"""
+def RunShards(target, cryptoIDs, shardCount: int):
+    shardCoordinator = ShardCoordinator(shardCount)
+    runningShards = {}  # maps the sentinel of each worker process to its shard index
+    for shardIndex, shardCryptoIDs in enumerate(AssignCryptoIDsToShards(cryptoIDs, shardCount)):
+        if not shardCryptoIDs:
+            continue  # more shards than cryptos
+        shardProcess = multiprocessing.Process(target=target, args=(shardCryptoIDs, shardCoordinator, shardIndex),
+                                               name="shard-" + str(shardIndex))
+        shardProcess.start()
+        runningShards[shardProcess.sentinel] = shardIndex
+
+    while runningShards:
+        for sentinel in multiprocessing.connection.wait(list(runningShards)):
+            shardCoordinator.ReleaseShard(runningShards.pop(sentinel))
@@ -0,0 +1,186 @@
+# Simulated Client
+# A stand-in for the coinbase pro authenticated client which keeps
+# its own balances and fills market orders instantly at the price it is
+# given, charging a fee, so the MasterBot can be run without an exchange
+import itertools
+import MasterBotConstants
+
+USD_ACCOUNT_ID = "USD-account"
+
+class SimulatedClient:
+    def __init__(self, usdAmount: float, cryptoIDs, minSizes=None,
+                 feeRate: float = MasterBotConstants.SIMULATED_FEE_RATE,
+                 slippageRate: float = MasterBotConstants.SIMULATED_SLIPPAGE_RATE):
+
+        self.__cryptoIDs = list(cryptoIDs)
+        # maps the crypto ID to the smallest amount of it which can be traded
+        if minSizes is None:
+            minSizes = {}
+        self.__minSizes = {cryptoID: minSizes.get(cryptoID, MasterBotConstants.SIMULATED_MIN_SIZE)
+                           for cryptoID in self.__cryptoIDs}
+        self.__feeRate = feeRate  # the fraction of each order's value taken as a fee
+        self.__slippageRate = slippageRate  # how much worse than the current price market orders fill
+
+        self.__balances = {USD_ACCOUNT_ID: float(usdAmount)}  # maps the account ID to its balance
+        for cryptoID in self.__cryptoIDs:
+            self.__balances[self.__GetAccountID(cryptoID)] = 0.0
+        self.__prices = {}  # maps the product ID to its current price
+
+        self.__orders = {}  # maps the order ID to the order
+        self.__orderIDs = itertools.count(1)
+        self.__buyCount = 0
+        self.__sellCount = 0
+        self.__feesPaid = 0.0
+
+    @staticmethod
+    def __GetAccountID(cryptoID: str):
+        return cryptoID + "-account"
+
+    @staticmethod
+    def __GetCryptoID(productId: str):
+        return productId[:productId.find("-")]
+
+    """
+    GetUSDAccountID
+    @return: the account ID of the simulated USD account
+    """
+    def GetUSDAccountID(self):
+        return USD_ACCOUNT_ID
+
+    """
+    SetPrice
+    Sets the price orders for a product will be filled at
+    @param productId: The product ID pair, EX: BTC-USD
+    @param price: the price of one full coin in USD
+    """
+    def SetPrice(self, productId: str, price: float):
+        self.__prices[productId] = price
+
+    """
+    GetBuyCount
+    @return: how many buy orders have been filled
+    """
+    def GetBuyCount(self):
+        return self.__buyCount
+
+    """
+    GetSellCount
+    @return: how many sell orders have been filled
+    """
+    def GetSellCount(self):
+        return self.__sellCount
+
+    """
+    GetFeesPaid
+    @return: the total fees paid in USD
+    """
+    def GetFeesPaid(self):
+        return self.__feesPaid
+
+    """
+    GetUSDBalance
+    @return: the balance of the simulated USD account
+    """
+    def GetUSDBalance(self):
+        return self.__balances[USD_ACCOUNT_ID]
+
+    """
+    GetCryptoBalance
+    @param cryptoID: The crypto ID of the cryptocurrency
+    @return: the balance of that cryptocurrency's simulated account
+    """
+    def GetCryptoBalance(self, cryptoID: str):
+        return self.__balances[self.__GetAccountID(cryptoID)]
+
+    """
+    SetCryptoBalance
+    Sets the balance of a cryptocurrency's simulated account, EX: to match lots held from before
+    @param cryptoID: The crypto ID of the cryptocurrency
+    @param amountInCoin: the amount of the crypto held
+    """
+    def SetCryptoBalance(self, cryptoID: str, amountInCoin: float):
+        self.__balances[self.__GetAccountID(cryptoID)] = float(amountInCoin)
+
+    # The methods below mirror the coinbase pro client which the MasterBot uses
+
+    def get_account(self, account_id):
+        return {"id": account_id, "balance": str(self.__balances[account_id])}
+
+    def get_accounts(self):
+        accounts = [{"id": USD_ACCOUNT_ID, "currency": "USD", "balance": str(self.__balances[USD_ACCOUNT_ID])}]
+        for cryptoID in self.__cryptoIDs:
+            accountID = self.__GetAccountID(cryptoID)
+            accounts.append({"id": accountID, "currency": cryptoID, "balance": str(self.__balances[accountID])})
+        return accounts
+
+    def get_currencies(self):
+        return [{"id": cryptoID, "name": cryptoID} for cryptoID in self.__cryptoIDs]
+
+    def get_products(self):
+        return [{"id": cryptoID + "-USD", "base_min_size": str(self.__minSizes[cryptoID])}
+                for cryptoID in self.__cryptoIDs]
+
+    def get_product_ticker(self, product_id):
+        return {"price": str(self.__prices[product_id])}
+
+    def get_order(self, order_id):
+        if order_id not in self.__orders:
+            return {"message": "NotFound"}
+        return self.__orders[order_id]
+
+    def buy(self, product_id, order_type="market", size=None, **kwargs):
+        return self.__PlaceMarketOrder(product_id, "buy", float(size))
+
+    def sell(self, product_id, order_type="market", size=None, **kwargs):
+        return self.__PlaceMarketOrder(product_id, "sell", float(size))
+
+    """
+    PlaceMarketOrder
+    Fills a market order straight away at the current price (plus slippage),
+    the same way coinbase pro reports a rejected order if it can't be filled
+    @param productId: The product ID pair, EX: BTC-USD
+    @param side: "buy" or "sell"
+    @param size: the amount of coin to buy or sell
+    @return: the order in the same form coinbase pro returns it
+    """
+    def __PlaceMarketOrder(self, productId: str, side: str, size: float):
+        cryptoID = self.__GetCryptoID(productId)
+        cryptoAccountID = self.__GetAccountID(cryptoID)
+        if size < self.__minSizes[cryptoID]:
+            return {"message": "size is too small"}
+
+        if side == "buy":
+            fillPrice = self.__prices[productId] * (1.0 + self.__slippageRate)
+        else:
+            fillPrice = self.__prices[productId] * (1.0 - self.__slippageRate)
+        executedValue = size * fillPrice
+        fee = executedValue * self.__feeRate
+
+        if side == "buy":
+            if executedValue + fee > self.__balances[USD_ACCOUNT_ID]:
+                return {"message": "Insufficient funds"}
+            self.__balances[USD_ACCOUNT_ID] = self.__balances[USD_ACCOUNT_ID] - (executedValue + fee)
+            self.__balances[cryptoAccountID] = self.__balances[cryptoAccountID] + size
+            self.__buyCount = self.__buyCount + 1
+        else:
+            if size > self.__balances[cryptoAccountID] + 1e-12:
+                return {"message": "Insufficient funds"}
+            self.__balances[cryptoAccountID] = max(self.__balances[cryptoAccountID] - size, 0.0)
+            self.__balances[USD_ACCOUNT_ID] = self.__balances[USD_ACCOUNT_ID] + (executedValue - fee)
+            self.__sellCount = self.__sellCount + 1
+        self.__feesPaid = self.__feesPaid + fee
+
+        orderID = str(next(self.__orderIDs))
+        order = {"id": orderID,
+                 "product_id": productId,
+                 "side": side,
+                 "type": "market",
+                 "size": str(size),
+                 "status": "done",
+                 "done_reason": "filled",
+                 "settled": True,
+                 "filled_size": str(size),
+                 "executed_value": str(executedValue),
+                 "fill_fees": str(fee)}
+        self.__orders[orderID] = order
+        return order
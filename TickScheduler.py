@@ -0,0 +1,153 @@
+# Tick Scheduler
+# A class which decides when the decision pipeline of a crypto account has to
+# run again. Instead of running every product through every check on every
+# tick, a product is only run when the inputs its decisions depend on (its price,
+# holdings or settings) have changed since it last ran, no sooner than its minimum
+# interval and at least once every maximum interval. It also keeps track of how long
+# each product waits between a change being seen and the decision being made
+import time
+import MasterBotConstants
+
+class ProductSchedule:
+    # The scheduling state of a single product
+    def __init__(self, minIntervalSeconds: float, maxIntervalSeconds: float):
+        self.minIntervalSeconds = minIntervalSeconds
+        self.maxIntervalSeconds = maxIntervalSeconds
+        self.lastRunInputs = None  # the decision inputs as they were after the latest run
+        self.lastRunTime = None
+        self.changedSince = None  # when a change since the latest run was first seen, None if nothing changed
+
+        self.runCount = 0
+        self.skipCount = 0
+        self.latencyCount = 0
+        self.totalLatencySeconds = 0.0
+        self.maxLatencySeconds = 0.0
+        self.lastLatencySeconds = 0.0
+
+class TickScheduler:
+    def __init__(self, minIntervalSeconds: float = MasterBotConstants.SCHEDULER_MIN_INTERVAL_SECONDS,
+                 maxIntervalSeconds: float = MasterBotConstants.SCHEDULER_MAX_INTERVAL_SECONDS,
+                 clock=time.monotonic):
+
+        self.__minIntervalSeconds = minIntervalSeconds
+        self.__maxIntervalSeconds = maxIntervalSeconds
+        self.__clock = clock
+        self.__schedules = {}  # maps the crypto ID to its ProductSchedule
+
+    """
+    GetSchedule
+    @param cryptoID: The crypto ID of the cryptocurrency
+    @return: the ProductSchedule of that cryptocurrency, created with the default intervals the first time
+    """
+    def __GetSchedule(self, cryptoID: str):
+        if cryptoID not in self.__schedules:
+            self.__schedules[cryptoID] = ProductSchedule(self.__minIntervalSeconds, self.__maxIntervalSeconds)
+        return self.__schedules[cryptoID]
+
+    """
+    GetTime
+    @return: the current time on the scheduler's clock
+    """
+    def GetTime(self):
+        return self.__clock()
+
+    """
+    SetIntervals
+    Sets how often a particular product may and must be run
+    @param cryptoID: The crypto ID of the cryptocurrency
+    @param minIntervalSeconds: the shortest time between two runs, even when the inputs keep changing
+    @param maxIntervalSeconds: the longest time between two runs, even when nothing changes
+    """
+    def SetIntervals(self, cryptoID: str, minIntervalSeconds: float, maxIntervalSeconds: float):
+        schedule = self.__GetSchedule(cryptoID)
+        schedule.minIntervalSeconds = minIntervalSeconds
+        schedule.maxIntervalSeconds = maxIntervalSeconds
+
+    """
+    Observe
+    Compares the current decision inputs of a product to the ones it last ran with
+    @param cryptoID: The crypto ID of the cryptocurrency
+    @param decisionInputs: everything the decisions of the product depend on
+    @param observedAt: when the inputs were read (EX: the start of the tick), now if None
+    """
+    def Observe(self, cryptoID: str, decisionInputs, observedAt=None):
+        schedule = self.__GetSchedule(cryptoID)
+        if decisionInputs != schedule.lastRunInputs and schedule.changedSince is None:
+            schedule.changedSince = observedAt if observedAt is not None else self.__clock()
+
+    """
+    ShouldRun
+    @param cryptoID: The crypto ID of the cryptocurrency
+    @return: if the decision pipeline of the product should run now
+    """
+    def ShouldRun(self, cryptoID: str):
+        schedule = self.__GetSchedule(cryptoID)
+        if schedule.lastRunTime is None:
+            return True
+
+        sinceLastRun = self.__clock() - schedule.lastRunTime
+        if sinceLastRun >= schedule.maxIntervalSeconds:
+            return True
+        if schedule.changedSince is not None and sinceLastRun >= schedule.minIntervalSeconds:
+            return True
+
+        schedule.skipCount = schedule.skipCount + 1
+        return False
+
+    """
+    MarkRan
+    Records that the decision pipeline of a product has run
+    @param cryptoID: The crypto ID of the cryptocurrency
+    @param decisionInputsBefore: the decision inputs the pipeline ran with
+    @param decisionInputsAfter: the decision inputs once the pipeline finished
+    @param ranAt: when the inputs it ran with were read (EX: the start of the tick), now if None.
+    The intervals are counted from this, so a run which finishes late in its tick doesn't
+    push the next one back a whole tick
+    """
+    def MarkRan(self, cryptoID: str, decisionInputsBefore, decisionInputsAfter, ranAt=None):
+        schedule = self.__GetSchedule(cryptoID)
+        now = self.__clock()
+        if schedule.changedSince is not None:
+            latencySeconds = now - schedule.changedSince
+            schedule.latencyCount = schedule.latencyCount + 1
+            schedule.totalLatencySeconds = schedule.totalLatencySeconds + latencySeconds
+            schedule.maxLatencySeconds = max(schedule.maxLatencySeconds, latencySeconds)
+            schedule.lastLatencySeconds = latencySeconds
+
+        schedule.runCount = schedule.runCount + 1
+        schedule.lastRunTime = ranAt if ranAt is not None else now
+        schedule.lastRunInputs = decisionInputsAfter
+        # If the pipeline changed its own inputs (EX: it moved the reference price) it
+        # may decide something else with them, so it runs again like it would have before
+        schedule.changedSince = now if decisionInputsAfter != decisionInputsBefore else None
+
+    """
+    GetLatencyStats
+    @param cryptoID: The crypto ID of the cryptocurrency
+    @return: a dictionary of the runs, skips and tick to decision latency (in seconds) of the product
+    """
+    def GetLatencyStats(self, cryptoID: str):
+        schedule = self.__GetSchedule(cryptoID)
+        meanLatencySeconds = 0.0
+        if schedule.latencyCount != 0:
+            meanLatencySeconds = schedule.totalLatencySeconds / schedule.latencyCount
+        return {"runs": schedule.runCount,
+                "skips": schedule.skipCount,
+                "meanLatencySeconds": meanLatencySeconds,
+                "maxLatencySeconds": schedule.maxLatencySeconds,
+                "lastLatencySeconds": schedule.lastLatencySeconds}
+
+    """
+    GetLatencyReport
+    @return: the latency stats of every product as human readable lines
+    """
+    def GetLatencyReport(self):
+        report = ""
+        for cryptoID in self.__schedules:
+            latencyStats = self.GetLatencyStats(cryptoID)
+            report = report + (cryptoID + ": " + str(latencyStats["runs"]) + " runs, " +
+                               str(latencyStats["skips"]) + " skips, latency mean " +
+                               str(round(latencyStats["meanLatencySeconds"] * 1000.0, 1)) + "ms max " +
+                               str(round(latencyStats["maxLatencySeconds"] * 1000.0, 1)) + "ms last " +
+                               str(round(latencyStats["lastLatencySeconds"] * 1000.0, 1)) + "ms\n")
+        return report
@@ -0,0 +1,199 @@
+# Ticker Feed
+# A class which keeps the last traded price of every product up to date
+# by listening to the coinbase pro ticker channel over a websocket,
+# instead of polling the REST ticker endpoint for every product
+import threading
+import time
+import MasterBotConstants
+
+class TickerFeed:
+    def __init__(self, productIds, staleAfterSeconds: float = MasterBotConstants.TICKER_FEED_STALE_SECONDS,
+                 reconnectDelaySeconds: float = MasterBotConstants.TICKER_FEED_RECONNECT_DELAY_SECONDS,
+                 websocketClientFactory=None):
+
+        self.__productIds = list(productIds)
+        self.__staleAfterSeconds = staleAfterSeconds
+        self.__reconnectDelaySeconds = reconnectDelaySeconds
+        # Builds the websocket client, can be swapped out for a local stand-in when testing offline.
+        # It is called as websocketClientFactory(productIds, tickerFeed) and must return an object with
+        # start() and close() which reports back through OnOpen, OnMessage, OnClose and OnError
+        if websocketClientFactory is None:
+            websocketClientFactory = CreateCoinbaseProWebsocketClient
+        self.__websocketClientFactory = websocketClientFactory
+
+        self.__lastPrices = {}  # maps the product ID to the (price, time received) of the latest ticker
+        self.__lock = threading.Lock()
+
+        self.__websocketClient = None
+        self.__isConnected = False
+        self.__lastMessageTime = 0.0
+        self.__reconnectCount = 0
+
+        self.__stopEvent = threading.Event()
+        self.__supervisorThread = None
+
+    """
+    Start
+    Connects to the ticker channel and starts watching the connection
+    so that it can be re-established if it drops or goes quiet
+    """
+    def Start(self):
+        self.__stopEvent.clear()
+        self.__Connect()
+        self.__supervisorThread = threading.Thread(target=self.__Supervise, daemon=True)
+        self.__supervisorThread.start()
+
+    """
+    Stop
+    Stops watching the connection and closes the websocket
+    """
+    def Stop(self):
+        self.__stopEvent.set()
+        if self.__supervisorThread is not None:
+            self.__supervisorThread.join()
+            self.__supervisorThread = None
+        self.__Disconnect()
+
+    """
+    Connect
+    Creates a new websocket client and starts listening
+    """
+    def __Connect(self):
+        self.__lastMessageTime = time.monotonic()
+        self.__websocketClient = self.__websocketClientFactory(self.__productIds, self)
+        self.__websocketClient.start()
+
+    """
+    Disconnect
+    Closes the current websocket client if there is one
+    """
+    def __Disconnect(self):
+        if self.__websocketClient is not None:
+            try:
+                self.__websocketClient.close()
+            except:
+                pass  # the connection is being thrown away either way
+            self.__websocketClient = None
+        self.__isConnected = False
+
+    """
+    Supervise
+    Runs on its own thread and reconnects whenever the websocket
+    has closed or no message has come in for too long
+    """
+    def __Supervise(self):
+        while not self.__stopEvent.wait(self.__reconnectDelaySeconds):
+            secondsSinceLastMessage = time.monotonic() - self.__lastMessageTime
+            if not self.__isConnected or secondsSinceLastMessage > self.__staleAfterSeconds:
+                self.__Disconnect()
+                try:
+                    self.__Connect()
+                except:
+                    pass  # try again after the next delay
+                self.__reconnectCount = self.__reconnectCount + 1
+
+    """
+    OnOpen
+    Called by the websocket client once it is connected
+    """
+    def OnOpen(self):
+        self.__isConnected = True
+        self.__lastMessageTime = time.monotonic()
+
+    """
+    OnMessage
+    Called by the websocket client for every message on the feed,
+    ticker messages update the last price table
+    @param message: the decoded json message from the feed
+    """
+    def OnMessage(self, message):
+        receivedTime = time.monotonic()
+        self.__isConnected = True
+        self.__lastMessageTime = receivedTime
+        if message.get("type") != "ticker" or "price" not in message:
+            return
+
+        try:
+            price = float(message["price"])
+        except (TypeError, ValueError):
+            return
+
+        with self.__lock:
+            self.__lastPrices[message["product_id"]] = (price, receivedTime)
+
+    """
+    OnClose
+    Called by the websocket client when the connection has closed
+    """
+    def OnClose(self):
+        self.__isConnected = False
+
+    """
+    OnError
+    Called by the websocket client when the connection has failed
+    @param error: the error raised by the connection
+    """
+    def OnError(self, error):
+        self.__isConnected = False
+
+    """
+    GetLastPrice
+    @param productId: The product ID pair, EX: BTC-USD
+    @return: the latest price seen on the feed for that product,
+    or None if there is none or it is too old to be trusted
+    """
+    def GetLastPrice(self, productId: str):
+        with self.__lock:
+            lastPrice = self.__lastPrices.get(productId)
+        if lastPrice is None:
+            return None
+
+        price, receivedTime = lastPrice
+        if time.monotonic() - receivedTime > self.__staleAfterSeconds:
+            return None
+        return price
+
+    """
+    IsConnected
+    @return: if the websocket is currently connected
+    """
+    def IsConnected(self):
+        return self.__isConnected
+
+    """
+    GetReconnectCount
+    @return: how many times the websocket has been reconnected
+    """
+    def GetReconnectCount(self):
+        return self.__reconnectCount
+
+"""
+CreateCoinbaseProWebsocketClient
+The default websocket client factory, subscribes to the ticker
+and heartbeat channels on coinbase pro for the given products
+@param productIds: the product ID pairs to subscribe to
+@param tickerFeed: the ticker feed to report messages back to
+@return: the websocket client, not started yet
+"""
+def CreateCoinbaseProWebsocketClient(productIds, tickerFeed: TickerFeed):
+    # Only needed when talking to the real exchange
+    import cbpro
+
+    class TickerWebsocketClient(cbpro.WebsocketClient):
+        def on_open(self):
+            tickerFeed.OnOpen()
+
+        def on_message(self, msg):
+            tickerFeed.OnMessage(msg)
+
+        def on_close(self):
+            tickerFeed.OnClose()
+
+        def on_error(self, e, data=None):
+            self.error = e
+            self.stop = True
+            tickerFeed.OnError(e)
+
+    # The heartbeat channel keeps messages coming in for products which rarely trade
+    # so a quiet connection really does mean a broken one
+    return TickerWebsocketClient(products=productIds, channels=["ticker", "heartbeat"], should_print=False)
@@ -0,0 +1,221 @@
+# Transaction Store
+# A class which keeps the transactions/<cryptoID>.csv files open and appends
+# trades to them in batches. Next to each csv it keeps a binary time index
+# (<cryptoID>.csv.idx) of (time, byte offset) for every row, so the trades of a
+# product between two times are found with a binary search and read with one
+# seek instead of loading the whole csv. Csv files without an index (or with an
+# index which fell behind after a crash) are indexed when they are opened
+import csv
+import datetime
+import io
+import os
+import numpy as np
+import MasterBotConstants
+
+INDEX_DTYPE = np.dtype([("time", "<f8"), ("offset", "<u8")])
+
+class TransactionRecord:
+    # A single trade read back out of a transactions file
+    def __init__(self, transaction: str, amountInUSD: float, amountInCoin: float, currentPrice: float,
+                 priceSinceLastTransaction: float, dateTime: datetime.datetime):
+        self.transaction = transaction  # "Buy" or "Sell"
+        self.amountInUSD = amountInUSD
+        self.amountInCoin = amountInCoin
+        self.currentPrice = currentPrice
+        self.priceSinceLastTransaction = priceSinceLastTransaction
+        self.dateTime = dateTime
+
+class TransactionFile:
+    # The open csv and index files of a single crypto
+    def __init__(self, csvFile, indexFile, csvSize: int):
+        self.csvFile = csvFile
+        self.indexFile = indexFile
+        self.csvSize = csvSize  # the length of the csv including everything written to it
+        self.pendingRows = bytearray()
+        self.pendingIndex = bytearray()
+
+class TransactionStore:
+    def __init__(self, transactionsFolderPath: str,
+                 batchSize: int = MasterBotConstants.TRANSACTION_BATCH_SIZE):
+        self.__transactionsFolderPath = transactionsFolderPath
+        self.__batchSize = batchSize
+        self.__transactionFiles = {}  # maps the crypto ID to its TransactionFile
+        self.__pendingRowCount = 0
+
+    """
+    GetCsvHeader
+    @param cryptoID: the crypto ID of the cryptocurrency
+    @return: the first line of a transactions csv
+    """
+    @staticmethod
+    def __GetCsvHeader(cryptoID: str):
+        return "Transaction,Amount ($),Amount (" + cryptoID + "),Current Price,Price Since Last Transaction,Date-Time\n"
+
+    """
+    ParseDateTime
+    @param rawDateTime: the Date-Time column of a row
+    @return: the date time of the row
+    """
+    @staticmethod
+    def __ParseDateTime(rawDateTime: str):
+        return datetime.datetime.fromisoformat(rawDateTime.strip())
+
+    """
+    ToTimestamp
+    @param dateTime: a datetime or a time in seconds since the epoch
+    @return: the time in seconds since the epoch
+    """
+    @staticmethod
+    def __ToTimestamp(dateTime):
+        if isinstance(dateTime, datetime.datetime):
+            return dateTime.timestamp()
+        return float(dateTime)
+
+    """
+    OpenTransactionFile
+    Opens (creating it if needed) the csv of a crypto and brings its index up to date with it
+    @param cryptoID: the crypto ID of the cryptocurrency
+    @return: the TransactionFile of that crypto
+    """
+    def __OpenTransactionFile(self, cryptoID: str):
+        if cryptoID in self.__transactionFiles:
+            return self.__transactionFiles[cryptoID]
+
+        csvFilePath = self.__transactionsFolderPath + "/" + cryptoID + ".csv"
+        indexFilePath = csvFilePath + ".idx"
+        if not os.path.exists(csvFilePath):
+            newCsvFile = open(csvFilePath, "wb")
+            newCsvFile.write(self.__GetCsvHeader(cryptoID).encode())
+            newCsvFile.close()
+            if os.path.exists(indexFilePath):
+                os.remove(indexFilePath)
+
+        indexFile = open(indexFilePath, "a+b")
+        indexFile.seek(0)
+        indexEntries = np.frombuffer(indexFile.read(), dtype=np.uint8)
+        # Throw away a torn entry at the end
+        wholeEntriesLength = (len(indexEntries) // INDEX_DTYPE.itemsize) * INDEX_DTYPE.itemsize
+        indexFile.truncate(wholeEntriesLength)
+        indexEntries = indexEntries[:wholeEntriesLength].view(INDEX_DTYPE)
+
+        csvFile = open(csvFilePath, "a+b")
+        csvFile.seek(0)
+        # Index the rows written after the last indexed one (all of them for an old csv without an index)
+        if len(indexEntries) != 0:
+            csvFile.seek(int(indexEntries["offset"][-1]))
+            csvFile.readline()
+        else:
+            csvFile.readline()  # the header
+        offset = csvFile.tell()
+        missingIndex = bytearray()
+        for line in iter(csvFile.readline, b""):
+            if not line.endswith(b"\n"):
+                # A row torn by a crash mid write, new rows would be glued onto it
+                csvFile.truncate(offset)
+                break
+            if line.strip():
+                rowTime = self.__ParseDateTime(line.decode().rsplit(",", 1)[1]).timestamp()
+                missingIndex += np.array([(rowTime, offset)], dtype=INDEX_DTYPE).tobytes()
+            offset = offset + len(line)
+        if missingIndex:
+            indexFile.write(missingIndex)
+            indexFile.flush()
+
+        transactionFile = TransactionFile(csvFile, indexFile, offset)
+        self.__transactionFiles[cryptoID] = transactionFile
+        return transactionFile
+
+    """
+    Append
+    Adds a trade to a crypto's transactions, it is written on the next flush
+    @param cryptoID: the crypto ID of the cryptocurrency
+    @param transaction: "Buy" or "Sell"
+    @param amountInUSD: The amount of the cryptocurrency in USD
+    @param amountInCoin: The amount of the cryptocurrency in terms of the crypto coin
+    @param currentPrice: the price the trade was made at
+    @param priceSinceLastTransaction: the price of the crypto at the transaction before this one
+    @param dateTime: when the trade was made, now if None
+    """
+    def Append(self, cryptoID: str, transaction: str, amountInUSD: float, amountInCoin: float,
+               currentPrice: float, priceSinceLastTransaction: float, dateTime=None):
+        if dateTime is None:
+            dateTime = datetime.datetime.now()
+        transactionFile = self.__OpenTransactionFile(cryptoID)
+        row = (transaction + "," + str(amountInUSD) + "," + str(amountInCoin) + "," + str(currentPrice) + "," +
+               str(priceSinceLastTransaction) + "," + str(dateTime) + "\n").encode()
+
+        offset = transactionFile.csvSize + len(transactionFile.pendingRows)
+        transactionFile.pendingRows += row
+        transactionFile.pendingIndex += np.array([(dateTime.timestamp(), offset)], dtype=INDEX_DTYPE).tobytes()
+        self.__pendingRowCount = self.__pendingRowCount + 1
+        if self.__pendingRowCount >= self.__batchSize:
+            self.Flush()
+
+    """
+    Flush
+    Writes every pending trade to its csv, and then to its index so the
+    index never points past the end of the csv
+    """
+    def Flush(self):
+        if self.__pendingRowCount == 0:
+            return
+        for transactionFile in self.__transactionFiles.values():
+            if not transactionFile.pendingRows:
+                continue
+            transactionFile.csvFile.write(transactionFile.pendingRows)
+            transactionFile.csvFile.flush()
+            transactionFile.indexFile.write(transactionFile.pendingIndex)
+            transactionFile.indexFile.flush()
+            transactionFile.csvSize = transactionFile.csvSize + len(transactionFile.pendingRows)
+            transactionFile.pendingRows = bytearray()
+            transactionFile.pendingIndex = bytearray()
+        self.__pendingRowCount = 0
+
+    """
+    Query
+    Reads the trades of a crypto made between two times, seeking straight to them through the index
+    @param cryptoID: the crypto ID of the cryptocurrency
+    @param startTime: the earliest time (a datetime or seconds since the epoch) to include
+    @param endTime: the latest time (a datetime or seconds since the epoch) to include
+    @return: a list of TransactionRecords in the order they were made
+    """
+    def Query(self, cryptoID: str, startTime, endTime):
+        csvFilePath = self.__transactionsFolderPath + "/" + cryptoID + ".csv"
+        if cryptoID not in self.__transactionFiles and not os.path.exists(csvFilePath):
+            return []
+        transactionFile = self.__OpenTransactionFile(cryptoID)
+        self.Flush()
+
+        transactionFile.indexFile.seek(0)
+        indexEntries = np.frombuffer(transactionFile.indexFile.read(), dtype=INDEX_DTYPE)
+        startIndex = int(np.searchsorted(indexEntries["time"], self.__ToTimestamp(startTime), side="left"))
+        endIndex = int(np.searchsorted(indexEntries["time"], self.__ToTimestamp(endTime), side="right"))
+        if startIndex >= endIndex:
+            return []
+
+        startOffset = int(indexEntries["offset"][startIndex])
+        if endIndex < len(indexEntries):
+            endOffset = int(indexEntries["offset"][endIndex])
+        else:
+            endOffset = transactionFile.csvSize
+        transactionFile.csvFile.seek(startOffset)
+        rowsText = transactionFile.csvFile.read(endOffset - startOffset).decode()
+
+        transactionRecords = []
+        for row in csv.reader(io.StringIO(rowsText)):
+            if not row:
+                continue
+            transactionRecords.append(TransactionRecord(row[0], float(row[1]), float(row[2]), float(row[3]),
+                                                        float(row[4]), self.__ParseDateTime(row[5])))
+        return transactionRecords
+
+    """
+    Close
+    Writes out the pending trades and closes every file
+    """
+    def Close(self):
+        self.Flush()
+        for transactionFile in self.__transactionFiles.values():
+            transactionFile.csvFile.close()
+            transactionFile.indexFile.close()
+        self.__transactionFiles = {}
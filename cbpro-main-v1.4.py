@@ -3,97 +3,146 @@ import cbpro
 import time
 import os
 import MasterBot
+import Metrics
+import MasterBotConstants
+import ShardCoordinator
+import TickerFeed
+import TickScheduler
 import AuthenticationConstants
 import CryptoAccount
 from CryptoStates import CryptoCurrencyPercentageStates
 import TransactionConstants
 import sys
 
-if __name__ == "__main__":
+"""
+RunTrader
+Runs the trading loop on the cryptos in the crypto_settings folder
+@param cryptoIDsToTrade: the crypto IDs this process trades, None for all of them
+@param shardCoordinator: shares the USD account with the other shards, None when not sharded
+@param shardIndex: the index of this process's shard
+"""
+def RunTrader(cryptoIDsToTrade=None, shardCoordinator=None, shardIndex: int = 0):
+    # Each shard writes its own logs
+    logFileSuffix = "" if shardCoordinator is None else "_shard" + str(shardIndex)
     masterBot = MasterBot.MasterBot(accountKey=AuthenticationConstants.KEY,
         accountB64secret=AuthenticationConstants.B64SECRET,
         accountPassphrase=AuthenticationConstants.PASS_PHRASE,
         usdAccountID=AuthenticationConstants.USD_ACCOUNT_ID,
         operatingPath=".",
-        recordingLogFilename="record.txt",
-        exceptionsLogFilename="exceptions.txt",
+        recordingLogFilename="record" + logFileSuffix + ".txt",
+        exceptionsLogFilename="exceptions" + logFileSuffix + ".txt",
         transactionsLogFoldername="transactions",
         cryptoBackupFoldername="crypto_records_backup",
-        cryptoSettingsFolderName="crypto_settings")
+        cryptoSettingsFolderName="crypto_settings",
+        cryptoIDsToTrade=cryptoIDsToTrade,
+        shardCoordinator=shardCoordinator,
+        shardIndex=shardIndex)
+    # Whatever ends the loop (EX: Ctrl-C), the orders in flight are applied and backed up and the
+    # journals, stores, logs and ticker feed are closed
+    try:
+        # Serves the phase timings and request counters for scraping, when metrics are enabled
+        masterBot.GetMetrics().StartServer(port=MasterBotConstants.METRICS_PORT + shardIndex)
 
-    activeCryptoIDs = masterBot.GetCryptoIDs()
-    UpdateRecordingFile = True
-    counter = 0
-    # Before main loop evaluate and query all of the crypto accounts
-    # this is to get their price and calculate their total portfolio percentages
-    # before the main loop begins
-    for cryptoID in activeCryptoIDs:
-        masterBot.UpdateUSDAccountAndAccountHoldings()
-        masterBot.UpdateCryptoAccount(cryptoID)
+        activeCryptoIDs = masterBot.GetCryptoIDs()
+        if MasterBotConstants.USE_TICKER_FEED:
+            tickerFeed = TickerFeed.TickerFeed(
+                [masterBot.GetCryptoAccountTracker(cryptoID).GetProductId() for cryptoID in activeCryptoIDs])
+            # Handed over before it starts so the clean up below stops it
+            masterBot.SetTickerFeed(tickerFeed)
+            tickerFeed.Start()
 
-    masterBot.UpdateTotalHoldingsInUSDFromAllAccounts()
-    masterBot.UpdatePortfolioPercentagesOfAllAccounts()
+        # Decides which cryptos actually need their decisions run on each tick
+        tickScheduler = TickScheduler.TickScheduler()
+        for cryptoID in activeCryptoIDs:
+            cryptoSettings = masterBot.GetCryptoAccountTracker(cryptoID).GetCryptoSettings()
+            tickScheduler.SetIntervals(cryptoID, cryptoSettings.MinDecisionIntervalSeconds,
+                                       cryptoSettings.MaxDecisionIntervalSeconds)
 
-    while True:
+        UpdateRecordingFile = True
+        counter = 0
+        # Before main loop evaluate and query all of the crypto accounts
+        # this is to get their price and calculate their total portfolio percentages
+        # before the main loop begins
+        masterBot.StartNewTick()
         for cryptoID in activeCryptoIDs:
             masterBot.UpdateUSDAccountAndAccountHoldings()
             masterBot.UpdateCryptoAccount(cryptoID)
-            masterBot.UpdateTotalHoldingsInUSDFromAllAccounts()
-            masterBot.UpdatePortfolioPercentagesOfAllAccounts()
 
-            if masterBot.ShouldRenewPriceForCryptoAccount(cryptoID):
-                masterBot.RenewPricesForCryptoAccount(cryptoID)
-                masterBot.SetRenewPriceFlagForCryptoAccount(cryptoID, False)
+        masterBot.UpdateTotalHoldingsInUSDFromAllAccounts()
+        masterBot.UpdatePortfolioPercentagesOfAllAccounts()
 
-            # Do some evaluation before determining buying or selling
-            masterBot.RunPercentageCalculationOfCryptoAccount(cryptoID)
-            masterBot.EvaluateAndAdjustBuyOrders(cryptoID)
+        while True:
+            tickStartTime = tickScheduler.GetTime()
+            # Pick up any edited settings files, the cryptos they belong to are run again
+            for cryptoID in masterBot.ReloadChangedCryptoSettings():
+                cryptoSettings = masterBot.GetCryptoAccountTracker(cryptoID).GetCryptoSettings()
+                tickScheduler.SetIntervals(cryptoID, cryptoSettings.MinDecisionIntervalSeconds,
+                                           cryptoSettings.MaxDecisionIntervalSeconds)
 
-            if masterBot.IsCryptoDown(cryptoID):
-                if masterBot.ShouldBuy(cryptoID):
-                    amountToBuyInUSD = masterBot.GetAmountToBuyInUSD(cryptoID)
-                    amountToBuyInCoin = masterBot.GetAmountToBuyInCoin(cryptoID, amountToBuyInUSD)
-                    if amountToBuyInCoin != 0.0:
-                        masterBot.BuyIn(cryptoID, amountToBuyInCoin)
-                        masterBot.WriteBuyTransactionToLogFile(cryptoID, amountToBuyInCoin)
-                    masterBot.SetRenewPriceFlagForCryptoAccount(cryptoID, True)
-                    UpdateRecordingFile = True
+            # Account balances are fetched once per tick and shared by every crypto
+            masterBot.StartNewTick()
+            # Refresh every price at once, any that miss the deadline are marked stale
+            masterBot.UpdateCurrentPricesOfAllAccounts()
+            decisionInputsOfCryptosToRun = {}
+            for cryptoID in activeCryptoIDs:
+                # Don't make decisions on a price left over from an earlier tick
+                if masterBot.IsPriceStale(cryptoID):
+                    continue
 
-                elif masterBot.ShouldAdjustFallingReferencePrice(cryptoID):
-                    masterBot.AdjustFallingReferencePrice(cryptoID)
+                # The total holdings and portfolio percentages follow along with each update,
+                # if the balances can't be fetched the crypto is skipped for this tick
+                if not masterBot.UpdateUSDAccountAndAccountHoldings() or not masterBot.UpdateCryptoHoldings(cryptoID):
+                    continue
 
-            # If crypto is up check if we should readjust the price
-            if masterBot.IsCryptoUp(cryptoID):
-                if masterBot.ShouldAdjustIncreasingReferencePrice(cryptoID):
-                    masterBot.AdjustIncreasingReferencePrice(cryptoID)
-                elif masterBot.IsGoingBackDown(cryptoID):
-                    masterBot.SetCryptoNeutral(cryptoID)
+                # Only run the decisions when something they depend on has changed
+                decisionInputs = masterBot.GetDecisionInputs(cryptoID)
+                tickScheduler.Observe(cryptoID, decisionInputs, tickStartTime)
+                if tickScheduler.ShouldRun(cryptoID):
+                    decisionInputsOfCryptosToRun[cryptoID] = decisionInputs
 
-            # Check the active buy orders and see if we should sell
-            if masterBot.ShouldSell(cryptoID):
-                ordersToSell = masterBot.GetOrdersToSell(cryptoID)
-                masterBot.SellOut(cryptoID, ordersToSell)
-                for orderToSell in ordersToSell:
-                    amountToSellInCoin = orderToSell[0]
-                    masterBot.WriteSellTransactionToLogFile(cryptoID, amountToSellInCoin)
-                masterBot.SetRenewPriceFlagForCryptoAccount(cryptoID, True)
-                UpdateRecordingFile = True
+            # The sells of every crypto which is run are placed together
+            madeTransactions = masterBot.RunDecisionPipelinesForCryptoAccounts(list(decisionInputsOfCryptosToRun))
+            for cryptoID, decisionInputs in decisionInputsOfCryptosToRun.items():
+                if madeTransactions[cryptoID]:
+                    UpdateRecordingFile = True
+                tickScheduler.MarkRan(cryptoID, decisionInputs, masterBot.GetDecisionInputs(cryptoID), tickStartTime)
 
-            masterBot.ExportCryptoBackup(cryptoID)
+            # Write out any changed backups which were held back to be coalesced, this tick's transactions
+            # and the candles which closed
+            masterBot.FlushCryptoBackups()
+            masterBot.FlushTransactions()
+            masterBot.FlushCandles()
 
-        # if it is time to log...
-        if counter >= 100 or UpdateRecordingFile:
-            # Update everything before we log
-            masterBot.UpdateUSDAccountAndAccountHoldings()
-            for cryptoID in activeCryptoIDs:
-                masterBot.UpdateCryptoAccount(cryptoID)
-            masterBot.UpdateTotalHoldingsInUSDFromAllAccounts()
-            masterBot.UpdatePortfolioPercentagesOfAllAccounts()
+            # if it is time to log...
+            if counter >= 100 or UpdateRecordingFile:
+                # Update the balances before we log, the prices fetched at the start of this tick are reused
+                # (fetching them again would add each one to the price history and candles twice)
+                masterBot.StartNewTick()
+                masterBot.UpdateUSDAccountAndAccountHoldings()
+                for cryptoID in activeCryptoIDs:
+                    masterBot.UpdateCryptoHoldings(cryptoID)
+                masterBot.UpdateTotalHoldingsInUSDFromAllAccounts()
+                masterBot.UpdatePortfolioPercentagesOfAllAccounts()
 
-            masterBot.LogCryptoDataToRecordingFile()
-            UpdateRecordingFile = False
-            counter = 0
-        else:
-            counter = counter + 1
+                masterBot.LogCryptoDataToRecordingFile("Decision Latency:\n" + tickScheduler.GetLatencyReport() +
+                                                       "Requests:\n" + masterBot.GetRequestSchedulerReport())
+                UpdateRecordingFile = False
+                counter = 0
+            else:
+                counter = counter + 1
 
-        time.sleep(1)
+            masterBot.GetMetrics().Observe(Metrics.TICK_SECONDS, tickScheduler.GetTime() - tickStartTime)
+            # Wait out the rest of the poll interval
+            time.sleep(max(MasterBotConstants.SCHEDULER_POLL_INTERVAL_SECONDS -
+                           (tickScheduler.GetTime() - tickStartTime), 0.0))
+    finally:
+        masterBot.CleanUp()
+
+if __name__ == "__main__":
+    if MasterBotConstants.SHARD_COUNT <= 1:
+        RunTrader()
+    else:
+        # Split the cryptos between worker processes which share the USD account
+        cryptoIDs = [filename[:filename.find(".")] for filename in os.listdir("crypto_settings")
+                     if os.path.isfile(os.path.join("crypto_settings", filename))]
+        ShardCoordinator.RunShards(RunTrader, cryptoIDs, MasterBotConstants.SHARD_COUNT)
@@ -0,0 +1,136 @@
+import random
+import unittest
+import CryptoAccount
+from CryptoStates import CryptoCurrencyPercentageStates
+
+class BaselineLots:
+    # The active purchases kept the way they were before the trigger book, as
+    # [amount, referencePrice, boughtPrice, state] lists checked one by one on every tick
+    def __init__(self, cryptoSettings):
+        self.cryptoSettings = cryptoSettings
+        self.lots = {}  # maps the lot ID to its [amount, referencePrice, boughtPrice, state]
+
+    """
+    Evaluate
+    The per lot loop of EvaluateAndAdjustBuyOrders
+    @param currentPrice: the current price of the crypto currency
+    """
+    def Evaluate(self, currentPrice):
+        for activeBuy in self.lots.values():
+            referencePercentDifference = round(((currentPrice / activeBuy[1]) - 1.0) * 100, 2)
+            currentPercentageState = activeBuy[3]
+            if currentPercentageState == CryptoCurrencyPercentageStates.Neutral or \
+                    currentPercentageState == CryptoCurrencyPercentageStates.Down:
+                if referencePercentDifference <= self.cryptoSettings["LowPercentageThreshold"]:
+                    currentPercentageState = CryptoCurrencyPercentageStates.Down
+                elif referencePercentDifference >= self.cryptoSettings["HighPercentageThreshold"]:
+                    currentPercentageState = CryptoCurrencyPercentageStates.Up
+                else:
+                    currentPercentageState = CryptoCurrencyPercentageStates.Neutral
+            activeBuy[3] = currentPercentageState
+
+            if currentPercentageState == CryptoCurrencyPercentageStates.Up:
+                if referencePercentDifference >= self.cryptoSettings["AdjustReferencePriceUpThreshold"]:
+                    desiredPercentageDifferenceInDecimal = self.cryptoSettings["HighPercentageThreshold"] / 100.0
+                    activeBuy[1] = round(currentPrice * ((desiredPercentageDifferenceInDecimal - 1.0) * -1.0), 2)
+
+    """
+    GetLotIDsToSell
+    The per lot loop of GetOrdersToSell
+    @param currentPrice: the current price of the crypto currency
+    @return: the lot IDs of the purchases which should be sold
+    """
+    def GetLotIDsToSell(self, currentPrice):
+        lotIDsToSell = []
+        for lotID, activeBuy in self.lots.items():
+            percentage = round(((float(currentPrice) / float(activeBuy[1])) - 1) * 100, 2)
+            if activeBuy[3] == CryptoCurrencyPercentageStates.Up and \
+                    percentage <= self.cryptoSettings["HighToDownSellOutPercentageThreshold"]:
+                lotIDsToSell.append(lotID)
+        return lotIDsToSell
+
+class CryptoAccountTest(unittest.TestCase):
+    """
+    MakeCryptoSettings
+    @param randomSource: the random.Random to draw the thresholds from
+    @return: crypto settings with random thresholds on whole or half percentages,
+    so prices land exactly on them as well as either side of them
+    """
+    @staticmethod
+    def MakeCryptoSettings(randomSource):
+        highPercentageThreshold = randomSource.choice([0.5, 1.0, 2.0, 3.0, 5.0])
+        return {"id": "BTC",
+                "LowPercentageThreshold": -randomSource.choice([0.5, 1.0, 2.0, 3.0, 5.0]),
+                "HighPercentageThreshold": highPercentageThreshold,
+                "LowToUpBuyInPercentageThreshold": -1, "MaxPercentageDown": -10,
+                "HighToDownSellOutPercentageThreshold": highPercentageThreshold - randomSource.choice([0.5, 1.0, 2.0]),
+                "AdjustReferencePriceDownThreshold": -5,
+                "AdjustReferencePriceUpThreshold": highPercentageThreshold + randomSource.choice([0.0, 1.0, 3.0]),
+                "SmallestAmountToBuyInUSD": 10, "LargestAmountToBuyInUSD": 50, "MaxPortfolioPercentage": 40}
+
+    """
+    AssertLotsMatch
+    @param cryptoAccountTracker: the tracker holding the purchases
+    @param baselineLots: the BaselineLots holding the same purchases
+    """
+    def AssertLotsMatch(self, cryptoAccountTracker, baselineLots):
+        (lotIDs, amounts, referencePrices, boughtPrices, states), nextLotID = \
+            cryptoAccountTracker.GetActivePurchaseColumns()
+        trackerLots = {int(lotID): [float(amount), float(referencePrice), float(boughtPrice), int(state)]
+                       for lotID, amount, referencePrice, boughtPrice, state
+                       in zip(lotIDs, amounts, referencePrices, boughtPrices, states)}
+        self.assertEqual(trackerLots, {lotID: [activeBuy[0], activeBuy[1], activeBuy[2], int(activeBuy[3])]
+                                       for lotID, activeBuy in baselineLots.lots.items()})
+
+    def test_MatchesThePerLotLoopsOnRandomLotsAndPrices(self):
+        randomSource = random.Random(7)
+        for trial in range(40):
+            cryptoSettings = self.MakeCryptoSettings(randomSource)
+            cryptoAccountTracker = CryptoAccount.CryptoAccountTracker("BTC-account", "BTC-USD", "Bitcoin", "BTC",
+                                                                      0.001, cryptoSettings)
+            baselineLots = BaselineLots(cryptoSettings)
+
+            # Reference prices in whole cents, many of them the same, in every state
+            activePurchases = []
+            for lotIndex in range(randomSource.randint(0, 60)):
+                referencePrice = round(randomSource.choice([100.0, 95.0, 104.0]) * randomSource.uniform(0.95, 1.05), 2)
+                activePurchases.append([0.01 * (lotIndex + 1), referencePrice, referencePrice,
+                                        randomSource.choice(list(CryptoCurrencyPercentageStates))])
+            cryptoAccountTracker.RestoreActivePurchasesFromBackup(activePurchases)
+            for lotID, activePurchase in enumerate(activePurchases, start=1):
+                baselineLots.lots[lotID] = list(activePurchase)
+            nextLotID = len(activePurchases) + 1
+
+            currentPrice = 100.0
+            for tickIndex in range(60):
+                # Moves of a whole number of percent land right on the thresholds
+                if randomSource.random() < 0.5:
+                    currentPrice = round(currentPrice * (1.0 + randomSource.randint(-4, 4) / 100.0), 2)
+                else:
+                    currentPrice = round(currentPrice * (1.0 + randomSource.gauss(0.0, 0.02)), 2)
+                cryptoAccountTracker.SetCurrentPrice(currentPrice)
+                if randomSource.random() < 0.2:
+                    lotID = cryptoAccountTracker.AddActivePurchase(0.05)
+                    self.assertEqual(lotID, nextLotID)
+                    baselineLots.lots[lotID] = [0.05, currentPrice, currentPrice,
+                                                CryptoCurrencyPercentageStates.Neutral]
+                    nextLotID = nextLotID + 1
+
+                cryptoAccountTracker.EvaluateActivePurchases()
+                baselineLots.Evaluate(currentPrice)
+                self.AssertLotsMatch(cryptoAccountTracker, baselineLots)
+
+                lotIDsToSell = baselineLots.GetLotIDsToSell(currentPrice)
+                activePurchasesToSell = cryptoAccountTracker.GetActivePurchasesToSell()
+                self.assertEqual(sorted(activePurchase.lotID for activePurchase in activePurchasesToSell),
+                                 sorted(lotIDsToSell))
+                self.assertEqual(cryptoAccountTracker.ShouldSellActivePurchases(), len(lotIDsToSell) > 0)
+                # Sell some of them off, so removals from the middle of the book are checked too
+                for activePurchase in activePurchasesToSell:
+                    if randomSource.random() < 0.7:
+                        cryptoAccountTracker.RemoveActivePurchaseByLotID(activePurchase.lotID)
+                        del baselineLots.lots[activePurchase.lotID]
+                self.AssertLotsMatch(cryptoAccountTracker, baselineLots)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+import ActivePurchases
+import OrderExecutor
+import OrderPipeline
+from CryptoStates import CryptoCurrencyPercentageStates
+
+class RecordingPipeline:
+    # Stands in for the OrderPipeline, keeping the orders submitted to it
+    def __init__(self):
+        self.submittedOrders = []
+
+    def SubmitOrder(self, cryptoID, side, productId, size, fallbackPrice):
+        self.submittedOrders.append((cryptoID, side, productId, size))
+
+class OrderExecutorTest(unittest.TestCase):
+    """
+    MakeLots
+    @param amounts: the amount of coin in each lot
+    @return: an ActivePurchase for each amount, bought at 100
+    """
+    @staticmethod
+    def MakeLots(amounts):
+        return [ActivePurchases.ActivePurchase(lotID + 1, amount, 100.0, 100.0, CryptoCurrencyPercentageStates.Up)
+                for lotID, amount in enumerate(amounts)]
+
+    def test_LeftoverBelowMinSizeStaysInTheLastLot(self):
+        lots = self.MakeLots([0.015, 0.013])
+        netAmountInCoin = OrderExecutor.OrderExecutor.RoundToMinSize(sum(lot.amount for lot in lots), 0.01)
+        self.assertAlmostEqual(netAmountInCoin, 0.02)
+        lotFills = OrderExecutor.OrderExecutor.AttributeFill(lots, netAmountInCoin, 2.2, 0.01)
+        self.assertEqual([lotFill.lot.lotID for lotFill in lotFills], [1, 2])
+        self.assertAlmostEqual(lotFills[0].amountInCoin, 0.015)
+        self.assertEqual(lotFills[0].remainingInCoin, 0.0)
+        self.assertAlmostEqual(lotFills[1].amountInCoin, 0.005)
+        self.assertAlmostEqual(lotFills[1].remainingInCoin, 0.008)
+        # Every coin is either sold or still in a lot, and the whole fill is handed out
+        self.assertAlmostEqual(sum(lotFill.amountInCoin + lotFill.remainingInCoin for lotFill in lotFills), 0.028)
+        self.assertAlmostEqual(sum(lotFill.amountInUSD for lotFill in lotFills), 2.2)
+        self.assertAlmostEqual(sum(lotFill.fee for lotFill in lotFills), 0.01)
+
+    def test_PartialFillLeavesTheLaterLotsUnsold(self):
+        lots = self.MakeLots([0.02, 0.03, 0.05])
+        lotFills = OrderExecutor.OrderExecutor.AttributeFill(lots, 0.04, 4.0, 0.0)
+        self.assertEqual([lotFill.lot.lotID for lotFill in lotFills], [1, 2])
+        self.assertAlmostEqual(lotFills[1].amountInCoin, 0.02)
+        self.assertAlmostEqual(lotFills[1].remainingInCoin, 0.01)
+
+    def test_WholeLotsAreSoldWhole(self):
+        lots = self.MakeLots([0.1, 0.2, 0.3])
+        netAmountInCoin = OrderExecutor.OrderExecutor.RoundToMinSize(sum(lot.amount for lot in lots), 0.1)
+        lotFills = OrderExecutor.OrderExecutor.AttributeFill(lots, netAmountInCoin, 60.0, 0.3)
+        self.assertEqual(len(lotFills), 3)
+        self.assertEqual([lotFill.remainingInCoin for lotFill in lotFills], [0.0, 0.0, 0.0])
+
+    def test_SellIsPendingUntilItsCompletionIsApplied(self):
+        orderPipeline = RecordingPipeline()
+        orderExecutor = OrderExecutor.OrderExecutor(orderPipeline)
+        lots = self.MakeLots([0.015, 0.013])
+        sellOrders = [OrderExecutor.SellOrder("BTC", "BTC-USD", 0.01, lots),
+                      OrderExecutor.SellOrder("ETH", "ETH-USD", 0.01, self.MakeLots([0.004]))]
+
+        # Too little ETH to sell yet, so only the BTC sell is placed
+        self.assertEqual(orderExecutor.SubmitSells(sellOrders, {"BTC": 110.0, "ETH": 10.0}), ["BTC"])
+        self.assertEqual(len(orderPipeline.submittedOrders), 1)
+        self.assertEqual(orderPipeline.submittedOrders[0][:3], ("BTC", "sell", "BTC-USD"))
+        self.assertAlmostEqual(orderPipeline.submittedOrders[0][3], 0.02)
+        self.assertTrue(orderExecutor.HasPendingSell("BTC"))
+        self.assertFalse(orderExecutor.HasPendingSell("ETH"))
+
+        orderCompletion = OrderPipeline.OrderCompletion("BTC", "sell", 0.02, 0.02, 2.2, 0.01, True)
+        lotFills = orderExecutor.ApplySellCompletion(orderCompletion)
+        self.assertFalse(orderExecutor.HasPendingSell("BTC"))
+        self.assertAlmostEqual(lotFills[1].remainingInCoin, 0.008)
+
+    def test_RejectedSellSellsNothing(self):
+        orderExecutor = OrderExecutor.OrderExecutor(RecordingPipeline())
+        orderExecutor.SubmitSells([OrderExecutor.SellOrder("BTC", "BTC-USD", 0.01, self.MakeLots([0.02]))],
+                                  {"BTC": 100.0})
+        orderCompletion = OrderPipeline.OrderCompletion("BTC", "sell", 0.02, 0.0, 0.0, 0.0, True)
+        self.assertEqual(orderExecutor.ApplySellCompletion(orderCompletion), [])
+        self.assertFalse(orderExecutor.HasPendingSell("BTC"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+import TickScheduler
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TickSchedulerTest(unittest.TestCase):
+    """
+    RunTicks
+    Runs a product through the ticks of the main loop: its inputs are read 0.30s into each
+    one second tick and its pipeline finishes 0.02s after that
+    @param tickScheduler: the TickScheduler to run the product through
+    @param clock: the FakeClock the scheduler was made with
+    @param decisionInputsOfEachTick: the decision inputs of the product on each tick
+    @return: if the product ran on each tick
+    """
+    @staticmethod
+    def RunTicks(tickScheduler, clock, decisionInputsOfEachTick):
+        ranOnEachTick = []
+        for tickNumber, decisionInputs in enumerate(decisionInputsOfEachTick):
+            tickStartTime = float(tickNumber)
+            clock.now = tickStartTime + 0.30
+            tickScheduler.Observe("BTC", decisionInputs, tickStartTime)
+            shouldRun = tickScheduler.ShouldRun("BTC")
+            if shouldRun:
+                clock.now = tickStartTime + 0.32
+                tickScheduler.MarkRan("BTC", decisionInputs, decisionInputs, tickStartTime)
+            ranOnEachTick.append(shouldRun)
+        return ranOnEachTick
+
+    def test_ProductChangingEveryTickRunsEveryTick(self):
+        clock = FakeClock()
+        tickScheduler = TickScheduler.TickScheduler(minIntervalSeconds=1.0, maxIntervalSeconds=60.0, clock=clock)
+        ranOnEachTick = self.RunTicks(tickScheduler, clock, [(100.0 + tickNumber,) for tickNumber in range(10)])
+        self.assertEqual(ranOnEachTick, [True] * 10)
+
+    def test_UnchangedProductRunsOnceEveryMaxInterval(self):
+        clock = FakeClock()
+        tickScheduler = TickScheduler.TickScheduler(minIntervalSeconds=1.0, maxIntervalSeconds=5.0, clock=clock)
+        ranOnEachTick = self.RunTicks(tickScheduler, clock, [(100.0,)] * 11)
+        self.assertEqual(ranOnEachTick, [True, False, False, False, False, True,
+                                         False, False, False, False, True])
+
+if __name__ == "__main__":
+    unittest.main()